@@ -0,0 +1,58 @@
+"""
+把旧项目 topic_meta 中的分镜状态键 (shot_status_* / shot_error_* / shot_images)
+和 image_paths / video_paths 等列表导入 shots / image_takes 表
+
+    python scripts/backfill_shots.py              # 导入全部项目
+    python scripts/backfill_shots.py --strip-meta # 导入后从 topic_meta 删除旧键
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+from src.server.database import SessionLocal
+from src.server.init_db import init_db
+from src.server.models import Project
+from src.server.shot_service import ShotService
+
+LEGACY_KEY = re.compile(r"^shot_(status|error)_(image|video)_\d+$")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import legacy per-shot state into the shots table")
+    parser.add_argument("--project", help="Only this project ID")
+    parser.add_argument("--strip-meta", action="store_true", help="Remove the imported keys from topic_meta")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        query = db.query(Project.id)
+        if args.project:
+            query = query.filter(Project.id == args.project)
+        project_ids = [row.id for row in query.all()]
+
+        for project_id in project_ids:
+            project = db.query(Project).filter(Project.id == project_id).first()
+            touched = ShotService(db).import_legacy(project)
+            stripped = 0
+            if args.strip_meta and project.topic_meta:
+                meta = {k: v for k, v in project.topic_meta.items() if k != "shot_images" and not LEGACY_KEY.match(k)}
+                stripped = len(project.topic_meta) - len(meta)
+                if stripped:
+                    project.topic_meta = meta
+                    db.commit()
+            print(f"{project_id}: {touched} shots imported, {stripped} meta keys removed")
+            # Projects can be large; do not keep every one in the identity map
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+"""
+Ark / TOS 本地替身服务 (压测与延迟测试用，不消耗真实配额)
+
+实现 VEADKClient 与 TosClient 用到的接口:
+  POST /api/v3/chat/completions                 LLM (支持 stream=True SSE)
+  POST /api/v3/images/generations               图像生成 (返回占位 PNG 的 URL)
+  POST /api/v3/contents/generations/tasks       视频任务提交
+  GET  /api/v3/contents/generations/tasks/{id}  视频任务状态
+  GET  /api/v3/contents/generations/tasks       视频任务列表 (filter.task_ids)
+  PUT/GET/HEAD /{key}  (Host: {bucket}.{endpoint})  TOS 对象读写
+
+用法:
+  python scripts/fake_ark_server.py --port 9100 --llm-latency lognormal:2:0.4 --error-rate 0.02
+
+然后将配置指向本服务:
+  platforms.<name>.endpoints.{llm,image,video}: http://127.0.0.1:9100/api/v3
+  platforms.<name>.tos.endpoint: http://localtest.me:9100
+TOS 使用虚拟主机风格 ({bucket}.{endpoint})，因此 endpoint 的主机名需支持泛解析到本机:
+localtest.me 的公网 DNS 会把所有子域解析到 127.0.0.1；离线环境可在 /etc/hosts 中加入
+"127.0.0.1 <bucket>.fake-tos.local" 并使用 http://fake-tos.local:9100。
+
+延迟分布格式: fixed:秒 | uniform:最小:最大 | lognormal:中位数:sigma | exp:均值
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from aiohttp import web, ClientSession, ClientTimeout
+
+
+class Latency:
+    """延迟分布"""
+
+    def __init__(self, spec: str):
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.args = [float(p) for p in parts[1:]]
+        if self.kind not in ("fixed", "uniform", "lognormal", "exp"):
+            raise argparse.ArgumentTypeError(f"unknown latency distribution: {spec}")
+        self.spec = spec
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.args[0]
+        if self.kind == "uniform":
+            return random.uniform(self.args[0], self.args[1])
+        if self.kind == "lognormal":
+            return random.lognormvariate(math.log(self.args[0]), self.args[1])
+        return random.expovariate(1.0 / self.args[0])
+
+    def __repr__(self):
+        return self.spec
+
+
+def placeholder_png(width: int = 1280, height: int = 720) -> bytes:
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (width, height), (40, 44, 52))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([width // 8, height // 8, width * 7 // 8, height * 7 // 8], outline=(97, 175, 239), width=6)
+    draw.text((width // 2 - 60, height // 2), "FAKE ARK IMAGE", fill=(229, 192, 123))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def placeholder_mp4(video_file: Optional[str], seconds: float = 2.0) -> bytes:
+    """占位视频：优先使用 --video-file，否则用 moviepy 渲染一段纯色视频"""
+    if video_file:
+        with open(video_file, "rb") as f:
+            return f.read()
+    import tempfile
+    import os
+    from moviepy import ColorClip
+    path = os.path.join(tempfile.mkdtemp(prefix="fake_ark_"), "placeholder.mp4")
+    clip = ColorClip(size=(640, 360), color=(40, 44, 52), duration=seconds)
+    clip.write_videofile(path, fps=12, codec="libx264", audio=False, logger=None)
+    clip.close()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+_CRC64_TABLE = []
+for _i in range(256):
+    _c = _i
+    for _ in range(8):
+        _c = (_c >> 1) ^ 0xC96C5795D7870F42 if _c & 1 else _c >> 1
+    _CRC64_TABLE.append(_c)
+
+
+def crc64_ecma(data: bytes) -> int:
+    """TOS 校验用 CRC-64/ECMA (SDK 在上传后比对 x-tos-hash-crc64ecma)"""
+    try:
+        from tos.utils import Crc64
+        crc = Crc64()
+        crc.update(data)
+        return crc.crc
+    except ImportError:
+        crc = 0xFFFFFFFFFFFFFFFF
+        for byte in data:
+            crc = _CRC64_TABLE[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+        return crc ^ 0xFFFFFFFFFFFFFFFF
+
+
+class FakeArk:
+    def __init__(self, args):
+        self.args = args
+        self.public_base = args.public_base or f"http://127.0.0.1:{args.port}"
+        self.image_bytes = placeholder_png()
+        try:
+            self.video_bytes = placeholder_mp4(args.video_file)
+        except Exception as e:
+            print(f"[fake-ark] placeholder video unavailable ({e}); serving PNG bytes instead, merge step will fail")
+            self.video_bytes = self.image_bytes
+        self.video_tasks: Dict[str, Dict] = {}
+        self.objects: Dict[tuple, bytes] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    # Fault injection
+
+    def _count(self, key: str, n: int = 1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    async def _simulate(self, op: str, latency: Latency) -> Optional[web.Response]:
+        """注入延迟与错误；返回非 None 时直接作为响应"""
+        self._count(f"{op}.requests")
+        limit = self.args.max_concurrency
+        if limit and self.in_flight.get(op, 0) >= limit:
+            self._count(f"{op}.429")
+            return self._throttle()
+        if random.random() < self.args.throttle_rate:
+            self._count(f"{op}.429")
+            return self._throttle()
+
+        self.in_flight[op] = self.in_flight.get(op, 0) + 1
+        try:
+            await asyncio.sleep(max(0.0, latency.sample()))
+        finally:
+            self.in_flight[op] -= 1
+
+        if random.random() < self.args.error_rate:
+            self._count(f"{op}.5xx")
+            status = random.choice([500, 502, 503])
+            return web.json_response({"error": {"code": "InternalServiceError", "message": "injected failure"}}, status=status)
+        return None
+
+    def _throttle(self) -> web.Response:
+        return web.json_response(
+            {"error": {"code": "RateLimitExceeded", "message": "injected throttling"}},
+            status=429, headers={"Retry-After": str(self.args.retry_after)}
+        )
+
+    def _headers(self) -> Dict[str, str]:
+        return {"X-Tt-Logid": uuid.uuid4().hex}
+
+    # LLM
+
+    def _llm_content(self, messages: List[Dict]) -> str:
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        user = messages[-1].get("content", "") if messages else ""
+
+        if '"shots"' in system:
+            shots = [{
+                "shot_number": i,
+                "shot_type": random.choice(["全景", "中景", "近景", "特写"]),
+                "description": f"占位镜头 {i} 的画面描述",
+                "action": f"角色在镜头 {i} 中的动作",
+                "dialogue": "",
+                "camera_movement": random.choice(["固定", "推进", "跟随"]),
+                "duration": random.choice([4, 5, 6]),
+                "mood": "平静",
+                "character": "小明",
+                "scene": "咖啡馆"
+            } for i in range(1, self.args.shots + 1)]
+            body = {"title": "压测分镜", "total_shots": len(shots), "shots": shots}
+            return "```json\n" + json.dumps(body, ensure_ascii=False, indent=2) + "\n```"
+
+        match = re.search(r"镜头编号[：:]\s*(\d+)", user)
+        shot_number = int(match.group(1)) if match else 1
+        if '"video_prompt"' in system:
+            return json.dumps({
+                "shot_number": shot_number,
+                "video_prompt": f"镜头 {shot_number} 的占位视频提示词，镜头缓慢推进",
+                "motion_intensity": "medium",
+                "camera_motion": "缓慢推进"
+            }, ensure_ascii=False)
+        if '"positive_prompt"' in system:
+            return json.dumps({
+                "shot_number": shot_number,
+                "positive_prompt": f"镜头 {shot_number} 的占位图像提示词，电影感光影，高清细节",
+                "negative_prompt": "模糊, 低质量",
+                "style": "cinematic"
+            }, ensure_ascii=False)
+
+        names = re.findall(r'"name"\s*:\s*"([^"]+)"', user)
+        if '"characters"' in system:
+            if '"prompt"' in system:
+                return json.dumps({"characters": [{"name": n, "prompt": f"{n}，白底正面上身照，高清"} for n in names]}, ensure_ascii=False)
+            return json.dumps({"characters": [
+                {"name": "小明", "gender": "男", "age": "28", "personality": "内向", "appearance": "短发", "clothing": "衬衫"},
+                {"name": "小红", "gender": "女", "age": "26", "personality": "开朗", "appearance": "长发", "clothing": "连衣裙"}
+            ]}, ensure_ascii=False)
+        if '"scenes"' in system:
+            if '"prompt"' in system:
+                return json.dumps({"scenes": [{"name": n, "prompt": f"{n}，空镜头，电影感"} for n in names]}, ensure_ascii=False)
+            return json.dumps({"scenes": [
+                {"name": "咖啡馆", "time": "日", "location": "室内", "atmosphere": "温馨", "elements": "木桌、暖光"}
+            ]}, ensure_ascii=False)
+
+        return "【剧名】：压测短剧\n【剧情】：\n" + "\n".join(f"第{i}幕：占位剧情" for i in range(1, 4))
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        injected = await self._simulate("llm", self.args.llm_latency)
+        if injected is not None:
+            return injected
+
+        content = self._llm_content(payload.get("messages", []))
+        prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", [])) // 2
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 2,
+                 "total_tokens": prompt_tokens + len(content) // 2}
+
+        if not payload.get("stream"):
+            return web.json_response({
+                "id": uuid.uuid4().hex,
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage
+            }, headers=self._headers())
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", **self._headers()})
+        await response.prepare(request)
+        chunk_size = 16
+        delay = chunk_size / self.args.stream_chars_per_sec if self.args.stream_chars_per_sec else 0
+        for i in range(0, len(content), chunk_size):
+            chunk = {"choices": [{"index": 0, "delta": {"content": content[i:i + chunk_size]}}]}
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            if delay:
+                await asyncio.sleep(delay)
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            await response.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    # Images
+
+    async def image_generations(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        injected = await self._simulate("image", self.args.image_latency)
+        if injected is not None:
+            return injected
+        return web.json_response({
+            "model": payload.get("model"),
+            "created": int(time.time()),
+            "data": [{"url": f"{self.public_base}/media/image/{uuid.uuid4().hex}.png", "size": payload.get("size")}],
+            "usage": {"generated_images": 1}
+        }, headers=self._headers())
+
+    # Video tasks
+
+    async def submit_video(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        injected = await self._simulate("video_submit", self.args.submit_latency)
+        if injected is not None:
+            return injected
+        task_id = f"cgt-{uuid.uuid4().hex[:20]}"
+        now = time.time()
+        self.video_tasks[task_id] = {
+            "id": task_id,
+            "model": payload.get("model"),
+            "created_at": int(now),
+            "ready_at": now + max(0.0, self.args.video_duration.sample()),
+            "will_fail": random.random() < self.args.video_fail_rate,
+            "callback_url": payload.get("callback_url"),
+            "callback_sent": False
+        }
+        return web.json_response({"id": task_id}, headers=self._headers())
+
+    def _task_view(self, task: Dict) -> Dict:
+        now = time.time()
+        view = {"id": task["id"], "model": task["model"], "created_at": task["created_at"], "updated_at": int(now)}
+        if now < task["ready_at"]:
+            view["status"] = "queued" if now - task["created_at"] < 1 else "running"
+        elif task["will_fail"]:
+            view["status"] = "failed"
+            view["error"] = {"code": "InternalServiceError", "message": "injected generation failure"}
+        else:
+            view["status"] = "succeeded"
+            view["content"] = {"video_url": f"{self.public_base}/media/video/{task['id']}.mp4"}
+            view["usage"] = {"completion_tokens": 100000, "total_tokens": 100000}
+        return view
+
+    async def video_status(self, request: web.Request) -> web.Response:
+        injected = await self._simulate("video_status", self.args.status_latency)
+        if injected is not None:
+            return injected
+        task = self.video_tasks.get(request.match_info["task_id"])
+        if not task:
+            return web.json_response({"error": {"code": "NotFound", "message": "task not found"}}, status=404)
+        return web.json_response(self._task_view(task), headers=self._headers())
+
+    async def video_list(self, request: web.Request) -> web.Response:
+        injected = await self._simulate("video_status", self.args.status_latency)
+        if injected is not None:
+            return injected
+        ids = request.query.getall("filter.task_ids", [])
+        tasks = [self.video_tasks[i] for i in ids if i in self.video_tasks] if ids else list(self.video_tasks.values())
+        page_size = int(request.query.get("page_size", 10))
+        items = [self._task_view(t) for t in tasks[:page_size]]
+        return web.json_response({"items": items, "total": len(tasks)}, headers=self._headers())
+
+    async def callback_loop(self, app):
+        """任务到达终态后回调 callback_url (与 Ark 回调格式一致: 任务对象 JSON)"""
+        async with ClientSession(timeout=ClientTimeout(total=10)) as session:
+            while True:
+                await asyncio.sleep(0.5)
+                now = time.time()
+                for task in list(self.video_tasks.values()):
+                    if task["callback_url"] and not task["callback_sent"] and now >= task["ready_at"]:
+                        task["callback_sent"] = True
+                        try:
+                            async with session.post(task["callback_url"], json=self._task_view(task)) as resp:
+                                self._count(f"callback.{resp.status}")
+                        except Exception as e:
+                            self._count("callback.error")
+                            print(f"[fake-ark] callback to {task['callback_url']} failed: {e}")
+
+    # Media & TOS
+
+    async def media(self, request: web.Request) -> web.Response:
+        if request.match_info["kind"] == "video":
+            return web.Response(body=self.video_bytes, content_type="video/mp4")
+        return web.Response(body=self.image_bytes, content_type="image/png")
+
+    def _bucket(self, request: web.Request) -> str:
+        host = request.host.split(":")[0]
+        return host.split(".")[0] if host.count(".") >= 1 and not host.replace(".", "").isdigit() else ""
+
+    async def tos_object(self, request: web.Request) -> web.Response:
+        bucket = self._bucket(request)
+        key = request.match_info["key"]
+        headers = {"x-tos-request-id": uuid.uuid4().hex, "x-tos-id-2": uuid.uuid4().hex}
+
+        if request.method == "PUT":
+            if "policy" in request.query or "acl" in request.query:
+                await request.read()
+                return web.Response(status=200, headers=headers)
+            injected = await self._simulate("tos", self.args.tos_latency)
+            if injected is not None:
+                return injected
+            data = await request.read()
+            self.objects[(bucket, key)] = data
+            return web.Response(status=200, headers={
+                **headers, "ETag": f'"{uuid.uuid4().hex}"', "x-tos-hash-crc64ecma": str(crc64_ecma(data))
+            })
+
+        if not key:
+            # HeadBucket / ListObjects
+            if request.method == "HEAD":
+                return web.Response(status=200, headers={**headers, "x-tos-bucket-region": "fake"})
+            prefix = request.query.get("prefix", "")
+            contents = [{"Key": k, "Size": len(v)} for (b, k), v in self.objects.items() if b == bucket and k.startswith(prefix)]
+            return web.json_response({"Name": bucket, "Prefix": prefix, "Contents": contents, "CommonPrefixes": []}, headers=headers)
+
+        data = self.objects.get((bucket, key))
+        if data is None:
+            return web.json_response({"Code": "NoSuchKey", "Message": "not found"}, status=404, headers=headers)
+        headers["x-tos-hash-crc64ecma"] = str(crc64_ecma(data))
+        if request.method == "HEAD":
+            return web.Response(status=200, headers={**headers, "Content-Length": str(len(data))})
+        content_type = "video/mp4" if key.endswith(".mp4") else "image/png" if key.endswith(".png") else "application/octet-stream"
+        return web.Response(body=data, content_type=content_type, headers=headers)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "counters": self.counters,
+            "in_flight": self.in_flight,
+            "video_tasks": len(self.video_tasks),
+            "objects": len(self.objects)
+        })
+
+
+def build_app(args) -> web.Application:
+    fake = FakeArk(args)
+    app = web.Application(client_max_size=1024 ** 3)
+    app.router.add_post("/api/v3/chat/completions", fake.chat_completions)
+    app.router.add_post("/api/v3/images/generations", fake.image_generations)
+    app.router.add_post("/api/v3/contents/generations/tasks", fake.submit_video)
+    app.router.add_get("/api/v3/contents/generations/tasks", fake.video_list)
+    app.router.add_get("/api/v3/contents/generations/tasks/{task_id}", fake.video_status)
+    app.router.add_get("/media/{kind}/{name}", fake.media)
+    app.router.add_get("/_fake/stats", fake.stats)
+    app.router.add_route("*", "/{key:.*}", fake.tos_object)
+
+    async def start_callbacks(app):
+        app["callback_task"] = asyncio.create_task(fake.callback_loop(app))
+
+    async def stop_callbacks(app):
+        app["callback_task"].cancel()
+
+    app.on_startup.append(start_callbacks)
+    app.on_cleanup.append(stop_callbacks)
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local Ark/TOS stand-in for load and latency testing")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--public-base", default=None, help="Base URL used in returned media URLs (default http://127.0.0.1:PORT)")
+    parser.add_argument("--llm-latency", type=Latency, default=Latency("lognormal:1.5:0.5"))
+    parser.add_argument("--image-latency", type=Latency, default=Latency("lognormal:6:0.3"))
+    parser.add_argument("--submit-latency", type=Latency, default=Latency("uniform:0.2:0.8"))
+    parser.add_argument("--status-latency", type=Latency, default=Latency("uniform:0.05:0.2"))
+    parser.add_argument("--tos-latency", type=Latency, default=Latency("uniform:0.05:0.3"))
+    parser.add_argument("--video-duration", type=Latency, default=Latency("uniform:30:90"), help="Time until a video task finishes")
+    parser.add_argument("--stream-chars-per-sec", type=float, default=400.0, help="SSE output speed (0 = as fast as possible)")
+    parser.add_argument("--shots", type=int, default=12, help="Shots per generated storyboard")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected 5xx per request")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Probability of an injected 429 per request")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Per-operation in-flight cap; excess gets 429 (0 = unlimited)")
+    parser.add_argument("--video-fail-rate", type=float, default=0.0, help="Probability a video task ends as failed")
+    parser.add_argument("--video-file", default=None, help="MP4 served as generated video (default: rendered with moviepy)")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    print(f"[fake-ark] listening on {args.host}:{args.port} "
+          f"(llm={args.llm_latency}, image={args.image_latency}, video={args.video_duration}, "
+          f"errors={args.error_rate}, 429={args.throttle_rate})")
+    web.run_app(build_app(args), host=args.host, port=args.port, print=None)
@@ -71,7 +71,7 @@ def migrate():
         # Or raw SQL copy. Raw SQL is faster for migration.
         
         # Tables to migrate
-        tables = ["projects", "tasks", "logs"]
+        tables = ["projects", "tasks", "logs", "shots", "image_takes", "usage_events"]
         
         for table in tables:
             print(f"📦 Migrating table: {table}...")
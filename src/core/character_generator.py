@@ -4,21 +4,19 @@
 
 import json
 from typing import Dict, Tuple, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 from loguru import logger
 
 from ..models.veadk_client import veadk_client
 from ..utils.config_loader import config_loader
+from ..utils.job_scheduler import job_scheduler
 
 
 class CharacterGenerator:
     """角色生成器"""
     
-    def __init__(self):
-        self.max_workers = config_loader.get("app.concurrency.prompt", 5)
-
     def reload_config(self):
-        self.max_workers = config_loader.get("app.concurrency.prompt", 5)
+        """并发由全局调度器控制 (app.job_scheduler)"""
     
     def generate(
         self, 
@@ -36,7 +34,7 @@ class CharacterGenerator:
         messages = [{"role": "user", "content": user_message}]
         
         logger.info("开始提取角色设计...")
-        content, token_usage = veadk_client.call_llm(messages, system_prompt)
+        content, token_usage = veadk_client.call_llm(messages, system_prompt, use_cache=True)
         
         try:
             content = self._extract_json(content)
@@ -51,7 +49,8 @@ class CharacterGenerator:
         self,
         characters: List[Dict],
         style: str,
-        visual_style: str
+        visual_style: str,
+        project_id: str = None
     ) -> Tuple[List[Dict], Dict]:
         """
         为角色生成提示词 (并发版)
@@ -59,30 +58,29 @@ class CharacterGenerator:
         updated_characters = [None] * len(characters)
         total_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
         
-        logger.info(f"开始并发生成角色提示词 (Workers: {self.max_workers})...")
-        
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Map future to index to maintain order
-            future_to_index = {
-                executor.submit(self.generate_single_prompt, char, style, visual_style): i 
-                for i, char in enumerate(characters)
-            }
-            
-            for future in as_completed(future_to_index):
-                i = future_to_index[future]
-                try:
-                    char, usage = future.result()
-                    updated_characters[i] = char
-                    
-                    # Aggregate usage
-                    if usage:
-                        for k, v in usage.items():
-                            if k in total_usage and isinstance(v, (int, float)):
-                                total_usage[k] += v
-                except Exception as e:
-                    logger.error(f"角色 {characters[i].get('name')} 提示词生成失败: {e}")
-                    updated_characters[i] = characters[i] # Fallback to original
+        logger.info(f"开始并发生成角色提示词 ({len(characters)} 个)...")
         
+        # Map future to index to maintain order
+        future_to_index = {
+            job_scheduler.submit(project_id, "llm", self.generate_single_prompt, char, style, visual_style, use_cache=True): i 
+            for i, char in enumerate(characters)
+        }
+
+        for future in as_completed(future_to_index):
+            i = future_to_index[future]
+            try:
+                char, usage = future.result()
+                updated_characters[i] = char
+
+                # Aggregate usage
+                if usage:
+                    for k, v in usage.items():
+                        if k in total_usage and isinstance(v, (int, float)):
+                            total_usage[k] += v
+            except Exception as e:
+                logger.error(f"角色 {characters[i].get('name')} 提示词生成失败: {e}")
+                updated_characters[i] = characters[i] # Fallback to original
+
         # Filter out any Nones (shouldn't happen with fallback logic)
         final_chars = [c for c in updated_characters if c is not None]
         return final_chars, total_usage
@@ -91,7 +89,8 @@ class CharacterGenerator:
         self,
         character: Dict,
         style: str,
-        visual_style: str
+        visual_style: str,
+        use_cache: bool = False
     ) -> Tuple[Dict, Dict]:
         """
         为单个角色生成提示词
@@ -111,7 +110,7 @@ class CharacterGenerator:
         messages = [{"role": "user", "content": user_message}]
         
         logger.info(f"开始生成角色 {character.get('name')} 的提示词...")
-        content, token_usage = veadk_client.call_llm(messages, system_prompt)
+        content, token_usage = veadk_client.call_llm(messages, system_prompt, use_cache=use_cache)
         
         try:
             content = self._extract_json(content)
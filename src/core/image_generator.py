@@ -7,10 +7,12 @@ from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from loguru import logger
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 
 from ..utils.tos_client import tos_client
 from ..utils.config_loader import config_loader
+from ..utils.http_transport import http_transport
+from ..utils.job_scheduler import job_scheduler
 from ..models.veadk_client import veadk_client
 
 class ImageGenerator:
@@ -25,8 +27,7 @@ class ImageGenerator:
 
     def reload_config(self):
         """重新加载配置"""
-        self.max_workers = config_loader.get("app.concurrency.image", 5)
-        logger.info(f"ImageGenerator 配置已更新, max_workers={self.max_workers}")
+        logger.info("ImageGenerator 配置已更新")
     
     def _generate_single_image(self, prompt_data: Dict, project_dir: Path, index: int = 0, width: int = 1280, height: int = 720, project_id: str = None, style: str = "", image_urls: List[str] = None) -> Tuple[int, Optional[str], Dict]:
         """Helper to generate single image"""
@@ -75,8 +76,7 @@ class ImageGenerator:
             
             try:
                 if isinstance(image_data, str) and (image_data.startswith("http://") or image_data.startswith("https://")):
-                    import requests
-                    with requests.get(image_data, stream=True) as r:
+                    with http_transport.get(image_data, stream=True) as r:
                         r.raise_for_status()
                         
                         # Detect extension from Content-Type
@@ -223,79 +223,78 @@ class ImageGenerator:
         project_dir = self.output_dir / project_id / sub_dir
         project_dir.mkdir(parents=True, exist_ok=True)
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_info = {}
-            
-            for i, prompt in enumerate(image_prompts):
-                shot_number = prompt.get("shot_number", i+1)
-                
-                # Mark as processing
-                if on_status_update:
-                    on_status_update(f"shot_status_image_{shot_number}", "processing", None)
-                
-                # Resolve reference images
-                image_urls = None
-                if reference_map and shot_number in reference_map:
-                    raw_paths = reference_map[shot_number]
-                    image_urls = []
-                    for p in raw_paths:
-                        if not p: continue
-                        # If http, assume accessible or already signed
-                        if p.startswith("http"):
-                            image_urls.append(p)
-                        else:
-                            # If local path, try to get TOS URL if enabled
-                            # Or upload to temp
-                            # Here we assume caller passed TOS paths or we can sign them
-                            # Since we don't know bucket easily here without config, let's rely on tos_client
-                            if config_loader.get("tos.enable"):
-                                bucket = config_loader.get("tos.bucket_name")
-                                # If path is relative to bucket, we need to sign it
-                                # If path is local file path, we need to upload
-                                # This is complex. Let's assume caller passed valid paths/keys or public URLs.
-                                # If they passed paths like "project_id/characters/image.png" (TOS key), we sign it.
-                                # But image_path in DB is usually "project_id/characters/image.png" or "http..."
-                                
-                                # Try to sign if it looks like a key (no / at start, no http)
-                                if not p.startswith("/"):
-                                    try:
-                                        signed = tos_client.get_signed_url(bucket, p, expires=3600)
-                                        image_urls.append(signed)
-                                    except:
-                                        image_urls.append(p)
-                                else:
-                                    # Local file? 
-                                    pass
-                
-                for j in range(image_count):
-                    future = executor.submit(self._generate_single_image, prompt, project_dir, j, width, height, project_id, style=style, image_urls=image_urls)
-                    future_to_info[future] = shot_number
+        future_to_info = {}
 
+        for i, prompt in enumerate(image_prompts):
+            shot_number = prompt.get("shot_number", i+1)
+
+            # Mark as processing
+            if on_status_update:
+                on_status_update(f"shot_status_image_{shot_number}", "processing", None)
+
+            # Resolve reference images
+            image_urls = None
+            if reference_map and shot_number in reference_map:
+                raw_paths = reference_map[shot_number]
+                image_urls = []
+                for p in raw_paths:
+                    if not p: continue
+                    # If http, assume accessible or already signed
+                    if p.startswith("http"):
+                        image_urls.append(p)
+                    else:
+                        # If local path, try to get TOS URL if enabled
+                        # Or upload to temp
+                        # Here we assume caller passed TOS paths or we can sign them
+                        # Since we don't know bucket easily here without config, let's rely on tos_client
+                        if config_loader.get("tos.enable"):
+                            bucket = config_loader.get("tos.bucket_name")
+                            # If path is relative to bucket, we need to sign it
+                            # If path is local file path, we need to upload
+                            # This is complex. Let's assume caller passed valid paths/keys or public URLs.
+                            # If they passed paths like "project_id/characters/image.png" (TOS key), we sign it.
+                            # But image_path in DB is usually "project_id/characters/image.png" or "http..."
+
+                            # Try to sign if it looks like a key (no / at start, no http)
+                            if not p.startswith("/"):
+                                try:
+                                    signed = tos_client.get_signed_url(bucket, p, expires=3600)
+                                    image_urls.append(signed)
+                                except:
+                                    image_urls.append(p)
+                            else:
+                                # Local file? 
+                                pass
+
+            for j in range(image_count):
+                future = job_scheduler.submit(project_id, "image", self._generate_single_image, prompt, project_dir, j, width, height, project_id, style=style, image_urls=image_urls)
+                future_to_info[future] = shot_number
+
+
+        for future in as_completed(future_to_info):
+            shot_number = future_to_info[future]
+            try:
+                s_num, path, usage = future.result()
+                status = "failed"
+                extra = None
+                if path:
+                    status = "completed"
+                    if shot_number not in shot_images:
+                        shot_images[shot_number] = []
+                    shot_images[shot_number].append(path)
+                    extra = {"path": path, "shot_number": shot_number}
+                elif "error" in usage:
+                    # Pass error message via extra
+                    extra = {"error": usage["error"]}
+
+                if on_status_update:
+                    on_status_update(f"shot_status_image_{shot_number}", status, extra)
+                total_api_calls += usage.get("api_calls", 1)
+            except Exception as e:
+                logger.error(f"Image generation failed for shot {shot_number}: {e}")
+                if on_status_update:
+                    on_status_update(f"shot_status_image_{shot_number}", "failed", None)
 
-            for future in as_completed(future_to_info):
-                shot_number = future_to_info[future]
-                try:
-                    s_num, path, usage = future.result()
-                    status = "failed"
-                    extra = None
-                    if path:
-                        status = "completed"
-                        if shot_number not in shot_images:
-                            shot_images[shot_number] = []
-                        shot_images[shot_number].append(path)
-                        extra = {"path": path, "shot_number": shot_number}
-                    elif "error" in usage:
-                        # Pass error message via extra
-                        extra = {"error": usage["error"]}
-                    
-                    if on_status_update:
-                        on_status_update(f"shot_status_image_{shot_number}", status, extra)
-                    total_api_calls += usage.get("api_calls", 1)
-                except Exception as e:
-                    logger.error(f"Image generation failed for shot {shot_number}: {e}")
-                    if on_status_update:
-                        on_status_update(f"shot_status_image_{shot_number}", "failed", None)
-        
         return shot_images, {"api_calls": total_api_calls}
     
     def regenerate_image(
@@ -348,8 +347,7 @@ class ImageGenerator:
             # Local fallback
             image_path = project_dir / f"shot_{shot_number:03d}.png"
             try:
-                import requests
-                with requests.get(image_url, stream=True) as r:
+                with http_transport.get(image_url, stream=True) as r:
                     r.raise_for_status()
                     with open(image_path, 'wb') as f:
                         for chunk in r.iter_content(chunk_size=8192):
@@ -5,12 +5,14 @@
 
 import json
 import re
+import threading
 from typing import Dict, List, Tuple, Optional
 from loguru import logger
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 
 from ..models.veadk_client import veadk_client
 from ..utils.config_loader import config_loader
+from ..utils.job_scheduler import job_scheduler
 
 
 class PromptGenerator:
@@ -23,96 +25,52 @@ class PromptGenerator:
         """重新加载配置"""
         self.image_prompts_config = config_loader.get_prompt("image_prompt_generation")
         self.video_prompts_config = config_loader.get_prompt("video_prompt_generation")
-        self.max_workers = config_loader.get("app.concurrency.prompt", 10)
-        logger.info(f"PromptGenerator 配置已更新, max_workers={self.max_workers}")
+        logger.info("PromptGenerator 配置已更新")
 
     def generate_all_prompts(
         self, 
         storyboard: Dict, 
         style: str = "cinematic",
         characters: List[Dict] = None,
-        scenes: List[Dict] = None
+        scenes: List[Dict] = None,
+        project_id: str = None
     ) -> Tuple[List[Dict], List[Dict], Dict]:
         """
         Concurrent pipeline generation for both image and video prompts.
         """
-        shots = storyboard.get("shots", [])
-        total_shots = len(shots)
-        
-        # Pre-allocate lists
-        all_image_prompts = [None] * total_shots
-        all_video_prompts = [None] * total_shots
-        total_tokens = {"prompt_tokens": 0, "completion_tokens": 0}
-        
-        # Configs
-        img_sys = self.image_prompts_config.get("system", "")
-        img_tpl = self.image_prompts_config.get("user_template", "")
-        vid_sys = self.video_prompts_config.get("system", "")
-        vid_tpl = self.video_prompts_config.get("user_template", "")
-        
-        def process_shot(index, shot):
-            try:
-                # 1. Generate Image Prompt
-                img_p, img_t = self._generate_single_image_prompt(
-                    shot, img_tpl, img_sys, style, characters, scenes
-                )
-                
-                # 2. Generate Video Prompt (using image prompt result)
-                img_content = img_p.get("positive_prompt", "")
-                vid_p, vid_t = self._generate_single_video_prompt(shot, img_content, vid_tpl, vid_sys)
-                
-                return index, img_p, vid_p, img_t, vid_t
-            except Exception as e:
-                logger.error(f"Shot {shot.get('shot_number')} prompt generation failed: {e}")
-                return index, None, None, {}, {}
+        pipeline = self.open_pipeline(style, characters, scenes, project_id=project_id)
+        for shot in storyboard.get("shots", []):
+            pipeline.submit(shot)
+        return pipeline.finish()
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_index = {
-                executor.submit(process_shot, i, shot): i
-                for i, shot in enumerate(shots)
-            }
-            
-            for future in as_completed(future_to_index):
-                try:
-                    idx, img_res, vid_res, img_tok, vid_tok = future.result()
-                    if img_res:
-                        all_image_prompts[idx] = img_res
-                        total_tokens["prompt_tokens"] += img_tok.get("prompt_tokens", 0)
-                        total_tokens["completion_tokens"] += img_tok.get("completion_tokens", 0)
-                    
-                    if vid_res:
-                        all_video_prompts[idx] = vid_res
-                        total_tokens["prompt_tokens"] += vid_tok.get("prompt_tokens", 0)
-                        total_tokens["completion_tokens"] += vid_tok.get("completion_tokens", 0)
-                        
-                except Exception as e:
-                    logger.error(f"Concurrent prompt generation error: {e}")
-
-        # Filter None
-        return (
-            [p for p in all_image_prompts if p], 
-            [p for p in all_video_prompts if p], 
-            total_tokens
-        )
+    def open_pipeline(
+        self,
+        style: str = "cinematic",
+        characters: List[Dict] = None,
+        scenes: List[Dict] = None,
+        project_id: str = None
+    ) -> "PromptPipeline":
+        """打开提示词流水线，镜头可在分镜仍在生成时逐个提交"""
+        return PromptPipeline(self, style, characters, scenes, project_id=project_id)
 
-    
     def regenerate_single_image_prompt(
         self, 
         shot: Dict, 
         style: str = "cinematic",
         characters: List[Dict] = None,
-        scenes: List[Dict] = None
+        scenes: List[Dict] = None,
+        use_cache: bool = False
     ) -> Tuple[Dict, Dict]:
-        """重新生成单个图像提示词"""
+        """重新生成单个图像提示词 (默认绕过缓存以得到新结果)"""
         system_prompt = self.image_prompts_config.get("system", "")
         user_template = self.image_prompts_config.get("user_template", "")
-        return self._generate_single_image_prompt(shot, user_template, system_prompt, style, characters, scenes)
+        return self._generate_single_image_prompt(shot, user_template, system_prompt, style, characters, scenes, use_cache=use_cache)
 
-    def regenerate_single_video_prompt(self, shot: Dict, image_prompt: str) -> Tuple[Dict, Dict]:
-        """重新生成单个视频提示词"""
+    def regenerate_single_video_prompt(self, shot: Dict, image_prompt: str, use_cache: bool = False) -> Tuple[Dict, Dict]:
+        """重新生成单个视频提示词 (默认绕过缓存以得到新结果)"""
         system_prompt = self.video_prompts_config.get("system", "")
         user_template = self.video_prompts_config.get("user_template", "")
-        return self._generate_single_video_prompt(shot, image_prompt, user_template, system_prompt)
+        return self._generate_single_video_prompt(shot, image_prompt, user_template, system_prompt, use_cache=use_cache)
 
     def _generate_single_image_prompt(
         self, 
@@ -121,7 +79,8 @@ class PromptGenerator:
         system_prompt: str, 
         style: str,
         characters: List[Dict] = None,
-        scenes: List[Dict] = None
+        scenes: List[Dict] = None,
+        use_cache: bool = False
     ) -> Tuple[Dict, Dict]:
         """Helper to generate single image prompt"""
         
@@ -183,7 +142,7 @@ class PromptGenerator:
         messages = [{"role": "user", "content": user_message}]
         
         logger.info(f"生成镜头 {shot.get('shot_number')} 图像提示词...")
-        response, token_usage = veadk_client.call_llm(messages, system_prompt)
+        response, token_usage = veadk_client.call_llm(messages, system_prompt, use_cache=use_cache)
         
         # Parse response
         prompt_data = self._parse_prompt(response, shot.get("shot_number", 0))
@@ -194,7 +153,8 @@ class PromptGenerator:
         storyboard: Dict, 
         style: str = "cinematic",
         characters: List[Dict] = None,
-        scenes: List[Dict] = None
+        scenes: List[Dict] = None,
+        project_id: str = None
     ) -> Tuple[List[Dict], Dict]:
         """
         Concurrency generate image prompts for all shots
@@ -206,25 +166,24 @@ class PromptGenerator:
         system_prompt = self.image_prompts_config.get("system", "")
         user_template = self.image_prompts_config.get("user_template", "")
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_index = {
-                executor.submit(self._generate_single_image_prompt, shot, user_template, system_prompt, style, characters, scenes): i
-                for i, shot in enumerate(shots)
-            }
-            
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    prompt_data, token_usage = future.result()
-                    all_prompts[index] = prompt_data
-                    total_tokens["prompt_tokens"] += token_usage.get("prompt_tokens", 0)
-                    total_tokens["completion_tokens"] += token_usage.get("completion_tokens", 0)
-                except Exception as e:
-                    logger.error(f"镜头 {shots[index].get('shot_number')} 图像提示词生成失败: {e}")
+        future_to_index = {
+            job_scheduler.submit(project_id, "llm", self._generate_single_image_prompt, shot, user_template, system_prompt, style, characters, scenes): i
+            for i, shot in enumerate(shots)
+        }
+
+        for future in as_completed(future_to_index):
+            index = future_to_index[future]
+            try:
+                prompt_data, token_usage = future.result()
+                all_prompts[index] = prompt_data
+                total_tokens["prompt_tokens"] += token_usage.get("prompt_tokens", 0)
+                total_tokens["completion_tokens"] += token_usage.get("completion_tokens", 0)
+            except Exception as e:
+                logger.error(f"镜头 {shots[index].get('shot_number')} 图像提示词生成失败: {e}")
 
         return [p for p in all_prompts if p], total_tokens
     
-    def _generate_single_video_prompt(self, shot: Dict, image_prompt: str, user_template: str, system_prompt: str) -> Tuple[Dict, Dict]:
+    def _generate_single_video_prompt(self, shot: Dict, image_prompt: str, user_template: str, system_prompt: str, use_cache: bool = False) -> Tuple[Dict, Dict]:
         """Helper to generate single video prompt"""
         user_message = user_template.format(
             shot_number=shot.get("shot_number", 0),
@@ -240,7 +199,7 @@ class PromptGenerator:
         messages = [{"role": "user", "content": user_message}]
         
         logger.info(f"生成镜头 {shot.get('shot_number')} 视频提示词...")
-        response, token_usage = veadk_client.call_llm(messages, system_prompt)
+        response, token_usage = veadk_client.call_llm(messages, system_prompt, use_cache=use_cache)
         
         prompt_data = self._parse_video_prompt(response, shot.get("shot_number", 0))
         return prompt_data, token_usage
@@ -248,7 +207,8 @@ class PromptGenerator:
     def generate_video_prompts(
         self, 
         storyboard: Dict, 
-        image_prompts: List[Dict]
+        image_prompts: List[Dict],
+        project_id: str = None
     ) -> Tuple[List[Dict], Dict]:
         """
         Concurrency generate video prompts for all shots
@@ -260,22 +220,21 @@ class PromptGenerator:
         system_prompt = self.video_prompts_config.get("system", "")
         user_template = self.video_prompts_config.get("user_template", "")
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_index = {}
-            for i, shot in enumerate(shots):
-                image_prompt = image_prompts[i].get("positive_prompt", "") if i < len(image_prompts) else ""
-                future = executor.submit(self._generate_single_video_prompt, shot, image_prompt, user_template, system_prompt)
-                future_to_index[future] = i
-            
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    prompt_data, token_usage = future.result()
-                    all_prompts[index] = prompt_data
-                    total_tokens["prompt_tokens"] += token_usage.get("prompt_tokens", 0)
-                    total_tokens["completion_tokens"] += token_usage.get("completion_tokens", 0)
-                except Exception as e:
-                    logger.error(f"镜头 {shots[index].get('shot_number')} 视频提示词生成失败: {e}")
+        future_to_index = {}
+        for i, shot in enumerate(shots):
+            image_prompt = image_prompts[i].get("positive_prompt", "") if i < len(image_prompts) else ""
+            future = job_scheduler.submit(project_id, "llm", self._generate_single_video_prompt, shot, image_prompt, user_template, system_prompt)
+            future_to_index[future] = i
+
+        for future in as_completed(future_to_index):
+            index = future_to_index[future]
+            try:
+                prompt_data, token_usage = future.result()
+                all_prompts[index] = prompt_data
+                total_tokens["prompt_tokens"] += token_usage.get("prompt_tokens", 0)
+                total_tokens["completion_tokens"] += token_usage.get("completion_tokens", 0)
+            except Exception as e:
+                logger.error(f"镜头 {shots[index].get('shot_number')} 视频提示词生成失败: {e}")
         
         return [p for p in all_prompts if p], total_tokens
     
@@ -320,3 +279,101 @@ class PromptGenerator:
                 "motion_intensity": "medium",
                 "camera_motion": "static"
             }
+
+
+class PromptPipeline:
+    """
+    提示词流水线：每提交一个镜头即作为一个 llm 任务交给全局调度器，依次生成图像、视频提示词
+    以分镜中的位置为键 (每个位置一份提示词)，finish() 按分镜顺序返回结果
+    """
+
+    def __init__(self, generator: PromptGenerator, style: str, characters: List[Dict] = None, scenes: List[Dict] = None,
+                 project_id: str = None):
+        self.generator = generator
+        self.project_id = project_id
+        self.style = style
+        self.characters = characters
+        self.scenes = scenes
+        self.img_sys = generator.image_prompts_config.get("system", "")
+        self.img_tpl = generator.image_prompts_config.get("user_template", "")
+        self.vid_sys = generator.video_prompts_config.get("system", "")
+        self.vid_tpl = generator.video_prompts_config.get("user_template", "")
+        self._lock = threading.Lock()
+        self._jobs = {}  # storyboard position -> (shot, future)
+        self._streamed = 0
+
+    def _process_shot(self, shot: Dict):
+        try:
+            # 1. Generate Image Prompt
+            # 内容、角色、场景均未变的镜头直接复用之前的提示词
+            img_p, img_t = self.generator._generate_single_image_prompt(
+                shot, self.img_tpl, self.img_sys, self.style, self.characters, self.scenes, use_cache=True
+            )
+            
+            # 2. Generate Video Prompt (using image prompt result)
+            img_content = img_p.get("positive_prompt", "")
+            vid_p, vid_t = self.generator._generate_single_video_prompt(shot, img_content, self.vid_tpl, self.vid_sys, use_cache=True)
+            
+            return img_p, vid_p, img_t, vid_t
+        except Exception as e:
+            logger.error(f"Shot {shot.get('shot_number')} prompt generation failed: {e}")
+            return None, None, {}, {}
+
+    def _submit_at(self, position: int, shot: Dict):
+        """(需持有锁) 为某个位置提交镜头；该位置已提交过不同内容时取消旧任务"""
+        current = self._jobs.get(position)
+        if current is not None:
+            if current[0] == shot:
+                return False
+            current[1].cancel()
+        self._jobs[position] = (shot, job_scheduler.submit(self.project_id, "llm", self._process_shot, shot))
+        return True
+
+    def submit(self, shot: Dict):
+        """按输出顺序提交下一个镜头 (线程安全，可作为分镜流的 on_shot 回调)"""
+        with self._lock:
+            self._submit_at(self._streamed, shot)
+            self._streamed += 1
+
+    def submit_missing(self, shots: List[Dict]) -> int:
+        """
+        对齐到最终分镜: 补交流式解析漏掉或内容不同的位置，取消多出的位置
+
+        Returns:
+            补交数量
+        """
+        with self._lock:
+            submitted = sum(1 for position, shot in enumerate(shots) if self._submit_at(position, shot))
+            for position in [p for p in self._jobs if p >= len(shots)]:
+                self._jobs.pop(position)[1].cancel()
+        return submitted
+
+    def cancel(self):
+        """放弃流水线：取消尚未开始的镜头任务 (已在执行的任务结果被丢弃)"""
+        with self._lock:
+            jobs, self._jobs = self._jobs, {}
+        for _, future in jobs.values():
+            future.cancel()
+
+    def finish(self) -> Tuple[List[Dict], List[Dict], Dict]:
+        """等待全部镜头完成，返回 (图像提示词, 视频提示词, Token使用情况)"""
+        all_image_prompts = []
+        all_video_prompts = []
+        total_tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+        with self._lock:
+            futures = [self._jobs[position][1] for position in sorted(self._jobs)]
+        for future in futures:
+            try:
+                img_res, vid_res, img_tok, vid_tok = future.result()
+            except Exception as e:
+                logger.error(f"Concurrent prompt generation error: {e}")
+                continue
+            if img_res:
+                all_image_prompts.append(img_res)
+                total_tokens["prompt_tokens"] += img_tok.get("prompt_tokens", 0)
+                total_tokens["completion_tokens"] += img_tok.get("completion_tokens", 0)
+            if vid_res:
+                all_video_prompts.append(vid_res)
+                total_tokens["prompt_tokens"] += vid_tok.get("prompt_tokens", 0)
+                total_tokens["completion_tokens"] += vid_tok.get("completion_tokens", 0)
+        return all_image_prompts, all_video_prompts, total_tokens
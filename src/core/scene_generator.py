@@ -4,21 +4,19 @@
 
 import json
 from typing import Dict, Tuple, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 from loguru import logger
 
 from ..models.veadk_client import veadk_client
 from ..utils.config_loader import config_loader
+from ..utils.job_scheduler import job_scheduler
 
 
 class SceneGenerator:
     """场景生成器"""
     
-    def __init__(self):
-        self.max_workers = config_loader.get("app.concurrency.prompt", 5)
-
     def reload_config(self):
-        self.max_workers = config_loader.get("app.concurrency.prompt", 5)
+        """并发由全局调度器控制 (app.job_scheduler)"""
     
     def generate(
         self, 
@@ -35,7 +33,7 @@ class SceneGenerator:
         messages = [{"role": "user", "content": user_message}]
         
         logger.info("开始提取场景设计...")
-        content, token_usage = veadk_client.call_llm(messages, system_prompt)
+        content, token_usage = veadk_client.call_llm(messages, system_prompt, use_cache=True)
         
         try:
             content = self._extract_json(content)
@@ -50,7 +48,8 @@ class SceneGenerator:
         self,
         scenes: List[Dict],
         style: str,
-        visual_style: str
+        visual_style: str,
+        project_id: str = None
     ) -> Tuple[List[Dict], Dict]:
         """
         为场景生成提示词 (并发版)
@@ -58,28 +57,27 @@ class SceneGenerator:
         updated_scenes = [None] * len(scenes)
         total_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
         
-        logger.info(f"开始并发生成场景提示词 (Workers: {self.max_workers})...")
-        
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_index = {
-                executor.submit(self.generate_single_prompt, scene, style, visual_style): i
-                for i, scene in enumerate(scenes)
-            }
-            
-            for future in as_completed(future_to_index):
-                i = future_to_index[future]
-                try:
-                    scene, usage = future.result()
-                    updated_scenes[i] = scene
-                    
-                    if usage:
-                        for k, v in usage.items():
-                            if k in total_usage and isinstance(v, (int, float)):
-                                total_usage[k] += v
-                except Exception as e:
-                    logger.error(f"场景 {scenes[i].get('name')} 提示词生成失败: {e}")
-                    updated_scenes[i] = scenes[i]
+        logger.info(f"开始并发生成场景提示词 ({len(scenes)} 个)...")
         
+        future_to_index = {
+            job_scheduler.submit(project_id, "llm", self.generate_single_prompt, scene, style, visual_style, use_cache=True): i
+            for i, scene in enumerate(scenes)
+        }
+
+        for future in as_completed(future_to_index):
+            i = future_to_index[future]
+            try:
+                scene, usage = future.result()
+                updated_scenes[i] = scene
+
+                if usage:
+                    for k, v in usage.items():
+                        if k in total_usage and isinstance(v, (int, float)):
+                            total_usage[k] += v
+            except Exception as e:
+                logger.error(f"场景 {scenes[i].get('name')} 提示词生成失败: {e}")
+                updated_scenes[i] = scenes[i]
+
         final_scenes = [s for s in updated_scenes if s is not None]
         return final_scenes, total_usage
 
@@ -87,7 +85,8 @@ class SceneGenerator:
         self,
         scene: Dict,
         style: str,
-        visual_style: str
+        visual_style: str,
+        use_cache: bool = False
     ) -> Tuple[Dict, Dict]:
         """
         为单个场景重新生成提示词
@@ -109,7 +108,7 @@ class SceneGenerator:
         messages = [{"role": "user", "content": user_message}]
         
         logger.info(f"开始重新生成场景提示词: {scene.get('name')}")
-        content, token_usage = veadk_client.call_llm(messages, system_prompt)
+        content, token_usage = veadk_client.call_llm(messages, system_prompt, use_cache=use_cache)
         
         try:
             content = self._extract_json(content)
@@ -7,6 +7,7 @@ from typing import Dict, Tuple
 from loguru import logger
 
 from ..models.veadk_client import veadk_client
+from ..models.async_veadk_client import async_veadk_client
 from ..utils.config_loader import config_loader
 
 
@@ -48,7 +49,8 @@ class ScriptGenerator:
         messages = [{"role": "user", "content": user_message}]
         
         logger.info(f"开始生成剧本: {topic}")
-        script, token_usage = veadk_client.call_llm(messages, system_prompt)
+        # 相同主题与设置的重跑 (如失败任务重试) 直接复用已有结果
+        script, token_usage = veadk_client.call_llm(messages, system_prompt, use_cache=True)
         
         return script, token_usage
     
@@ -63,6 +65,21 @@ class ScriptGenerator:
         Returns:
             (优化后的剧本, Token使用情况)
         """
+        messages, system_prompt = self._build_optimize_messages(original_script, feedback)
+        
+        logger.info("优化剧本中...")
+        optimized_script, token_usage = veadk_client.call_llm(messages, system_prompt)
+        
+        return optimized_script, token_usage
+    
+    async def aoptimize(self, original_script: str, feedback: str) -> Tuple[str, Dict]:
+        """根据反馈优化剧本 (异步，直接在事件循环上调用模型)"""
+        messages, system_prompt = self._build_optimize_messages(original_script, feedback)
+        
+        logger.info("优化剧本中 (async)...")
+        return await async_veadk_client.acall_llm(messages, system_prompt)
+    
+    def _build_optimize_messages(self, original_script: str, feedback: str) -> Tuple[list, str]:
         opt_prompts = config_loader.get_prompt("script_optimization")
         system_prompt = opt_prompts.get("system", "")
         user_template = opt_prompts.get("user_template", "")
@@ -72,9 +89,4 @@ class ScriptGenerator:
             feedback=feedback
         )
         
-        messages = [{"role": "user", "content": user_message}]
-        
-        logger.info("优化剧本中...")
-        optimized_script, token_usage = veadk_client.call_llm(messages, system_prompt)
-        
-        return optimized_script, token_usage
+        return [{"role": "user", "content": user_message}], system_prompt
@@ -4,11 +4,13 @@
 
 import json
 import re
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 from loguru import logger
 
 from ..models.veadk_client import veadk_client
+from ..models.async_veadk_client import async_veadk_client
 from ..utils.config_loader import config_loader
+from ..utils.json_stream import JsonArrayStreamParser
 
 
 class StoryboardGenerator:
@@ -27,21 +29,68 @@ class StoryboardGenerator:
         Returns:
             (分镜数据, Token使用情况)
         """
-        system_prompt = self.prompts.get("system", "")
-        user_template = self.prompts.get("user_template", "")
-        
-        user_message = user_template.format(script=script)
-        
-        messages = [{"role": "user", "content": user_message}]
+        messages, system_prompt = self._build_messages(script)
         
         logger.info("开始生成分镜...")
-        response, token_usage = veadk_client.call_llm(messages, system_prompt)
+        response, token_usage = veadk_client.call_llm(messages, system_prompt, use_cache=True)
         
         # 解析JSON
         storyboard = self._parse_storyboard(response)
         
         return storyboard, token_usage
     
+    async def agenerate(self, script: str) -> Tuple[Dict, Dict]:
+        """根据剧本生成分镜 (异步，直接在事件循环上调用模型)"""
+        messages, system_prompt = self._build_messages(script)
+        
+        logger.info("开始生成分镜 (async)...")
+        response, token_usage = await async_veadk_client.acall_llm(messages, system_prompt, use_cache=True)
+        
+        return self._parse_storyboard(response), token_usage
+    
+    def generate_stream(self, script: str, on_shot: Callable[[Dict], None] = None) -> Tuple[Dict, Dict]:
+        """
+        流式生成分镜，每个镜头 JSON 闭合后立即回调 on_shot
+
+        Args:
+            script: 剧本内容
+            on_shot: 镜头回调 (按输出顺序调用，在模型调用线程中执行)
+
+        Returns:
+            (分镜数据, Token使用情况)；流中途失败时 Token使用情况带 "error"，分镜不可用
+        """
+        messages, system_prompt = self._build_messages(script)
+        parser = JsonArrayStreamParser("shots")
+
+        def on_delta(delta: str):
+            for shot in parser.feed(delta):
+                logger.debug(f"分镜流: 镜头 {shot.get('shot_number')} 已完成")
+                if on_shot:
+                    on_shot(shot)
+
+        logger.info("开始生成分镜 (stream)...")
+        response, token_usage = veadk_client.call_llm_stream(messages, system_prompt, on_delta=on_delta, use_cache=True)
+
+        if token_usage.get("error"):
+            # Cut off mid-stream: the shots closed so far are only a prefix of the storyboard
+            logger.error(f"分镜流中断 (已解析 {len(parser.items)} 个镜头): {token_usage['error']}")
+            return {"title": "未知", "total_shots": 0, "shots": [], "raw_response": response}, token_usage
+
+        storyboard = self._parse_storyboard(response)
+        if not storyboard.get("shots") and parser.items:
+            # The stream completed but the full text does not parse (e.g. trailing prose): keep the dispatched shots
+            logger.warning(f"分镜完整解析失败，保留流式解析出的 {len(parser.items)} 个镜头")
+            storyboard.update({"shots": list(parser.items), "total_shots": len(parser.items)})
+        return storyboard, token_usage
+
+    def _build_messages(self, script: str) -> Tuple[List[Dict], str]:
+        system_prompt = self.prompts.get("system", "")
+        user_template = self.prompts.get("user_template", "")
+        
+        user_message = user_template.format(script=script)
+        
+        return [{"role": "user", "content": user_message}], system_prompt
+    
     def _parse_storyboard(self, response: str) -> Dict:
         """解析分镜JSON"""
         try:
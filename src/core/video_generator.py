@@ -4,14 +4,16 @@
 
 import os
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 from loguru import logger
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 
 from ..models.veadk_client import veadk_client
 from ..utils.tos_client import tos_client
 from ..utils.config_loader import config_loader
+from ..utils.http_transport import http_transport
+from ..utils.job_scheduler import job_scheduler
 
 class VideoGenerator:
     """视频生成器"""
@@ -25,12 +27,14 @@ class VideoGenerator:
 
     def reload_config(self):
         """重新加载配置"""
-        self.max_workers = config_loader.get("app.concurrency.video", 3)
-        logger.info(f"VideoGenerator 配置已更新, max_workers={self.max_workers}")
+        logger.info("VideoGenerator 配置已更新")
     
-    def submit_single_video_task(self, params: Dict, project_id: str) -> Dict:
+    def submit_single_video_task(self, params: Dict, project_id: str, callback_ref: str = None) -> Dict:
         """
         提交单个视频生成任务到云端，返回任务信息
+
+        Args:
+            callback_ref: 记录该任务的 VideoTask ID (完成回调签名绑定此 ID)
         """
         shot_number = params.get("shot_number")
         image_path = params.get("image_path")
@@ -73,7 +77,8 @@ class VideoGenerator:
                 duration=duration, 
                 image_url=image_url,
                 resolution=resolution,
-                ratio=ratio
+                ratio=ratio,
+                callback_ref=callback_ref
             )
             
             if task_id:
@@ -87,9 +92,13 @@ class VideoGenerator:
         else:
             return {"error": "No image URL available"}
 
-    def process_completed_video(self, video_url: str, project_id: str, shot_number: int) -> Tuple[Optional[str], Optional[str]]:
+    def process_completed_video(self, video_url: str, project_id: str, shot_number: int,
+                                on_progress: Callable[[str, int, int], None] = None) -> Tuple[Optional[str], Optional[str]]:
         """
         处理已完成的视频：保存到本地，确保TOS上有
+
+        Args:
+            on_progress: 进度回调 (stage, bytes_done, bytes_total)，stage 为 download / upload
         Returns: (final_video_path_or_url, error)
         """
         project_dir = self.output_dir / project_id / "videos"
@@ -102,15 +111,21 @@ class VideoGenerator:
         
         # Save to local
         try:
-            import requests
-            with requests.get(video_url, stream=True) as r:
+            with http_transport.get(video_url, stream=True) as r:
                 r.raise_for_status()
+                total = int(r.headers.get("Content-Length") or 0)
+                done = 0
                 with open(video_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
+                    for chunk in r.iter_content(chunk_size=65536):
                         f.write(chunk)
+                        done += len(chunk)
+                        if on_progress:
+                            on_progress("download", done, total)
             logger.info(f"镜头 {shot_number} 视频已下载至: {video_path}")
         except Exception as e:
             logger.error(f"视频下载失败: {e}")
+            # A truncated file must not be uploaded as the result
+            video_path.unlink(missing_ok=True)
             # If download fails, we might still return the URL if it's accessible?
             # But subsequent steps (merge) need local file usually.
             # But let's try to upload URL to TOS directly if local save failed?
@@ -126,6 +141,8 @@ class VideoGenerator:
             key = f"{bucket_dir}{project_id}/videos/{filename}"
             
             try:
+                if on_progress:
+                    on_progress("upload", 0, video_path.stat().st_size if video_path.exists() else 0)
                 if video_path.exists():
                     with open(video_path, 'rb') as f:
                         final_url = tos_client.upload_content(bucket, key, f.read())
@@ -214,8 +231,7 @@ class VideoGenerator:
             # Always save to local first
             video_path = project_dir / filename
             try:
-                import requests
-                with requests.get(video_url, stream=True) as r:
+                with http_transport.get(video_url, stream=True) as r:
                     r.raise_for_status()
                     with open(video_path, 'wb') as f:
                         for chunk in r.iter_content(chunk_size=8192):
@@ -281,42 +297,41 @@ class VideoGenerator:
         shots = storyboard.get("shots", [])
         results = [None] * len(image_paths)
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_index = {}
-            for i, (image_path, prompt_data) in enumerate(zip(image_paths, video_prompts)):
-                if image_path is None:
-                    continue
-                
-                shot_number = prompt_data.get("shot_number", i + 1)
-                duration = shots[i].get("duration", 5) if i < len(shots) else 5
-                
-                params = {
-                    "shot_number": shot_number,
-                    "image_path": image_path,
-                    "video_prompt": prompt_data.get("video_prompt", ""),
-                    "duration": duration,
-                    "resolution": resolution,
-                    "ratio": ratio
-                }
-                
-                future = executor.submit(self.submit_single_video_task, params, project_id)
-                future_to_index[future] = i
-            
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    res = future.result()
-                    # Add shot info
-                    res["index"] = index
-                    # Ensure shot_number is present
-                    if "shot_number" not in res:
-                         # Try to recover from prompts
-                         res["shot_number"] = video_prompts[index].get("shot_number", index + 1)
-                    results[index] = res
-                except Exception as e:
-                    logger.error(f"Batch submit failed for index {index}: {e}")
-                    results[index] = {"error": str(e), "index": index, "shot_number": index+1}
-                    
+        future_to_index = {}
+        for i, (image_path, prompt_data) in enumerate(zip(image_paths, video_prompts)):
+            if image_path is None:
+                continue
+
+            shot_number = prompt_data.get("shot_number", i + 1)
+            duration = shots[i].get("duration", 5) if i < len(shots) else 5
+
+            params = {
+                "shot_number": shot_number,
+                "image_path": image_path,
+                "video_prompt": prompt_data.get("video_prompt", ""),
+                "duration": duration,
+                "resolution": resolution,
+                "ratio": ratio
+            }
+
+            future = job_scheduler.submit(project_id, "video_submit", self.submit_single_video_task, params, project_id)
+            future_to_index[future] = i
+
+        for future in as_completed(future_to_index):
+            index = future_to_index[future]
+            try:
+                res = future.result()
+                # Add shot info
+                res["index"] = index
+                # Ensure shot_number is present
+                if "shot_number" not in res:
+                     # Try to recover from prompts
+                     res["shot_number"] = video_prompts[index].get("shot_number", index + 1)
+                results[index] = res
+            except Exception as e:
+                logger.error(f"Batch submit failed for index {index}: {e}")
+                results[index] = {"error": str(e), "index": index, "shot_number": index+1}
+
         return results
 
     def generate_shot_videos(
@@ -351,76 +366,75 @@ class VideoGenerator:
         project_dir = self.output_dir / project_id / "videos"
         project_dir.mkdir(parents=True, exist_ok=True)
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_index = {}
-            for i, (image_path, prompt_data) in enumerate(zip(image_paths, video_prompts)):
-                if image_path is None:
-                    continue
-                
-                shot_number = prompt_data.get("shot_number", i + 1)
-                
-                # Update status
+        future_to_index = {}
+        for i, (image_path, prompt_data) in enumerate(zip(image_paths, video_prompts)):
+            if image_path is None:
+                continue
+
+            shot_number = prompt_data.get("shot_number", i + 1)
+
+            # Update status
+            if on_status_update:
+                on_status_update(f"shot_status_video_{shot_number}", "processing", None)
+
+            duration = shots[i].get("duration", 5) if i < len(shots) else 5
+
+            params = {
+                "shot_number": shot_number,
+                "image_path": image_path,
+                "video_prompt": prompt_data.get("video_prompt", ""),
+                "duration": duration,
+                "resolution": resolution,
+                "ratio": ratio
+            }
+
+            # Add ratio/resolution from project config? 
+            # Ideally we should pass them. But generate_shot_videos doesn't take them as args.
+            # However, the user requirement says "take resolution... ratio... from project settings".
+            # I should update generate_shot_videos signature to accept these.
+
+            future = job_scheduler.submit(project_id, "video_submit", self._generate_single_video, params, project_dir)
+            future_to_index[future] = i
+
+        for future in as_completed(future_to_index):
+            index = future_to_index[future]
+            try:
+                shot_num, path, usage = future.result()
+
+                status = "failed"
+                extra = None
+                if path:
+                    status = "completed"
+                    video_paths[index] = path
+                    extra = {"path": path, "index": index, "shot_number": shot_num}
+                else:
+                    # Pass error info
+                    extra = {
+                        "error": usage.get("error", "Generation failed"), 
+                        "request_id": usage.get("request_id", "unknown"),
+                        "shot_number": shot_num,
+                        "index": index
+                    }
+
+                # Update status for specific shot
                 if on_status_update:
-                    on_status_update(f"shot_status_video_{shot_number}", "processing", None)
-                
-                duration = shots[i].get("duration", 5) if i < len(shots) else 5
-                
-                params = {
-                    "shot_number": shot_number,
-                    "image_path": image_path,
-                    "video_prompt": prompt_data.get("video_prompt", ""),
-                    "duration": duration,
-                    "resolution": resolution,
-                    "ratio": ratio
-                }
-                
-                # Add ratio/resolution from project config? 
-                # Ideally we should pass them. But generate_shot_videos doesn't take them as args.
-                # However, the user requirement says "take resolution... ratio... from project settings".
-                # I should update generate_shot_videos signature to accept these.
-                
-                future = executor.submit(self._generate_single_video, params, project_dir)
-                future_to_index[future] = i
-            
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
+                    on_status_update(f"shot_status_video_{shot_num}", status, extra)
+
+                total_api_calls += usage.get("api_calls", 1)
+            except Exception as e:
+                logger.error(f"Video generation failed for index {index}: {e}")
+                # We can't easily get shot_num if exception happens before return, but future result raises exception
+                # so we don't know shot_num unless we store it.
+                # But we can infer from index if prompts are ordered? 
+                # shot_num usually corresponds to index+1 if strictly ordered.
+                # Let's try to get shot_num from video_prompts[index]
                 try:
-                    shot_num, path, usage = future.result()
-                    
-                    status = "failed"
-                    extra = None
-                    if path:
-                        status = "completed"
-                        video_paths[index] = path
-                        extra = {"path": path, "index": index, "shot_number": shot_num}
-                    else:
-                        # Pass error info
-                        extra = {
-                            "error": usage.get("error", "Generation failed"), 
-                            "request_id": usage.get("request_id", "unknown"),
-                            "shot_number": shot_num,
-                            "index": index
-                        }
-                    
-                    # Update status for specific shot
+                    shot_num_err = video_prompts[index].get("shot_number", index + 1)
                     if on_status_update:
-                        on_status_update(f"shot_status_video_{shot_num}", status, extra)
-                    
-                    total_api_calls += usage.get("api_calls", 1)
-                except Exception as e:
-                    logger.error(f"Video generation failed for index {index}: {e}")
-                    # We can't easily get shot_num if exception happens before return, but future result raises exception
-                    # so we don't know shot_num unless we store it.
-                    # But we can infer from index if prompts are ordered? 
-                    # shot_num usually corresponds to index+1 if strictly ordered.
-                    # Let's try to get shot_num from video_prompts[index]
-                    try:
-                        shot_num_err = video_prompts[index].get("shot_number", index + 1)
-                        if on_status_update:
-                            on_status_update(f"shot_status_video_{shot_num_err}", "failed", None)
-                    except:
-                        pass
-        
+                        on_status_update(f"shot_status_video_{shot_num_err}", "failed", None)
+                except:
+                    pass
+
         return video_paths, {"api_calls": total_api_calls}
     
     def _create_static_video(
@@ -452,8 +466,7 @@ class VideoGenerator:
                         content = obj.read()
                     else:
                         # Public URL fallback
-                        import requests
-                        resp = requests.get(image_path)
+                        resp = http_transport.get(image_path)
                         resp.raise_for_status()
                         content = resp.content
                         
@@ -571,8 +584,7 @@ class VideoGenerator:
             timestamp = int(time.time() * 1000)
             video_path = project_dir / f"shot_{shot_number:03d}_{timestamp}.mp4"
             try:
-                import requests
-                with requests.get(video_url, stream=True) as r:
+                with http_transport.get(video_url, stream=True) as r:
                     r.raise_for_status()
                     with open(video_path, 'wb') as f:
                         for chunk in r.iter_content(chunk_size=8192):
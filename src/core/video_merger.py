@@ -4,7 +4,6 @@
 
 import os
 import tempfile
-import requests
 import uuid
 from pathlib import Path
 from typing import List, Optional, Tuple
@@ -12,6 +11,7 @@ from loguru import logger
 
 from ..utils.config_loader import config_loader
 from ..utils.tos_client import tos_client
+from ..utils.http_transport import http_transport
 
 class VideoMerger:
     """视频拼接器"""
@@ -65,7 +65,7 @@ class VideoMerger:
                                 p = signed_url
                         
                         logger.info(f"Downloading video part: {p[:50]}...")
-                        with requests.get(p, stream=True) as r:
+                        with http_transport.get(p, stream=True) as r:
                             r.raise_for_status()
                             tf = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
                             for chunk in r.iter_content(chunk_size=8192):
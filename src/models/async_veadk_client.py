@@ -0,0 +1,305 @@
+"""
+火山引擎 VEADK 异步客户端模块
+基于 aiohttp，在事件循环上发起模型调用，返回约定与 VEADKClient 保持一致
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+
+from .veadk_client import VEADKClient, ModelCallError, veadk_client, NON_IDEMPOTENT_OPS
+from ..utils.config_loader import config_loader
+from ..utils.http_transport import http_transport
+from ..utils.rate_limiter import rate_limiter
+from ..utils.llm_cache import llm_cache
+from ..utils.circuit_breaker import circuit_breakers
+from ..utils.metrics import metrics
+
+
+class AsyncVEADKClient:
+    """火山引擎 VEADK 异步客户端 (复用同步客户端的配置与请求构建逻辑)"""
+
+    def __init__(self, client: VEADKClient = None):
+        self.client = client or veadk_client
+        # aiohttp sessions are bound to the loop they were created on
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=http_transport.pool_maxsize,
+                limit_per_host=http_transport.pool_maxsize,
+                keepalive_timeout=60
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[loop] = session
+        return session
+
+    @asynccontextmanager
+    async def _arequest(self, method: str, url: str, model_id: str, timeout: float, remaining: float = None, **kwargs):
+        """经进程级限流器发送请求 (与同步客户端共享配额；remaining 限制限流排队时长)"""
+        session = self._get_session()
+        async with rate_limiter.alimit(self.client.current_platform, model_id, timeout=remaining) as slot:
+            async with session.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as response:
+                slot.record(response.status, response.headers)
+                if response.status == 429:
+                    logger.warning(f"Model {model_id} throttled (429), Retry-After: {response.headers.get('Retry-After')}")
+                yield response
+
+    def _classify_error(self, e: Exception) -> ModelCallError:
+        """aiohttp 异常分类，其余交给同步客户端的分类规则"""
+        if isinstance(e, aiohttp.ClientResponseError):
+            return ModelCallError.from_status(e.status, str(e), e.headers)
+        if isinstance(e, asyncio.TimeoutError):
+            return ModelCallError(str(e) or e.__class__.__name__, retryable=True, error_class="timeout")
+        if isinstance(e, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+            return ModelCallError(str(e) or e.__class__.__name__, retryable=True, error_class="network")
+        return self.client._classify_error(e)
+
+    def _not_sent(self, e: Exception) -> bool:
+        """连接阶段失败 (DNS/拒绝连接/TLS 握手)，请求确定没有发出"""
+        if isinstance(e, (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)):
+            return True
+        return self.client._not_sent(e)
+
+    def _should_retry(self, op: str, e: Exception, err: ModelCallError) -> bool:
+        """同同步客户端: 非幂等操作只重试连接阶段失败与 429"""
+        if op not in NON_IDEMPOTENT_OPS:
+            return err.retryable
+        return err.status_code == 429 or self._not_sent(e)
+
+    def _is_outage(self, e: Exception) -> bool:
+        err = self._classify_error(e)
+        return err.retryable and err.status_code != 429
+
+    async def _raise_for_status(self, response: aiohttp.ClientResponse, req_id: str = "unknown"):
+        if response.status != 200:
+            text = await response.text()
+            raise ModelCallError.from_status(response.status, f"HTTP {response.status}: {text}", response.headers, req_id)
+
+    async def _acall_with_retry(self, op: str, attempt_fn, model_id: str = ""):
+        """异步版重试执行器 (策略与指标同同步客户端)"""
+        policy = self.client._retry_policy(op)
+        breaker = circuit_breakers.get(op)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy["deadline"]
+        attempt = 0
+        with metrics.track(self.client.current_platform, model_id, op) as call:
+            while True:
+                attempt += 1
+                remaining = max(1.0, deadline - loop.time())
+                try:
+                    with breaker.guard(self._is_outage):
+                        result = await attempt_fn(remaining)
+                    call.attempts(attempt)
+                    return result, attempt
+                except Exception as e:
+                    err = self._classify_error(e)
+                    err.attempts = attempt
+                    err.retryable = self._should_retry(op, e, err)
+                    call.error(err.error_class)
+                    delay = self.client._backoff_delay(policy, attempt, err.retry_after)
+                    if not err.retryable or attempt >= policy["max_attempts"] or loop.time() + delay >= deadline:
+                        call.attempts(attempt)
+                        call.fail()
+                        if err is e:
+                            raise
+                        raise err from e
+                    logger.warning(f"{op} attempt {attempt} failed ({err}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    async def close(self):
+        """关闭当前事件循环上的会话"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.pop(loop, None)
+        if session and not session.closed:
+            await session.close()
+
+    async def acall_llm(self, messages: List[Dict], system_prompt: str = None, use_cache: bool = False) -> Tuple[str, Dict]:
+        """
+        调用大语言模型 (异步)，缓存语义同 VEADKClient.call_llm
+
+        Returns:
+            (响应内容, Token使用情况 + attempts；失败时含 error)
+        """
+        request = self.client._build_llm_request(messages, system_prompt)
+        if not request:
+            logger.error("LLM配置不完整")
+            return "", {"prompt_tokens": 0, "completion_tokens": 0}
+        url, payload = request
+
+        loop = asyncio.get_running_loop()
+        cache_key = self.client._llm_cache_key(payload, system_prompt, messages)
+        if cache_key and use_cache:
+            # Cache backends do blocking I/O (Redis socket / disk)
+            cached = await loop.run_in_executor(None, llm_cache.get, cache_key)
+            if cached:
+                logger.info(f"LLM缓存命中: {payload['model']} ({cache_key[:12]})")
+                metrics.inc("model_cache_hits_total", platform=self.client.current_platform, model_id=payload["model"], operation="llm")
+                return cached[0], {"prompt_tokens": 0, "completion_tokens": 0, "cached": True}
+
+        async def attempt(timeout):
+            async with self._arequest("POST", url, payload["model"], min(180, timeout), remaining=timeout,
+                                      json=payload, headers=self.client._auth_headers()) as response:
+                await self._raise_for_status(response)
+                result = await response.json(content_type=None)
+            return self.client._parse_llm_result(result)
+
+        try:
+            logger.info(f"调用LLM (async): {payload['model']}")
+            (content, token_usage), attempts = await self._acall_with_retry("llm", attempt, payload["model"])
+            token_usage["attempts"] = attempts
+            metrics.record_tokens(self.client.current_platform, payload["model"], "llm",
+                                  token_usage["prompt_tokens"], token_usage["completion_tokens"])
+            logger.info(f"LLM响应成功，Token: {token_usage}")
+            if cache_key and content:
+                await loop.run_in_executor(None, llm_cache.set, cache_key, content, token_usage)
+            return content, token_usage
+
+        except ModelCallError as e:
+            logger.error(f"LLM调用失败 (attempts={e.attempts}): {e}")
+            if config_loader.get("app.llm_mock_on_error", False):
+                # 模拟响应（开发测试用）
+                return self.client._mock_llm_response(messages), {"prompt_tokens": 100, "completion_tokens": 200, "attempts": e.attempts}
+            return "", {"prompt_tokens": 0, "completion_tokens": 0, "attempts": e.attempts, "error": str(e)}
+
+    async def agenerate_image(self, prompt: str, negative_prompt: str = "", width: int = 1280, height: int = 720, image_urls: List[str] = None) -> Tuple[Optional[str], Dict]:
+        """
+        生成图像 (异步)
+
+        Returns:
+            (图像URL, API使用情况)
+        """
+        logger.info(f"生成图像 (async): {prompt[:50]}...")
+        url, payload = self.client._build_image_request(prompt, width, height, image_urls)
+
+        async def attempt(timeout):
+            async with self._arequest("POST", url, payload["model"], min(60, timeout), remaining=timeout,
+                                      json=payload, headers=self.client._auth_headers()) as response:
+                req_id = response.headers.get("X-Tt-Logid", "unknown")
+                if response.status != 200:
+                    text = await response.text()
+                    logger.error(f"Image generation error {response.status}: {text}")
+                    try:
+                        error_detail = json.loads(text)
+                    except ValueError:
+                        error_detail = text
+                    raise ModelCallError.from_status(
+                        response.status, f"HTTP {response.status}: {error_detail}", response.headers, req_id
+                    )
+                result = await response.json(content_type=None)
+            return self.client._parse_image_result(result, payload, req_id)
+
+        try:
+            (image_url, usage), attempts = await self._acall_with_retry("image", attempt, payload["model"])
+            usage["attempts"] = attempts
+            return image_url, usage
+
+        except ModelCallError as e:
+            logger.error(f"图像生成失败 (attempts={e.attempts}): {e}")
+            return None, {"api_calls": 1, "attempts": e.attempts, "error": str(e), "request_id": e.request_id}
+
+    async def asubmit_video_task(self, image_path: str = None, prompt: str = "", duration: int = 5, resolution: str = None, ratio: str = None, image_url: str = None, callback_ref: str = None) -> Tuple[Optional[str], Dict]:
+        """
+        提交视频生成任务 (异步，仅提交不等待)
+
+        Returns:
+            (task_id (Optional), API使用情况/错误信息)
+        """
+        if not self.client._base_url("video"):
+            logger.error("视频生成配置不完整")
+            return None, {"error": "Configuration incomplete: base_url missing"}
+
+        # Signing is local, but a local image_path means a blocking TOS upload
+        loop = asyncio.get_running_loop()
+        final_image_url, error_usage = await loop.run_in_executor(
+            None, self.client._resolve_video_image_url, image_path, image_url
+        )
+        if error_usage:
+            return None, error_usage
+
+        endpoint, payload = self.client._build_video_request(final_image_url, prompt, duration, ratio, callback_ref)
+        logger.info(f"Submitting video task (async): model={payload.get('model')}, duration={duration}, ratio={ratio}")
+
+        async def attempt(timeout):
+            async with self._arequest("POST", endpoint, payload["model"], min(60, timeout), remaining=timeout,
+                                      json=payload, headers=self.client._auth_headers()) as response:
+                req_id = response.headers.get("X-Tt-Logid", "unknown")
+                if response.status != 200:
+                    text = await response.text()
+                    logger.error(f"视频生成 API 错误: {text} (ReqID: {req_id})")
+                    if response.status == 400:
+                        raise ModelCallError(f"API Error 400: {text}", status_code=400, request_id=req_id)
+                    raise ModelCallError.from_status(response.status, f"HTTP {response.status}: {text}", response.headers, req_id)
+                return await response.json(content_type=None), req_id
+
+        try:
+            (result, req_id), attempts = await self._acall_with_retry("video_submit", attempt, payload["model"])
+        except ModelCallError as e:
+            logger.error(f"视频任务提交失败 (attempts={e.attempts}): {e}")
+            return None, {"api_calls": 1, "attempts": e.attempts, "error": str(e), "request_id": e.request_id}
+
+        task_id = self.client._parse_video_task_id(result)
+        if not task_id:
+            logger.error(f"Failed to get task_id from response: {result}")
+            return None, {"api_calls": 1, "attempts": attempts, "error": "No task_id in response"}
+
+        logger.info(f"Video task submitted, ID: {task_id}")
+        return task_id, {
+            "api_calls": 1, "attempts": attempts, "request_id": req_id, "model": payload["model"],
+            "callback": "callback_url" in payload
+        }
+
+    async def acheck_video_task_status(self, task_id: str) -> Tuple[str, Optional[str], Optional[str]]:
+        """
+        检查视频任务状态 (异步)
+        Returns: (status, video_url, error_msg)
+        status: SUCCEEDED, FAILED, RUNNING, UNKNOWN
+        """
+        endpoint = f"{self.client._base_url('video')}/contents/generations/tasks/{task_id}"
+
+        async def attempt(timeout):
+            async with self._arequest("GET", endpoint, self.client._video_status_limit_key(), min(30, timeout), remaining=timeout,
+                                      headers=self.client._auth_headers()) as response:
+                await self._raise_for_status(response)
+                result = await response.json(content_type=None)
+            return self.client._parse_video_status(result)
+
+        try:
+            result, _ = await self._acall_with_retry("video_status", attempt, self.client._video_model_id())
+            return result
+
+        except ModelCallError as e:
+            logger.error(f"Check task status failed (attempts={e.attempts}): {e}")
+            return "UNKNOWN", None, str(e)
+
+    async def alist_video_task_status(self, task_ids: List[str]) -> Dict[str, Tuple[str, Optional[str], Optional[str]]]:
+        """
+        批量查询视频任务状态 (异步，一次请求)
+
+        Returns:
+            {task_id: (status, video_url, error_msg)}；响应中缺失的任务不出现在结果里
+        Raises:
+            ModelCallError: 列表接口不可用时由调用方回退为逐个查询
+        """
+        url, params = self.client._build_video_list_request(task_ids)
+
+        async def attempt(timeout):
+            async with self._arequest("GET", url, self.client._video_status_limit_key(), min(30, timeout), remaining=timeout,
+                                      params=params, headers=self.client._auth_headers()) as response:
+                await self._raise_for_status(response)
+                result = await response.json(content_type=None)
+            return self.client._parse_video_list(result)
+
+        result, _ = await self._acall_with_retry("video_status", attempt, self.client._video_model_id())
+        return result
+
+
+# 全局异步客户端实例
+async_veadk_client = AsyncVEADKClient()
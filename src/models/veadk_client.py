@@ -7,8 +7,10 @@ import os
 import json
 import base64
 import time
+import random
 import requests
-from typing import Dict, Any, Optional, List, Tuple
+import urllib3
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from pathlib import Path
 from loguru import logger
 import hashlib
@@ -17,6 +19,49 @@ from datetime import datetime, timezone
 from volcenginesdkarkruntime import Ark
 
 from ..utils.config_loader import config_loader
+from ..utils.http_transport import http_transport
+from ..utils.rate_limiter import rate_limiter, RateLimitTimeout, parse_retry_after
+from ..utils.llm_cache import llm_cache
+from ..utils.circuit_breaker import circuit_breakers, CircuitOpenError
+from ..utils.metrics import metrics
+from ..utils.video_callback import video_callback
+
+# 可重试的 HTTP 状态码 (限流 / 服务端瞬时故障)
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# 非幂等的计费提交: 请求可能已被受理 (读超时/连接中断/5xx) 时不重发，避免重复出图、重复建任务
+NON_IDEMPOTENT_OPS = {"image", "video_submit"}
+
+
+class ModelCallError(Exception):
+    """模型调用失败 (携带可重试分类与尝试次数)"""
+
+    def __init__(self, message: str, retryable: bool = False, status_code: int = None,
+                 request_id: str = "unknown", retry_after: float = None, error_class: str = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+        self.request_id = request_id
+        self.retry_after = retry_after
+        self.attempts = 0
+        self.error_class = error_class or self._class_from_status(status_code)
+
+    @staticmethod
+    def _class_from_status(status_code: Optional[int]) -> str:
+        """指标用错误类别"""
+        if status_code == 429:
+            return "rate_limited"
+        if status_code is not None and status_code >= 500:
+            return "server_error"
+        if status_code is not None and status_code >= 400:
+            return "client_error"
+        return "other"
+
+    @classmethod
+    def from_status(cls, status_code: int, message: str, headers: Dict = None, request_id: str = "unknown"):
+        retry_after = parse_retry_after(headers.get("Retry-After")) if headers is not None else None
+        return cls(message, retryable=status_code in RETRYABLE_STATUS, status_code=status_code,
+                   request_id=request_id, retry_after=retry_after)
 
 
 class VEADKClient:
@@ -79,24 +124,147 @@ class VEADKClient:
         
         return headers
     
-    def call_llm(self, messages: List[Dict], system_prompt: str = None) -> Tuple[str, Dict]:
+    def _auth_headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    def _video_model_id(self) -> str:
+        return self.models.get("video", {}).get("model_id", "")
+
+    def _video_status_limit_key(self) -> str:
+        # Status queries have their own quota, separate from generation
+        return f"{self._video_model_id()}/status"
+
+    def _send(self, method: str, url: str, model_id: str, remaining: float = None, **kwargs) -> requests.Response:
+        """经进程级限流器发送模型请求 (remaining: 本次调用剩余的截止时间，限制限流排队时长)"""
+        with rate_limiter.limit(self.current_platform, model_id, timeout=remaining) as slot:
+            response = http_transport.request(method, url, **kwargs)
+            slot.record(response.status_code, response.headers)
+        if response.status_code == 429:
+            logger.warning(f"Model {model_id} throttled (429), Retry-After: {response.headers.get('Retry-After')}")
+        return response
+
+    def _retry_policy(self, op: str) -> Dict[str, float]:
+        """读取重试策略 (app.retry，可按操作覆盖)"""
+        conf = config_loader.get("app.retry", {}) or {}
+        default_deadlines = {"llm": 420, "image": 240, "video_submit": 180, "video_status": 45}
+        policy = {
+            "max_attempts": int(conf.get("max_attempts", 4)),
+            "base_delay": float(conf.get("base_delay", 1.0)),
+            "max_delay": float(conf.get("max_delay", 20.0)),
+            "deadline": float(default_deadlines.get(op, 180)),
+        }
+        policy.update((conf.get("operations") or {}).get(op) or {})
+        return policy
+
+    def _classify_error(self, e: Exception) -> ModelCallError:
+        """将异常分为可重试 (网络/限流/5xx) 与致命 (4xx/配置) 两类"""
+        if isinstance(e, ModelCallError):
+            return e
+        if isinstance(e, RateLimitTimeout):
+            return ModelCallError(str(e), retryable=False, error_class="rate_limit_wait")
+        if isinstance(e, CircuitOpenError):
+            return ModelCallError(str(e), retryable=False, error_class="circuit_open")
+        if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+            return ModelCallError.from_status(
+                e.response.status_code, str(e), e.response.headers,
+                e.response.headers.get("X-Tt-Logid", "unknown")
+            )
+        if isinstance(e, requests.exceptions.Timeout):
+            return ModelCallError(str(e), retryable=True, error_class="timeout")
+        if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+            return ModelCallError(str(e), retryable=True, error_class="network")
+        if isinstance(e, ValueError):
+            # Truncated / malformed JSON body
+            return ModelCallError(f"Invalid response body: {e}", retryable=True, error_class="invalid_response")
+        return ModelCallError(str(e), retryable=False)
+
+    def _not_sent(self, e: Exception) -> bool:
+        """请求是否确定没有到达服务端 (建立连接阶段失败)"""
+        if isinstance(e, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(e, requests.exceptions.ConnectionError) and not isinstance(e, requests.exceptions.SSLError):
+            # DNS failure / connection refused; a reset after the request went out is ProtocolError instead
+            reason = getattr(e.args[0], "reason", None) if e.args else None
+            return isinstance(reason, urllib3.exceptions.NewConnectionError)
+        return False
+
+    def _should_retry(self, op: str, e: Exception, err: ModelCallError) -> bool:
+        """非幂等操作只重试连接阶段失败与 429 (服务端未受理)，其余按错误分类"""
+        if op not in NON_IDEMPOTENT_OPS:
+            return err.retryable
+        return err.status_code == 429 or self._not_sent(e)
+
+    def _is_outage(self, e: Exception) -> bool:
+        """熔断计数：只有网络错误、超时和 5xx 计为端点故障 (429 由限流器处理，4xx 说明端点可用)"""
+        err = self._classify_error(e)
+        return err.retryable and err.status_code != 429
+
+    def _backoff_delay(self, policy: Dict[str, float], attempt: int, retry_after: float = None) -> float:
+        """指数退避 + 全抖动；服务端给出 Retry-After 时取较大值"""
+        cap = min(policy["max_delay"], policy["base_delay"] * (2 ** (attempt - 1)))
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _call_with_retry(self, op: str, attempt_fn, model_id: str = "") -> Tuple[Any, int]:
         """
-        调用大语言模型
-        
+        在单次调用截止时间内按策略重试，并记录调用指标
+
         Args:
-            messages: 消息列表
-            system_prompt: 系统提示词
-        
+            op: 操作名 (llm / image / video_submit / video_status)
+            attempt_fn: 执行一次请求的函数，参数为本次可用的超时秒数
+            model_id: 指标标签
+
         Returns:
-            (响应内容, Token使用情况)
+            (attempt_fn 的结果, 尝试次数)；最终失败时抛出 ModelCallError
         """
+        policy = self._retry_policy(op)
+        breaker = circuit_breakers.get(op)
+        deadline = time.monotonic() + policy["deadline"]
+        attempt = 0
+        with metrics.track(self.current_platform, model_id, op) as call:
+            while True:
+                attempt += 1
+                remaining = max(1.0, deadline - time.monotonic())
+                try:
+                    # An open circuit fails fast instead of waiting out the timeout
+                    with breaker.guard(self._is_outage):
+                        result = attempt_fn(remaining)
+                    call.attempts(attempt)
+                    return result, attempt
+                except Exception as e:
+                    err = self._classify_error(e)
+                    err.attempts = attempt
+                    err.retryable = self._should_retry(op, e, err)
+                    call.error(err.error_class)
+                    delay = self._backoff_delay(policy, attempt, err.retry_after)
+                    if not err.retryable or attempt >= policy["max_attempts"] or time.monotonic() + delay >= deadline:
+                        call.attempts(attempt)
+                        call.fail()
+                        if err is e:
+                            raise
+                        raise err from e
+                    logger.warning(f"{op} attempt {attempt} failed ({err}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+
+    def _base_url(self, kind: str) -> str:
+        base_url = self.endpoints.get(kind, "https://ark.cn-beijing.volces.com/api/v3")
+        if base_url.endswith("/"):
+            base_url = base_url[:-1]
+        return base_url
+
+    def _build_llm_request(self, messages: List[Dict], system_prompt: str = None) -> Optional[Tuple[str, Dict]]:
+        """构建LLM请求 (url, payload)，配置不完整时返回 None"""
         llm_config = self.models.get("llm", {})
         endpoint = self.endpoints.get("llm", "")
         model_id = llm_config.get("model_id", "")
         
         if not endpoint or not model_id:
-            logger.error("LLM配置不完整")
-            return "", {"prompt_tokens": 0, "completion_tokens": 0}
+            return None
         
         url = f"{endpoint}/chat/completions"
         
@@ -112,33 +280,244 @@ class VEADKClient:
             "max_tokens": llm_config.get("max_tokens", 4096),
             "temperature": llm_config.get("temperature", 0.7)
         }
+        return url, payload
+
+    def _parse_llm_result(self, result: Dict) -> Tuple[str, Dict]:
+        content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+        usage = result.get("usage", {})
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
+        token_usage = {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0)
         }
+        return content, token_usage
+    
+    def _llm_cache_key(self, payload: Dict, system_prompt: str, messages: List[Dict]) -> Optional[str]:
+        if not llm_cache.enabled:
+            return None
+        return llm_cache.make_key(payload["model"], payload["temperature"], payload["max_tokens"], system_prompt, messages)
+    
+    def call_llm(self, messages: List[Dict], system_prompt: str = None, use_cache: bool = False) -> Tuple[str, Dict]:
+        """
+        调用大语言模型
         
-        try:
-            logger.info(f"调用LLM: {model_id}")
-            response = requests.post(url, json=payload, headers=headers, timeout=180)
+        Args:
+            messages: 消息列表
+            system_prompt: 系统提示词
+            use_cache: 是否读取补全缓存 (结果总会写入)。阶段运行、失败任务重跑、未变镜头的提示词等确定性调用传 True；
+                默认否，供"重新生成/换一个"类接口得到新结果
+        
+        Returns:
+            (响应内容, Token使用情况 + attempts；失败时含 error)
+        """
+        request = self._build_llm_request(messages, system_prompt)
+        if not request:
+            logger.error("LLM配置不完整")
+            return "", {"prompt_tokens": 0, "completion_tokens": 0}
+        url, payload = request
+        
+        cache_key = self._llm_cache_key(payload, system_prompt, messages)
+        if cache_key and use_cache:
+            cached = llm_cache.get(cache_key)
+            if cached:
+                logger.info(f"LLM缓存命中: {payload['model']} ({cache_key[:12]})")
+                metrics.inc("model_cache_hits_total", platform=self.current_platform, model_id=payload["model"], operation="llm")
+                return cached[0], {"prompt_tokens": 0, "completion_tokens": 0, "cached": True}
+        
+        def attempt(timeout):
+            response = self._send("POST", url, payload["model"], remaining=timeout,
+                                  json=payload, headers=self._auth_headers(), timeout=min(180, timeout))
             response.raise_for_status()
+            return self._parse_llm_result(response.json())
+        
+        try:
+            logger.info(f"调用LLM: {payload['model']}")
+            (content, token_usage), attempts = self._call_with_retry("llm", attempt, payload["model"])
+            token_usage["attempts"] = attempts
+            metrics.record_tokens(self.current_platform, payload["model"], "llm",
+                                  token_usage["prompt_tokens"], token_usage["completion_tokens"])
             
-            result = response.json()
-            content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-            usage = result.get("usage", {})
+            logger.info(f"LLM响应成功，Token: {token_usage}")
+            if cache_key and content:
+                llm_cache.set(cache_key, content, token_usage)
+            return content, token_usage
             
-            token_usage = {
+        except ModelCallError as e:
+            logger.error(f"LLM调用失败 (attempts={e.attempts}): {e}")
+            if config_loader.get("app.llm_mock_on_error", False):
+                # 模拟响应（开发测试用）
+                return self._mock_llm_response(messages), {"prompt_tokens": 100, "completion_tokens": 200, "attempts": e.attempts}
+            return "", {"prompt_tokens": 0, "completion_tokens": 0, "attempts": e.attempts, "error": str(e)}
+
+    def _iter_sse_deltas(self, response: requests.Response):
+        """逐条解析 SSE 数据帧，产出 (内容增量, usage 或 None)"""
+        # text/event-stream without charset would be decoded as latin-1 by requests
+        for raw in response.iter_lines():
+            line = raw.decode("utf-8")
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            chunk = json.loads(data)
+            if chunk.get("error"):
+                raise ModelCallError(f"Stream error: {chunk['error']}", retryable=False)
+            delta = ""
+            choices = chunk.get("choices") or []
+            if choices:
+                delta = (choices[0].get("delta") or {}).get("content") or ""
+            yield delta, chunk.get("usage")
+
+    def call_llm_stream(self, messages: List[Dict], system_prompt: str = None,
+                        on_delta: Callable[[str], None] = None, use_cache: bool = False) -> Tuple[str, Dict]:
+        """
+        流式调用大语言模型 (SSE)，每收到一段内容即回调 on_delta
+
+        仅在尚未输出任何内容时重试，避免回调方收到重复片段；
+        缓存命中时整段内容通过一次 on_delta 交付
+
+        Returns:
+            (完整响应内容, Token使用情况)，与 call_llm 约定一致
+        """
+        request = self._build_llm_request(messages, system_prompt)
+        if not request:
+            logger.error("LLM配置不完整")
+            return "", {"prompt_tokens": 0, "completion_tokens": 0}
+        url, payload = request
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+
+        cache_key = self._llm_cache_key(payload, system_prompt, messages)
+        if cache_key and use_cache:
+            cached = llm_cache.get(cache_key)
+            if cached:
+                logger.info(f"LLM缓存命中: {payload['model']} ({cache_key[:12]})")
+                metrics.inc("model_cache_hits_total", platform=self.current_platform, model_id=payload["model"], operation="llm")
+                if on_delta:
+                    on_delta(cached[0])
+                return cached[0], {"prompt_tokens": 0, "completion_tokens": 0, "cached": True}
+
+        parts: List[str] = []
+
+        def attempt(timeout):
+            usage = {}
+            started = time.monotonic()
+            # Hold the concurrency slot for the whole stream, not just the response headers
+            with rate_limiter.limit(self.current_platform, payload["model"], timeout=timeout) as slot:
+                response = http_transport.post(url, json=payload, headers=self._auth_headers(),
+                                               stream=True, timeout=(10, min(120, timeout)))
+                try:
+                    slot.record(response.status_code, response.headers)
+                    response.raise_for_status()
+                    for delta, chunk_usage in self._iter_sse_deltas(response):
+                        if chunk_usage:
+                            usage = chunk_usage
+                        if delta:
+                            if not parts:
+                                metrics.observe("model_first_token_seconds", time.monotonic() - started,
+                                                platform=self.current_platform, model_id=payload["model"], operation="llm")
+                            parts.append(delta)
+                            if on_delta:
+                                on_delta(delta)
+                except Exception as e:
+                    if parts:
+                        # Partial output was already delivered; a retry would replay it
+                        err = self._classify_error(e)
+                        err.retryable = False
+                        raise err from e
+                    raise
+                finally:
+                    response.close()
+            return {
                 "prompt_tokens": usage.get("prompt_tokens", 0),
                 "completion_tokens": usage.get("completion_tokens", 0)
             }
-            
-            logger.info(f"LLM响应成功，Token: {token_usage}")
+
+        try:
+            logger.info(f"调用LLM (stream): {payload['model']}")
+            token_usage, attempts = self._call_with_retry("llm", attempt, payload["model"])
+            token_usage["attempts"] = attempts
+            metrics.record_tokens(self.current_platform, payload["model"], "llm",
+                                  token_usage["prompt_tokens"], token_usage["completion_tokens"])
+            content = "".join(parts)
+
+            logger.info(f"LLM流式响应完成，Token: {token_usage}")
+            if cache_key and content:
+                llm_cache.set(cache_key, content, token_usage)
             return content, token_usage
+
+        except ModelCallError as e:
+            logger.error(f"LLM流式调用失败 (attempts={e.attempts}): {e}")
+            return "".join(parts), {"prompt_tokens": 0, "completion_tokens": 0, "attempts": e.attempts, "error": str(e)}
+
+    def _build_image_request(self, prompt: str, width: int, height: int, image_urls: List[str] = None) -> Tuple[str, Dict]:
+        """构建图像生成请求 (url, payload)"""
+        image_config = self.models.get("image", {})
+        
+        # Construct size string. 
+        # Use configured size if available (e.g. "2k"), otherwise fallback to WxH
+        config_size = image_config.get("size")
+        if config_size:
+            size_str = str(config_size)
+        else:
+            size_str = f"{width}x{height}"
             
-        except Exception as e:
-            logger.error(f"LLM调用失败: {e}")
-            # 模拟响应（开发测试用）
-            return self._mock_llm_response(messages), {"prompt_tokens": 100, "completion_tokens": 200}
+        # Direct API call to bypass potential SDK endpoint issues
+        url = f"{self._base_url('image')}/images/generations"
+        
+        model_id = image_config.get("model_id", "doubao-seedream-4-5-251128")
+        
+        payload = {
+            "model": model_id,
+            "prompt": prompt,
+            "size": size_str,
+            "response_format": "url",
+        }
+        # Optional watermark
+        watermark = image_config.get("watermark", True)
+        if watermark:
+            payload["need_watermark"] = watermark
+            
+        # Add reference images if provided
+        if image_urls and len(image_urls) > 0:
+            # Assuming the API supports 'image_urls' or similar for reference
+            # Doubao-Seedream standard API usually takes 'image_urls' or 'ref_images'
+            # Based on common Volcengine usage:
+            payload["image_urls"] = image_urls
+            logger.info(f"Using {len(image_urls)} reference images")
+        return url, payload
+
+    def _parse_image_result(self, result: Dict, payload: Dict, req_id: str) -> Tuple[Optional[str], Dict]:
+        # Expected: { "data": [ { "url": "..." } ] }
+        data = result.get("data", [])
+        
+        # Check for API level errors in response body even if status is 200
+        if not data and "error" in result:
+             error_msg = result["error"].get("message", str(result["error"]))
+             logger.error(f"API Error in 200 OK: {error_msg}")
+             return None, {
+                 "api_calls": 1,
+                 "error": error_msg,
+                 "request_id": req_id
+             }
+
+        if data and len(data) > 0:
+            image_url = data[0].get("url")
+            if image_url:
+                # Return URL directly
+                return image_url, {
+                    "api_calls": 1, 
+                    "model": payload["model"],
+                    "size": payload["size"],
+                    "request_id": req_id
+                }
+        
+        logger.error(f"图像生成响应数据为空 or URL missing: {result}")
+        return None, {
+            "api_calls": 1, 
+            "error": "Empty data or missing URL in response", 
+            "details": result,
+            "request_id": req_id
+        }
     
     def generate_image(self, prompt: str, negative_prompt: str = "", width: int = 1280, height: int = 720, image_urls: List[str] = None) -> Tuple[Optional[bytes], Dict]:
         """
@@ -154,54 +533,14 @@ class VEADKClient:
         Returns:
             (图像字节数据, Token/API使用情况)
         """
-        image_config = self.models.get("image", {})
+        logger.info(f"生成图像: {prompt[:50]}...")
+        url, payload = self._build_image_request(prompt, width, height, image_urls)
         
-        try:
-            logger.info(f"生成图像: {prompt[:50]}...")
-            
-            # Construct size string. 
-            # Use configured size if available (e.g. "2k"), otherwise fallback to WxH
-            config_size = image_config.get("size")
-            if config_size:
-                size_str = str(config_size)
-            else:
-                size_str = f"{width}x{height}"
-            
-            base_url = self.endpoints.get("image", "https://ark.cn-beijing.volces.com/api/v3")
-            if base_url.endswith("/"):
-                base_url = base_url[:-1]
-                
-            # Direct API call to bypass potential SDK endpoint issues
-            url = f"{base_url}/images/generations"
-            
-            model_id = image_config.get("model_id", "doubao-seedream-4-5-251128")
-            
-            payload = {
-                "model": model_id,
-                "prompt": prompt,
-                "size": size_str,
-                "response_format": "url",
-            }
-            # Optional watermark
-            watermark = image_config.get("watermark", True)
-            if watermark:
-                payload["need_watermark"] = watermark
-                
-            # Add reference images if provided
-            if image_urls and len(image_urls) > 0:
-                # Assuming the API supports 'image_urls' or similar for reference
-                # Doubao-Seedream standard API usually takes 'image_urls' or 'ref_images'
-                # Based on common Volcengine usage:
-                payload["image_urls"] = image_urls
-                logger.info(f"Using {len(image_urls)} reference images")
-            
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            logger.info(f"Requesting image from {url} with model {model_id}")
-            response = requests.post(url, json=payload, headers=headers, timeout=60)
+        def attempt(timeout):
+            logger.info(f"Requesting image from {url} with model {payload['model']}")
+            response = self._send("POST", url, payload["model"], remaining=timeout,
+                                  json=payload, headers=self._auth_headers(), timeout=min(60, timeout))
+            req_id = response.headers.get("X-Tt-Logid", "unknown")
             
             if response.status_code != 200:
                 logger.error(f"Image generation error {response.status_code}: {response.text}")
@@ -209,85 +548,30 @@ class VEADKClient:
                     error_detail = response.json()
                 except:
                     error_detail = response.text
-                return None, {
-                    "api_calls": 1, 
-                    "error": f"HTTP {response.status_code}: {error_detail}",
-                    "request_id": response.headers.get("X-Tt-Logid", "unknown")
-                }
-                
-            response.raise_for_status()
+                raise ModelCallError.from_status(
+                    response.status_code, f"HTTP {response.status_code}: {error_detail}", response.headers, req_id
+                )
             
             # Parse result
-            # Expected: { "data": [ { "url": "..." } ] }
-            result = response.json()
-            data = result.get("data", [])
-            
-            # Check for API level errors in response body even if status is 200
-            if not data and "error" in result:
-                 error_msg = result["error"].get("message", str(result["error"]))
-                 logger.error(f"API Error in 200 OK: {error_msg}")
-                 return None, {
-                     "api_calls": 1,
-                     "error": error_msg,
-                     "request_id": response.headers.get("X-Tt-Logid", "unknown")
-                 }
-
-            if data and len(data) > 0:
-                image_url = data[0].get("url")
-                if image_url:
-                    # Return URL directly
-                    return image_url, {
-                        "api_calls": 1, 
-                        "model": model_id,
-                        "size": size_str,
-                        "request_id": response.headers.get("X-Tt-Logid", "unknown")
-                    }
-            
-            logger.error(f"图像生成响应数据为空 or URL missing: {result}")
-            return None, {
-                "api_calls": 1, 
-                "error": "Empty data or missing URL in response", 
-                "details": result,
-                "request_id": response.headers.get("X-Tt-Logid", "unknown")
-            }
+            return self._parse_image_result(response.json(), payload, req_id)
+        
+        try:
+            (image_url, usage), attempts = self._call_with_retry("image", attempt, payload["model"])
+            usage["attempts"] = attempts
+            return image_url, usage
             
-        except Exception as e:
-            logger.error(f"图像生成失败: {e}")
-            req_id = "unknown"
-            if isinstance(e, requests.exceptions.RequestException) and e.response is not None:
-                req_id = e.response.headers.get("X-Tt-Logid", "unknown")
-            return None, {"api_calls": 1, "error": str(e), "request_id": req_id}
-    
-    def submit_video_generation_task(self, image_path: str = None, prompt: str = "", duration: int = 5, resolution: str = None, ratio: str = None, image_url: str = None) -> Tuple[Optional[str], Dict]:
+        except ModelCallError as e:
+            logger.error(f"图像生成失败 (attempts={e.attempts}): {e}")
+            return None, {"api_calls": 1, "attempts": e.attempts, "error": str(e), "request_id": e.request_id}
+
+    def _resolve_video_image_url(self, image_path: str = None, image_url: str = None) -> Tuple[Optional[str], Optional[Dict]]:
         """
-        提交视频生成任务（仅提交，不等待）
-        
-        Args:
-            image_path: 首帧图像路径 (optional if image_url provided)
-            prompt: 视频提示词
-            duration: 视频时长（秒）
-            resolution: 分辨率 (e.g. "1080p")
-            ratio: 画面比例 (e.g. "16:9")
-            image_url: 首帧图像 URL (TOS URL)
-        
-        Returns:
-            (task_id (Optional), API使用情况/错误信息)
+        解析视频首帧图像地址 (必要时签名或上传到TOS)
+        Returns: (final_image_url, error_usage)
         """
         from ..utils.tos_client import tos_client
         import uuid
         
-        video_config = self.models.get("video", {})
-        # Use base URL from endpoints, similar to image generation fix
-        base_url = self.endpoints.get("video", "https://ark.cn-beijing.volces.com/api/v3")
-        if base_url.endswith("/"):
-            base_url = base_url[:-1]
-            
-        endpoint = f"{base_url}/contents/generations/tasks"
-        
-        if not base_url:
-            logger.error("视频生成配置不完整")
-            return None, {"error": "Configuration incomplete: base_url missing"}
-            
         # Handle Image Source
         final_image_url = image_url
         
@@ -339,6 +623,14 @@ class VEADKClient:
                 logger.error(f"Failed to prepare image for video generation: {e}")
                 return None, {"error": f"Image upload failed: {str(e)}"}
         
+        return final_image_url, None
+
+    def _build_video_request(self, final_image_url: str, prompt: str = "", duration: int = 5, ratio: str = None,
+                             callback_ref: str = None) -> Tuple[str, Dict]:
+        """构建视频任务提交请求 (endpoint, payload)；callback_ref 为回调签名绑定的 VideoTask ID"""
+        video_config = self.models.get("video", {})
+        endpoint = f"{self._base_url('video')}/contents/generations/tasks"
+        
         # Construct Payload
         # Append params to prompt
         full_prompt = prompt
@@ -391,34 +683,68 @@ class VEADKClient:
         # However, to be safe and explicit as requested:
         if ratio:
             payload["ratio"] = ratio
+        callback_url = video_callback.callback_url(callback_ref)
+        if callback_url:
+            # Completion is pushed to /api/callbacks/video; polling becomes a slow reconciliation sweep
+            payload["callback_url"] = callback_url
         # Resolution is usually implied by ratio or model capability, but adding it doesn't hurt if API ignores extra fields
         # or if future API versions support it.
         # Actually, for some endpoints, 'resolution' might be 'size' or similar.
         # We'll stick to what we know works (prompt) + payload field for clarity/future-proof.
+        return endpoint, payload
 
+    def _parse_video_task_id(self, result: Dict) -> Optional[str]:
+        task_id = result.get("id") or result.get("task_id")
+        if not task_id and "data" in result:
+            task_id = result["data"].get("id") or result["data"].get("task_id")
+        return task_id
+    
+    def submit_video_generation_task(self, image_path: str = None, prompt: str = "", duration: int = 5, resolution: str = None, ratio: str = None, image_url: str = None, callback_ref: str = None) -> Tuple[Optional[str], Dict]:
+        """
+        提交视频生成任务（仅提交，不等待）
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        Args:
+            image_path: 首帧图像路径 (optional if image_url provided)
+            prompt: 视频提示词
+            duration: 视频时长（秒）
+            resolution: 分辨率 (e.g. "1080p")
+            ratio: 画面比例 (e.g. "16:9")
+            image_url: 首帧图像 URL (TOS URL)
+            callback_ref: 将记录此任务的 VideoTask ID；提供时才附带完成回调地址
         
-        try:
-            # Enhanced logging for debugging
-            logger.info("="*30 + " VIDEO GEN REQUEST " + "="*30)
-            logger.info(f"Endpoint: {endpoint}")
-            logger.info(f"Model: {payload.get('model')}")
-            logger.info(f"Final Prompt (Text): {full_prompt}")
-            logger.info(f"Image URL: {final_image_url}")
-            logger.info(f"Params -> Duration: {duration}, Resolution: {resolution}, Ratio: {ratio}")
-            logger.info(f"Full JSON Payload: {json.dumps(payload, ensure_ascii=False)}")
-            logger.info("="*80)
+        Returns:
+            (task_id (Optional), API使用情况/错误信息)
+        """
+        if not self._base_url("video"):
+            logger.error("视频生成配置不完整")
+            return None, {"error": "Configuration incomplete: base_url missing"}
             
+        final_image_url, error_usage = self._resolve_video_image_url(image_path, image_url)
+        if error_usage:
+            return None, error_usage
+        
+        endpoint, payload = self._build_video_request(final_image_url, prompt, duration, ratio, callback_ref)
+        
+        # Enhanced logging for debugging
+        logger.info("="*30 + " VIDEO GEN REQUEST " + "="*30)
+        logger.info(f"Endpoint: {endpoint}")
+        logger.info(f"Model: {payload.get('model')}")
+        logger.info(f"Final Prompt (Text): {payload['content'][0]['text']}")
+        logger.info(f"Image URL: {final_image_url}")
+        logger.info(f"Params -> Duration: {duration}, Resolution: {resolution}, Ratio: {ratio}")
+        logger.info(f"Full JSON Payload: {json.dumps(payload, ensure_ascii=False)}")
+        logger.info("="*80)
+        
+        def attempt(timeout):
             # Submit Task
-            response = requests.post(
+            response = self._send(
+                "POST",
                 endpoint, 
+                payload["model"],
+                remaining=timeout,
                 json=payload,
-                headers=headers,
-                timeout=60
+                headers=self._auth_headers(),
+                timeout=min(60, timeout)
             )
             
             req_id = response.headers.get("X-Tt-Logid", "unknown")
@@ -427,84 +753,101 @@ class VEADKClient:
             if response.status_code != 200:
                 logger.error(f"视频生成 API 错误: {response.text} (ReqID: {req_id})")
                 if response.status_code == 400:
-                    return None, {"api_calls": 1, "error": f"API Error 400: {response.text}", "request_id": req_id}
-            
-            response.raise_for_status()
+                    raise ModelCallError(f"API Error 400: {response.text}", status_code=400, request_id=req_id)
+                raise ModelCallError.from_status(
+                    response.status_code, f"HTTP {response.status_code}: {response.text}", response.headers, req_id
+                )
             
             result = response.json()
             logger.info("="*30 + " VIDEO GEN RESPONSE " + "="*30)
             logger.info(f"Response Body: {json.dumps(result, ensure_ascii=False)}")
             logger.info("="*80)
+            return result, req_id
+        
+        try:
+            (result, req_id), attempts = self._call_with_retry("video_submit", attempt, payload["model"])
+        except ModelCallError as e:
+            logger.error(f"视频任务提交失败 (attempts={e.attempts}): {e}")
+            return None, {"api_calls": 1, "attempts": e.attempts, "error": str(e), "request_id": e.request_id}
+        
+        task_id = self._parse_video_task_id(result)
+        if not task_id:
+            logger.error(f"Failed to get task_id from response: {result}")
+            return None, {"api_calls": 1, "attempts": attempts, "error": "No task_id in response"}
+        
+        logger.info(f"Video task submitted, ID: {task_id}")
+        return task_id, {
+            "api_calls": 1, "attempts": attempts, "request_id": req_id, "model": payload["model"],
+            "callback": "callback_url" in payload
+        }
+
+    def _parse_video_status(self, result: Dict) -> Tuple[str, Optional[str], Optional[str]]:
+        """解析视频任务状态响应 -> (status, video_url, error_msg)"""
+        status = result.get("status")
+        if not status and "data" in result:
+            status = result["data"].get("status")
+        status = str(status).upper()
+        
+        if status in ["SUCCEEDED", "COMPLETED", "SUCCESS"]:
+            content = result.get("content")
+            data = result.get("data")
+            video_url = None
+            if content:
+                video_url = content.get("video_url") or content.get("url")
+            if not video_url and data:
+                video_url = data.get("video_url") or data.get("url")
+            return "SUCCEEDED", video_url, None
             
-            task_id = result.get("id") or result.get("task_id")
-            if not task_id and "data" in result:
-                task_id = result["data"].get("id") or result["data"].get("task_id")
-            
-            if not task_id:
-                logger.error(f"Failed to get task_id from response: {result}")
-                return None, {"api_calls": 1, "error": "No task_id in response"}
-            
-            logger.info(f"Video task submitted, ID: {task_id}")
-            return task_id, {"api_calls": 1, "request_id": req_id, "model": payload["model"]}
-            
-        except Exception as e:
-            logger.error(f"视频任务提交失败: {e}")
-            req_id = "unknown"
-            if isinstance(e, requests.exceptions.RequestException) and e.response is not None:
-                req_id = e.response.headers.get("X-Tt-Logid", "unknown")
-            return None, {"api_calls": 1, "error": str(e), "request_id": req_id}
+        elif status in ["FAILED", "FAILURE"]:
+            reason = "Unknown failure"
+            if "error" in result:
+                reason = result["error"].get("message") or str(result["error"])
+            elif "data" in result and "error" in result["data"]:
+                    reason = result["data"]["error"]
+            return "FAILED", None, reason
+        
+        elif status in ["EXPIRED", "CANCELLED"]:
+            # The provider dropped the task; the scheduler's reaper may resubmit it
+            return "EXPIRED", None, status.lower()
+        
+        else:
+            return "RUNNING", None, None
 
     def check_video_task_status(self, task_id: str) -> Tuple[str, Optional[str], Optional[str]]:
         """
         检查视频任务状态
         Returns: (status, video_url, error_msg)
-        status: SUCCEEDED, FAILED, RUNNING, UNKNOWN
+        status: SUCCEEDED, FAILED, EXPIRED, RUNNING, UNKNOWN
         """
-        base_url = self.endpoints.get("video", "https://ark.cn-beijing.volces.com/api/v3")
-        if base_url.endswith("/"):
-            base_url = base_url[:-1]
-        endpoint = f"{base_url}/contents/generations/tasks/{task_id}"
+        endpoint = f"{self._base_url('video')}/contents/generations/tasks/{task_id}"
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        def attempt(timeout):
+            response = self._send("GET", endpoint, self._video_status_limit_key(), remaining=timeout,
+                                  headers=self._auth_headers(), timeout=min(30, timeout))
+            response.raise_for_status()
+            return self._parse_video_status(response.json())
         
         try:
-            response = requests.get(endpoint, headers=headers, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            
-            status = result.get("status")
-            if not status and "data" in result:
-                status = result["data"].get("status")
-            status = str(status).upper()
-            
-            if status in ["SUCCEEDED", "COMPLETED", "SUCCESS"]:
-                content = result.get("content")
-                data = result.get("data")
-                video_url = None
-                if content:
-                    video_url = content.get("video_url") or content.get("url")
-                if not video_url and data:
-                    video_url = data.get("video_url") or data.get("url")
-                return "SUCCEEDED", video_url, None
-                
-            elif status in ["FAILED", "FAILURE"]:
-                reason = "Unknown failure"
-                if "error" in result:
-                    reason = result["error"].get("message") or str(result["error"])
-                elif "data" in result and "error" in result["data"]:
-                        reason = result["data"]["error"]
-                return "FAILED", None, reason
-            
-            else:
-                return "RUNNING", None, None
+            result, _ = self._call_with_retry("video_status", attempt, self._video_model_id())
+            return result
                 
-        except Exception as e:
-            logger.error(f"Check task status failed: {e}")
+        except ModelCallError as e:
+            logger.error(f"Check task status failed (attempts={e.attempts}): {e}")
             return "UNKNOWN", None, str(e)
 
+    def _build_video_list_request(self, task_ids: List[str]) -> Tuple[str, List[Tuple[str, str]]]:
+        """批量查询任务请求 (GET .../contents/generations/tasks?filter.task_ids=...)"""
+        params = [("page_num", "1"), ("page_size", str(len(task_ids)))]
+        params.extend(("filter.task_ids", task_id) for task_id in task_ids)
+        return f"{self._base_url('video')}/contents/generations/tasks", params
+
+    def _parse_video_list(self, result: Dict) -> Dict[str, Tuple[str, Optional[str], Optional[str]]]:
+        """解析任务列表响应 -> {task_id: (status, video_url, error_msg)}"""
+        items = result.get("items")
+        if items is None and isinstance(result.get("data"), dict):
+            items = result["data"].get("items")
+        return {item["id"]: self._parse_video_status(item) for item in items or [] if item.get("id")}
+
     def generate_video(self, image_path: str = None, prompt: str = "", duration: int = 5, resolution: str = None, ratio: str = None, image_url: str = None) -> Tuple[Optional[str], Dict]:
         """
         生成视频 (Blocking wrapper for backward compatibility)
@@ -526,7 +869,7 @@ class VEADKClient:
                 if status == "SUCCEEDED":
                     usage["task_id"] = task_id
                     return video_url, usage
-                elif status == "FAILED":
+                elif status in ("FAILED", "EXPIRED"):
                     usage["error"] = error
                     return None, usage
                 
@@ -554,7 +897,7 @@ class VEADKClient:
         
         for i in range(max_retries):
             try:
-                response = requests.get(
+                response = http_transport.get(
                     url,
                     headers=headers,
                     timeout=30
@@ -0,0 +1,93 @@
+import asyncio
+from aiohttp import web
+from loguru import logger
+from sqlalchemy.engine import make_url
+from src.utils.config_loader import config_loader
+from .database import DATABASE_URL, SessionLocal, pool_options, sqlite_pragmas, install_sqlite_pragmas
+
+# Sync driver -> async driver for the same database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def _async_url():
+    configured = config_loader.get("database.async_url")
+    if configured:
+        return configured
+    url = make_url(DATABASE_URL)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    if not driver:
+        return None
+    # libpq-only options (sslmode, ...) are not understood by asyncpg; set database.async_url for those
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _create_async_engine():
+    url = _async_url()
+    if not url:
+        logger.warning(f"No async driver for {make_url(DATABASE_URL).drivername}; async handlers use the thread pool")
+        return None, None
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        engine = create_async_engine(url, **pool_options(url))
+    except ImportError as e:
+        # aiosqlite / asyncpg / greenlet not installed
+        logger.warning(f"Async database driver unavailable ({e}); async handlers use the thread pool")
+        return None, None
+    if url.startswith("sqlite"):
+        install_sqlite_pragmas(engine.sync_engine, sqlite_pragmas())
+    return engine, async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+async_engine, AsyncSessionLocal = _create_async_engine()
+
+
+@web.middleware
+async def db_session_middleware(request, handler):
+    """Request-scoped AsyncSession at request["db"]; it only takes a connection once used and is closed afterwards"""
+    if AsyncSessionLocal is None:
+        return await handler(request)
+    request["db"] = AsyncSessionLocal()
+    try:
+        return await handler(request)
+    finally:
+        await request["db"].close()
+
+
+async def run_db(request, fn, *args):
+    """
+    Run fn(session, *args) - ordinary sync ORM / service code - without blocking the event loop.
+
+    With an async driver fn runs through AsyncSession.run_sync on the request's session, so
+    the services are reused unchanged while the I/O is awaited. Otherwise it runs on a
+    thread-pool worker with its own sync session.
+    """
+    db = request.get("db")
+    if db is not None:
+        return await db.run_sync(fn, *args)
+    return await run_db_blocking(fn, *args)
+
+
+async def run_db_blocking(fn, *args):
+    """
+    Run fn(session, *args) on a thread-pool worker with its own sync session.
+
+    For functions that do other blocking I/O besides the database (Redis, files): under
+    run_sync that I/O would run on the event loop thread.
+    """
+    def call():
+        session = SessionLocal()
+        try:
+            return fn(session, *args)
+        finally:
+            session.close()
+    return await asyncio.get_running_loop().run_in_executor(None, call)
+
+
+async def close_async_engine(app=None):
+    if async_engine is not None:
+        await async_engine.dispose()
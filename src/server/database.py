@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, declarative_base
 from pathlib import Path
 from src.utils.config_loader import config_loader
@@ -25,13 +26,71 @@ if DATABASE_URL.startswith("sqlite:///"):
         # Absolute path, ensure dir exists
         Path(path_part).parent.mkdir(parents=True, exist_ok=True)
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+# SQLite connect-time PRAGMAs: WAL lets readers run alongside the single writer, and
+# busy_timeout makes a writer wait for the lock instead of failing with "database is locked"
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 268435456,
+    "cache_size": -65536,
+}
 
-engine = create_engine(
-    DATABASE_URL, connect_args=connect_args
-)
+DEFAULT_POOL = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+}
+
+
+def sqlite_pragmas():
+    """database.sqlite.pragmas over the defaults; a value of null drops that PRAGMA"""
+    conf = config_loader.get("database.sqlite.pragmas", {}) or {}
+    pragmas = {**DEFAULT_SQLITE_PRAGMAS, **conf}
+    return {k: v for k, v in pragmas.items() if v is not None}
+
+
+def pool_options(url):
+    """create_engine pool arguments from database.pool (pre_ping defaults on for server databases)"""
+    conf = config_loader.get("database.pool", {}) or {}
+    is_sqlite = str(url).startswith("sqlite")
+    if is_sqlite and ":memory:" in str(url):
+        return {}
+    options = {key: conf.get(key.replace("pool_", "", 1), default) for key, default in DEFAULT_POOL.items()}
+    options["pool_pre_ping"] = bool(conf.get("pre_ping", not is_sqlite))
+    return options
+
+
+def install_sqlite_pragmas(sync_engine, pragmas):
+    """Run the PRAGMAs on every new DBAPI connection of the engine"""
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+        finally:
+            cursor.close()
+
+
+def build_engine(url, pool=None, pragmas=None):
+    """
+    Sync engine for url. pool / pragmas default to the configured values;
+    pass {} to get SQLAlchemy's defaults (used by scripts/bench_db_writers.py as the baseline).
+    """
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+    new_engine = create_engine(
+        url, connect_args=connect_args, **(pool_options(url) if pool is None else pool)
+    )
+    if url.startswith("sqlite"):
+        install_sqlite_pragmas(new_engine, sqlite_pragmas() if pragmas is None else pragmas)
+    return new_engine
+
+
+engine = build_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -43,3 +102,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def insert_ignore(db, model, rows, conflict):
+    """INSERT ... ON CONFLICT DO NOTHING, so concurrent writers creating the same row do not fail. Returns rows inserted."""
+    if not rows:
+        return 0
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return db.execute(insert(model).values(rows).on_conflict_do_nothing(index_elements=conflict)).rowcount
+    inserted = 0
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.add(model(**row))
+            inserted += 1
+        except IntegrityError:
+            pass
+    return inserted
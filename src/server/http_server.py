@@ -2,6 +2,7 @@ import asyncio
 import threading
 import math
 import copy
+import functools
 from pathlib import Path
 from aiohttp import web
 from loguru import logger
@@ -15,11 +16,23 @@ from src.core.image_generator import ImageGenerator
 from src.core.video_generator import VideoGenerator
 from src.core.video_merger import VideoMerger
 from src.utils.tos_client import tos_client
+from src.utils.http_transport import http_transport
+from src.utils.rate_limiter import rate_limiter
+from src.utils.llm_cache import llm_cache
+from src.utils.circuit_breaker import circuit_breakers
+from src.utils.video_callback import video_callback
+from src.utils.metrics import metrics
+from src.utils.job_scheduler import job_scheduler
+from src.models.async_veadk_client import async_veadk_client
 from src.server.database import get_db
+from src.server.async_database import db_session_middleware, run_db, run_db_blocking, close_async_engine
 from src.server.services import TaskService
 from src.server.log_service import LogService
-from src.server.project_service import ProjectService
+from src.server.project_service import ProjectService, ProjectConflictError
+from src.server.shot_service import ShotService
 from src.server.video_scheduler import VideoScheduler
+from src.server.video_ingestion import video_ingestion
+from src.server.poll_planner import poll_planner
 from src.server.models import VideoTask, generate_uuid
 
 project_root = Path(__file__).resolve().parents[2]
@@ -104,16 +117,11 @@ async def _start_background_task(project_id, task_type, func, *args):
 
 # Task & Log APIs
 
-async def _get_task_status(request):
-    task_id = request.match_info["task_id"]
-    db = next(get_db())
-    ts = TaskService(db)
-    task = ts.get_task(task_id)
+def _task_status(db, task_id):
+    task = TaskService(db).get_task(task_id)
     if not task:
-        db.close()
-        return web.json_response({"error": "not found"}, status=404)
-    
-    data = {
+        return None
+    return {
         "task_id": task.id,
         "project_id": task.project_id,
         "type": task.type,
@@ -125,7 +133,13 @@ async def _get_task_status(request):
         "created_at": task.created_at.isoformat() if task.created_at else None,
         "updated_at": task.updated_at.isoformat() if task.updated_at else None
     }
-    db.close()
+
+
+async def _get_task_status(request):
+    # TaskService.get_task reads through the Redis cache with the blocking client: keep it off the loop
+    data = await run_db_blocking(_task_status, request.match_info["task_id"])
+    if not data:
+        return web.json_response({"error": "not found"}, status=404)
     return web.json_response(data)
 
 async def _get_project_tasks(request):
@@ -145,6 +159,30 @@ async def _get_project_tasks(request):
     db.close()
     return web.json_response({"tasks": data})
 
+async def _get_project_queue(request):
+    """Queue position and ETA of the project's pending generation jobs"""
+    return web.json_response(job_scheduler.project_status(request.match_info["pid"]))
+
+def _project_usage(db, pid):
+    ps = ProjectService(db)
+    project = ps.get_project(pid)
+    if not project:
+        return None
+    return {
+        "project_id": pid,
+        "total_tokens": project.token_totals(),
+        "usage_stats": project.usage_totals(),
+        "breakdown": ps.usage_breakdown(pid)
+    }
+
+
+async def _get_project_usage(request):
+    """Usage totals plus the ledger grouped by stage and model"""
+    data = await run_db(request, _project_usage, request.match_info["pid"])
+    if not data:
+        return web.json_response({"error": "not found"}, status=404)
+    return web.json_response(data)
+
 async def _get_logs_api(request):
     try:
         pid = request.query.get("project_id")
@@ -158,11 +196,8 @@ async def _get_logs_api(request):
             level = None
         limit = int(request.query.get("limit", 100))
         
-        db = next(get_db())
-        try:
-            ls = LogService(db)
-            logs = ls.get_logs(project_id=pid, task_id=tid, level=level, limit=limit)
-            
+        def load(db):
+            logs = LogService(db).get_logs(project_id=pid, task_id=tid, level=level, limit=limit)
             data = []
             for l in logs:
                 details = l.details
@@ -181,9 +216,9 @@ async def _get_logs_api(request):
                     "details": details,
                     "task_id": l.task_id
                 })
-            return web.json_response({"logs": data})
-        finally:
-            db.close()
+            return data
+
+        return web.json_response({"logs": await run_db(request, load)})
     except Exception as e:
         logger.error(f"Get logs failed: {e}")
         return web.json_response({"error": str(e)}, status=500)
@@ -222,17 +257,16 @@ async def _create_project(request):
     return web.json_response({"project_id": project_id})
 
 
+def _project_dict(db, pid):
+    project = ProjectService(db).get_project(pid)
+    return project.to_dict() if project else None
+
+
 async def _get_project(request):
-    pid = request.match_info["pid"]
-    db = next(get_db())
-    ps = ProjectService(db)
-    try:
-        project = ps.get_project(pid)
-        if not project:
-            return web.json_response({"error": "not found"}, status=404)
-        return web.json_response(project.to_dict())
-    finally:
-        db.close()
+    data = await run_db(request, _project_dict, request.match_info["pid"])
+    if not data:
+        return web.json_response({"error": "not found"}, status=404)
+    return web.json_response(data)
 
 
 async def _generate_script(request):
@@ -271,7 +305,7 @@ async def _generate_script(request):
                 meta.get("style", "现代都市"),
                 meta.get("audience", "年轻人"),
             )
-            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="script")
             ps_w.update_project(pid, {"script": script, "current_step": 1, "status": "in_progress"})
             ps_w.update_step(pid, 0, {"status": "completed", "token_usage": tokens})
             return {"script": script, "tokens": tokens}, tokens
@@ -302,12 +336,12 @@ async def _optimize_script(request):
     if not original_script:
         return web.json_response({"error": "script required"}, status=400)
         
-    script, tokens = await _run_blocking(script_gen.optimize, original_script, feedback)
+    script, tokens = await script_gen.aoptimize(original_script, feedback)
     
     db = next(get_db())
     ps = ProjectService(db)
     try:
-        ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+        ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="script_optimize")
         ps.update_project(pid, {"script": script})
     finally:
         db.close()
@@ -335,6 +369,23 @@ async def _update_script(request):
     return web.json_response({"status": "ok", "script": script})
 
 
+async def _patch_project_meta(request):
+    """Atomically set topic_meta keys: {"aspect_ratio": "9:16", "a.b": 1}"""
+    pid = request.match_info["pid"]
+    data = await request.json()
+    if not isinstance(data, dict) or not data:
+        return web.json_response({"error": "object of {path: value} required"}, status=400)
+
+    db = next(get_db())
+    ps = ProjectService(db)
+    try:
+        if not ps.patch_meta(pid, data):
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response({"status": "ok", "topic_meta": ps.get_project(pid).topic_meta})
+    finally:
+        db.close()
+
+
 async def _generate_characters(request):
     pid = request.match_info["pid"]
     db = next(get_db())
@@ -356,7 +407,7 @@ async def _generate_characters(request):
         ps_w = ProjectService(db_w)
         try:
             characters, tokens = char_gen.generate(script)
-            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="characters")
             ps_w.update_project(pid, {"characters": characters, "current_step": 2})
             ps_w.update_step(pid, 1, {"status": "completed", "token_usage": tokens})
             return {"characters": characters, "tokens": tokens}, tokens
@@ -390,10 +441,15 @@ async def _generate_character_prompts(request):
             updated_chars, tokens = char_gen.generate_prompts(
                 characters,
                 meta.get("style", "现代都市"),
-                meta.get("visual_style", "真人")
+                meta.get("visual_style", "真人"),
+                project_id=pid
             )
-            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
-            ps_w.update_project(pid, {"characters": updated_chars})
+            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="character_prompts")
+            # Only the prompts are merged, so edits made to the characters meanwhile are kept
+            produced = {i: {"prompt": c["prompt"]} for i, c in enumerate(updated_chars) if c.get("prompt")}
+            updated_chars = ps_w.modify_list(pid, "characters", functools.partial(_merge_item_fields, produced=produced))
+            if updated_chars is None:
+                updated_chars = ps_w.get_project(pid).characters or []
             return {"characters": updated_chars, "tokens": tokens}, tokens
         finally:
             db_w.close()
@@ -470,15 +526,12 @@ async def _generate_character_images(request):
                 sub_dir="characters"
             )
             
-            # Update characters with image paths
-            updated_chars = list(characters)
-            for i, char in enumerate(updated_chars):
-                idx = i + 1
-                if idx in shot_images and shot_images[idx]:
-                    char["image_path"] = shot_images[idx][-1]
-            
-            ps_w.update_project(pid, {"characters": updated_chars})
-            ps_w.add_usage(pid, images=len(char_prompts))
+            # Update image paths on the current characters, not the list read before generation
+            produced = {idx - 1: {"image_path": paths[-1]} for idx, paths in shot_images.items() if paths}
+            updated_chars = ps_w.modify_list(pid, "characters", functools.partial(_merge_item_fields, produced=produced))
+            if updated_chars is None:
+                updated_chars = ps_w.get_project(pid).characters or []
+            ps_w.add_usage(pid, images=len(char_prompts), stage="character_images")
             
             return {"characters": updated_chars}, usage
         finally:
@@ -523,12 +576,14 @@ async def _update_single_character_prompt(request):
         if not project:
             return web.json_response({"error": "not found"}, status=404)
         
-        characters = copy.deepcopy(project.characters or [])
-        if index < 0 or index >= len(characters):
+        def set_prompt(characters):
+            if index < 0 or index >= len(characters):
+                return False
+            characters[index]["prompt"] = prompt
+
+        characters = ps.modify_list(pid, "characters", set_prompt)
+        if characters is None:
              return web.json_response({"error": "character not found"}, status=404)
-             
-        characters[index]["prompt"] = prompt
-        ps.update_project(pid, {"characters": characters})
         
         return web.json_response({"status": "ok", "character": characters[index]})
     finally:
@@ -567,16 +622,17 @@ async def _regenerate_single_character_prompt(request):
     db = next(get_db())
     ps = ProjectService(db)
     try:
-        # Re-fetch to avoid conflicts
-        project = ps.get_project(pid)
-        characters = copy.deepcopy(project.characters or [])
-        if index < len(characters):
+        # Applied to the current list (re-run on a concurrent write), not the one read before generation
+        def replace_char(characters):
+            if index >= len(characters):
+                return False
             # Preserve image path if exists
             if "image_path" in characters[index]:
                 updated_char["image_path"] = characters[index]["image_path"]
             characters[index] = updated_char
-            ps.update_project(pid, {"characters": characters})
-            ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+
+        if ps.modify_list(pid, "characters", replace_char) is not None:
+            ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="character_prompts")
     finally:
         db.close()
         
@@ -595,19 +651,18 @@ async def _update_single_character(request):
         if not project:
             return web.json_response({"error": "not found"}, status=404)
             
-        characters = copy.deepcopy(project.characters or [])
-        if index < 0 or index >= len(characters):
+        def update_fields(characters):
+            if index < 0 or index >= len(characters):
+                return False
+            for key in ["name", "gender", "age", "personality", "clothing", "appearance"]:
+                if key in data:
+                    characters[index][key] = data[key]
+
+        characters = ps.modify_list(pid, "characters", update_fields)
+        if characters is None:
              return web.json_response({"error": "character not found"}, status=404)
-             
-        # Update fields
-        char = characters[index]
-        for key in ["name", "gender", "age", "personality", "clothing", "appearance"]:
-            if key in data:
-                char[key] = data[key]
-                
-        ps.update_project(pid, {"characters": characters})
         
-        return web.json_response({"status": "ok", "character": char})
+        return web.json_response({"status": "ok", "character": characters[index]})
     finally:
         db.close()
 
@@ -636,8 +691,12 @@ async def _regenerate_single_character_image(request):
         
         if new_prompt is not None:
             char["prompt"] = new_prompt
-            characters[index] = char
-            ps.update_project(pid, {"characters": characters})
+
+            def set_prompt(items):
+                if index >= len(items):
+                    return False
+                items[index]["prompt"] = new_prompt
+            ps.modify_list(pid, "characters", set_prompt)
             prompt = new_prompt
         else:
             prompt = char.get("prompt")
@@ -674,17 +733,21 @@ async def _regenerate_single_character_image(request):
                 sub_dir="characters"
             )
             
-            # Update character image path
-            project = ps_w.get_project(pid)
-            updated_chars = list(project.characters or [])
-            if index < len(updated_chars):
-                idx = index + 1
-                if idx in shot_images and shot_images[idx]:
-                    updated_chars[index]["image_path"] = shot_images[idx][-1]
-                    ps_w.update_project(pid, {"characters": updated_chars})
-                    ps_w.add_usage(pid, images=1)
+            # Update character image path on the current list, not the one read before generation
+            updated_chars = None
+            idx = index + 1
+            if idx in shot_images and shot_images[idx]:
+                def set_image(items):
+                    if index >= len(items):
+                        return False
+                    items[index]["image_path"] = shot_images[idx][-1]
+                updated_chars = ps_w.modify_list(pid, "characters", set_image)
+                if updated_chars is not None:
+                    ps_w.add_usage(pid, images=1, stage="character_images")
+            if updated_chars is None:
+                updated_chars = ps_w.get_project(pid).characters or []
                     
-            return {"image_path": updated_chars[index].get("image_path")}, usage
+            return {"image_path": updated_chars[index].get("image_path") if index < len(updated_chars) else None}, usage
         finally:
             db_w.close()
 
@@ -713,7 +776,7 @@ async def _generate_scenes(request):
         ps_w = ProjectService(db_w)
         try:
             scenes, tokens = scene_gen.generate(script)
-            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="scenes")
             ps_w.update_project(pid, {"scenes": scenes, "current_step": 3})
             ps_w.update_step(pid, 2, {"status": "completed", "token_usage": tokens})
             return {"scenes": scenes, "tokens": tokens}, tokens
@@ -747,10 +810,15 @@ async def _generate_scene_prompts(request):
             updated_scenes, tokens = scene_gen.generate_prompts(
                 scenes,
                 meta.get("style", "现代都市"),
-                meta.get("visual_style", "真人")
+                meta.get("visual_style", "真人"),
+                project_id=pid
             )
-            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
-            ps_w.update_project(pid, {"scenes": updated_scenes})
+            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="scene_prompts")
+            # Only the prompts are merged, so edits made to the scenes meanwhile are kept
+            produced = {i: {"prompt": sc["prompt"]} for i, sc in enumerate(updated_scenes) if sc.get("prompt")}
+            updated_scenes = ps_w.modify_list(pid, "scenes", functools.partial(_merge_item_fields, produced=produced))
+            if updated_scenes is None:
+                updated_scenes = ps_w.get_project(pid).scenes or []
             return {"scenes": updated_scenes, "tokens": tokens}, tokens
         finally:
             db_w.close()
@@ -805,14 +873,12 @@ async def _generate_scene_images(request):
                 sub_dir="scenes"
             )
             
-            updated_scenes = list(scenes)
-            for i, scene in enumerate(updated_scenes):
-                idx = i + 1
-                if idx in shot_images and shot_images[idx]:
-                    scene["image_path"] = shot_images[idx][-1]
-            
-            ps_w.update_project(pid, {"scenes": updated_scenes})
-            ps_w.add_usage(pid, images=len(scene_prompts))
+            # Update image paths on the current scenes, not the list read before generation
+            produced = {idx - 1: {"image_path": paths[-1]} for idx, paths in shot_images.items() if paths}
+            updated_scenes = ps_w.modify_list(pid, "scenes", functools.partial(_merge_item_fields, produced=produced))
+            if updated_scenes is None:
+                updated_scenes = ps_w.get_project(pid).scenes or []
+            ps_w.add_usage(pid, images=len(scene_prompts), stage="scene_images")
             
             return {"scenes": updated_scenes}, usage
         finally:
@@ -853,20 +919,19 @@ async def _update_single_scene(request):
         if not project:
             return web.json_response({"error": "not found"}, status=404)
             
-        scenes = copy.deepcopy(project.scenes or [])
-        if index < 0 or index >= len(scenes):
+        def update_fields(scenes):
+            if index < 0 or index >= len(scenes):
+                return False
+            # Allow updating description fields
+            for key in ["name", "time", "location", "atmosphere", "elements"]:
+                if key in data:
+                    scenes[index][key] = data[key]
+
+        scenes = ps.modify_list(pid, "scenes", update_fields)
+        if scenes is None:
              return web.json_response({"error": "scene not found"}, status=404)
-             
-        # Update fields
-        scene = scenes[index]
-        # Allow updating description fields
-        for key in ["name", "time", "location", "atmosphere", "elements"]:
-            if key in data:
-                scene[key] = data[key]
-                
-        ps.update_project(pid, {"scenes": scenes})
         
-        return web.json_response({"status": "ok", "scene": scene})
+        return web.json_response({"status": "ok", "scene": scenes[index]})
     finally:
         db.close()
 
@@ -887,12 +952,14 @@ async def _update_single_scene_prompt(request):
         if not project:
             return web.json_response({"error": "not found"}, status=404)
         
-        scenes = copy.deepcopy(project.scenes or [])
-        if index < 0 or index >= len(scenes):
+        def set_prompt(scenes):
+            if index < 0 or index >= len(scenes):
+                return False
+            scenes[index]["prompt"] = prompt
+
+        scenes = ps.modify_list(pid, "scenes", set_prompt)
+        if scenes is None:
              return web.json_response({"error": "scene not found"}, status=404)
-             
-        scenes[index]["prompt"] = prompt
-        ps.update_project(pid, {"scenes": scenes})
         
         return web.json_response({"status": "ok", "scene": scenes[index]})
     finally:
@@ -931,16 +998,17 @@ async def _regenerate_single_scene_prompt(request):
     db = next(get_db())
     ps = ProjectService(db)
     try:
-        # Re-fetch to avoid conflicts
-        project = ps.get_project(pid)
-        scenes = copy.deepcopy(project.scenes or [])
-        if index < len(scenes):
+        # Applied to the current list (re-run on a concurrent write), not the one read before generation
+        def replace_scene(scenes):
+            if index >= len(scenes):
+                return False
             # Preserve image path if exists
             if "image_path" in scenes[index]:
                 updated_scene["image_path"] = scenes[index]["image_path"]
             scenes[index] = updated_scene
-            ps.update_project(pid, {"scenes": scenes})
-            ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+
+        if ps.modify_list(pid, "scenes", replace_scene) is not None:
+            ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="scene_prompts")
     finally:
         db.close()
         
@@ -972,8 +1040,12 @@ async def _regenerate_single_scene_image(request):
         # If new prompt provided, update it
         if new_prompt is not None:
             scene["prompt"] = new_prompt
-            scenes[index] = scene
-            ps.update_project(pid, {"scenes": scenes})
+
+            def set_prompt(items):
+                if index >= len(items):
+                    return False
+                items[index]["prompt"] = new_prompt
+            ps.modify_list(pid, "scenes", set_prompt)
             prompt = new_prompt
         else:
             prompt = scene.get("prompt")
@@ -1009,17 +1081,21 @@ async def _regenerate_single_scene_image(request):
                 sub_dir="scenes"
             )
             
-            # Update scene image path
-            project = ps_w.get_project(pid)
-            updated_scenes = list(project.scenes or [])
-            if index < len(updated_scenes):
-                idx = index + 1
-                if idx in shot_images and shot_images[idx]:
-                    updated_scenes[index]["image_path"] = shot_images[idx][-1]
-                    ps_w.update_project(pid, {"scenes": updated_scenes})
-                    ps_w.add_usage(pid, images=1)
+            # Update scene image path on the current list, not the one read before generation
+            updated_scenes = None
+            idx = index + 1
+            if idx in shot_images and shot_images[idx]:
+                def set_image(items):
+                    if index >= len(items):
+                        return False
+                    items[index]["image_path"] = shot_images[idx][-1]
+                updated_scenes = ps_w.modify_list(pid, "scenes", set_image)
+                if updated_scenes is not None:
+                    ps_w.add_usage(pid, images=1, stage="scene_images")
+            if updated_scenes is None:
+                updated_scenes = ps_w.get_project(pid).scenes or []
                     
-            return {"image_path": updated_scenes[index].get("image_path")}, usage
+            return {"image_path": updated_scenes[index].get("image_path") if index < len(updated_scenes) else None}, usage
         finally:
             db_w.close()
 
@@ -1041,13 +1117,18 @@ async def _generate_storyboard(request):
 
     if not script:
         return web.json_response({"error": "script missing"}, status=400)
+
+    if request.query.get("with_prompts") in ("1", "true"):
+        # Stream the storyboard and start prompt generation for each shot as soon as it closes
+        task_id = await _start_background_task(pid, "storyboard_prompt_generation", _storyboard_prompt_worker, pid, script)
+        return web.json_response({"status": "processing", "task_id": task_id})
         
-    storyboard, tokens = await _run_blocking(storyboard_gen.generate, script)
+    storyboard, tokens = await storyboard_gen.agenerate(script)
     
     db = next(get_db())
     ps = ProjectService(db)
     try:
-        ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+        ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="storyboard")
         ps.update_project(pid, {"storyboard": storyboard, "current_step": 4})
         ps.update_step(pid, 3, {"status": "completed", "token_usage": tokens})
     finally:
@@ -1056,6 +1137,56 @@ async def _generate_storyboard(request):
     return web.json_response({"storyboard": storyboard, "tokens": tokens})
 
 
+def _storyboard_prompt_worker(pid, script):
+    """流式分镜 + 提示词流水线 (分镜与提示词两个步骤一并完成)"""
+    db_w = next(get_db())
+    ps_w = ProjectService(db_w)
+    try:
+        project_data = ps_w.get_project(pid)
+        pipeline = prompt_gen.open_pipeline(
+            characters=project_data.characters or [],
+            scenes=project_data.scenes or [],
+            project_id=pid
+        )
+        storyboard, sb_tokens = storyboard_gen.generate_stream(script, on_shot=pipeline.submit)
+        if sb_tokens.get("error"):
+            # A truncated stream must not be saved as the storyboard; the background task fails instead
+            pipeline.cancel()
+            ps_w.update_step(pid, 3, {"status": "failed", "error": sb_tokens["error"]})
+            raise RuntimeError(f"Storyboard generation failed: {sb_tokens['error']}")
+
+        # Align with the final storyboard by position: shots the incremental parser missed or got wrong
+        pipeline.submit_missing(storyboard.get("shots", []))
+        image_prompts, video_prompts, prompt_tokens = pipeline.finish()
+
+        ps_w.add_tokens(pid, sb_tokens.get("prompt_tokens", 0), sb_tokens.get("completion_tokens", 0), stage="storyboard")
+        ps_w.update_project(pid, {"storyboard": storyboard, "current_step": 4})
+        ps_w.update_step(pid, 3, {"status": "completed", "token_usage": sb_tokens})
+
+        if storyboard.get("shots"):
+            ps_w.add_tokens(pid, prompt_tokens.get("prompt_tokens", 0), prompt_tokens.get("completion_tokens", 0), stage="shot_prompts")
+            ps_w.update_project(pid, {
+                "image_prompts": image_prompts,
+                "video_prompts": video_prompts,
+                "current_step": 5
+            })
+            ps_w.update_step(pid, 4, {"status": "completed", "token_usage": prompt_tokens})
+
+        tokens = {
+            "prompt_tokens": sb_tokens.get("prompt_tokens", 0) + prompt_tokens.get("prompt_tokens", 0),
+            "completion_tokens": sb_tokens.get("completion_tokens", 0) + prompt_tokens.get("completion_tokens", 0)
+        }
+        return {"storyboard": storyboard, "image_prompts": image_prompts, "video_prompts": video_prompts}, tokens
+    finally:
+        db_w.close()
+
+
+def _conflict_response(error):
+    return web.json_response(
+        {"error": str(error), "expected_version": error.expected, "current_version": error.actual}, status=409
+    )
+
+
 async def _update_storyboard(request):
     pid = request.match_info["pid"]
     data = await request.json()
@@ -1068,11 +1199,14 @@ async def _update_storyboard(request):
     try:
         if not ps.get_project(pid):
             return web.json_response({"error": "not found"}, status=404)
-        ps.update_project(pid, {"storyboard": storyboard})
+        # Optional "version" from the project the editor loaded: a stale edit gets 409 instead of overwriting
+        project = ps.update_project(pid, {"storyboard": storyboard}, expected_version=data.get("version"))
+    except ProjectConflictError as e:
+        return _conflict_response(e)
     finally:
         db.close()
         
-    return web.json_response({"status": "ok", "storyboard": storyboard})
+    return web.json_response({"status": "ok", "storyboard": storyboard, "version": project.edit_version})
 
 
 async def _generate_prompts(request):
@@ -1103,10 +1237,11 @@ async def _generate_prompts(request):
             image_prompts, video_prompts, tokens = prompt_gen.generate_all_prompts(
                 storyboard, 
                 characters=characters,
-                scenes=scenes
+                scenes=scenes,
+                project_id=pid
             )
             
-            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+            ps_w.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="shot_prompts")
             ps_w.update_project(pid, {
                 "image_prompts": image_prompts,
                 "video_prompts": video_prompts,
@@ -1130,7 +1265,8 @@ async def _update_prompts_data(request):
     db = next(get_db())
     ps = ProjectService(db)
     try:
-        if not ps.get_project(pid):
+        project = ps.get_project(pid)
+        if not project:
             return web.json_response({"error": "not found"}, status=404)
         
         updates = {}
@@ -1140,11 +1276,15 @@ async def _update_prompts_data(request):
             updates["video_prompts"] = video_prompts
             
         if updates:
-            ps.update_project(pid, updates)
+            # Optional "version" from the project the editor loaded (409 if it is stale)
+            project = ps.update_project(pid, updates, expected_version=data.get("version"))
+        version = project.edit_version
+    except ProjectConflictError as e:
+        return _conflict_response(e)
     finally:
         db.close()
         
-    return web.json_response({"status": "ok"})
+    return web.json_response({"status": "ok", "version": version})
 
 
 async def _update_single_prompt(request):
@@ -1164,27 +1304,18 @@ async def _update_single_prompt(request):
         if not project:
             return web.json_response({"error": "not found"}, status=404)
             
-        if p_type == "image":
-            prompts = copy.deepcopy(project.image_prompts or [])
-            target = next((p for p in prompts if p.get("shot_number") == shot_number), None)
-            if target:
-                target["positive_prompt"] = prompt_text
-            else:
-                prompts.append({"shot_number": shot_number, "positive_prompt": prompt_text})
-                prompts.sort(key=lambda x: x.get("shot_number", 0))
-            
-            ps.update_project(pid, {"image_prompts": prompts})
-            
-        elif p_type == "video":
-            prompts = copy.deepcopy(project.video_prompts or [])
-            target = next((p for p in prompts if p.get("shot_number") == shot_number), None)
-            if target:
-                target["video_prompt"] = prompt_text
-            else:
-                prompts.append({"shot_number": shot_number, "video_prompt": prompt_text})
-                prompts.sort(key=lambda x: x.get("shot_number", 0))
-                
-            ps.update_project(pid, {"video_prompts": prompts})
+        if p_type in ("image", "video"):
+            column, key = ("image_prompts", "positive_prompt") if p_type == "image" else ("video_prompts", "video_prompt")
+
+            def set_text(prompts):
+                target = next((p for p in prompts if p.get("shot_number") == shot_number), None)
+                if target:
+                    target[key] = prompt_text
+                else:
+                    prompts.append({"shot_number": shot_number, key: prompt_text})
+                    prompts.sort(key=lambda x: x.get("shot_number", 0))
+
+            ps.modify_list(pid, column, set_text)
             
         else:
             return web.json_response({"error": "invalid type"}, status=400)
@@ -1194,6 +1325,48 @@ async def _update_single_prompt(request):
         db.close()
 
 
+def _select_shot_path(paths, shot_number, path, size=0):
+    """Set the selected path of shot_number in a positional path list padded to size; False if out of range"""
+    while len(paths) < size:
+        paths.append(None)
+    if not 0 < shot_number <= len(paths):
+        return False
+    paths[shot_number-1] = path
+
+
+def _set_shot_prompt_field(prompts, shot_number, key, value):
+    """Set a field of the prompt for shot_number (by shot_number, else by position); False if there is none"""
+    target = next((p for p in prompts if p.get("shot_number") == shot_number), None)
+    if not target and 0 < shot_number <= len(prompts):
+        target = prompts[shot_number-1]
+    if not target:
+        return False
+    target[key] = value
+
+
+def _merge_item_fields(items, produced):
+    """Set the produced fields ({index: {field: value}}) on the current items in place, leaving other fields as edited"""
+    changed = False
+    for index, fields in produced.items():
+        if index >= len(items):
+            continue
+        for key, value in fields.items():
+            if items[index].get(key) != value:
+                items[index][key] = value
+                changed = True
+    return None if changed else False
+
+
+def _put_shot_prompt(prompts, shot_number, prompt_data):
+    """Replace the prompt of shot_number in place, or append it keeping the list ordered"""
+    existing_idx = next((i for i, p in enumerate(prompts) if p.get("shot_number") == shot_number), -1)
+    if existing_idx >= 0:
+        prompts[existing_idx] = prompt_data
+    else:
+        prompts.append(prompt_data)
+        prompts.sort(key=lambda x: x.get("shot_number", 0))
+
+
 async def _regenerate_single_prompt(request):
     pid = request.match_info["pid"]
     shot_number = int(request.match_info["shot_number"])
@@ -1239,18 +1412,9 @@ async def _regenerate_single_prompt(request):
                 scenes=scenes
             )
             
-            # Update prompts list
-            prompts = copy.deepcopy(project.image_prompts or [])
-            # Find existing and replace or append
-            existing_idx = next((i for i, p in enumerate(prompts) if p.get("shot_number") == shot_number), -1)
-            if existing_idx >= 0:
-                prompts[existing_idx] = prompt_data
-            else:
-                prompts.append(prompt_data)
-                prompts.sort(key=lambda x: x.get("shot_number", 0))
-                
-            ps.update_project(pid, {"image_prompts": prompts})
-            ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+            # Update prompts list (the current one: others may have changed it during generation)
+            ps.modify_list(pid, "image_prompts", functools.partial(_put_shot_prompt, shot_number=shot_number, prompt_data=prompt_data))
+            ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="shot_prompts")
             
             return web.json_response({"prompt": prompt_data, "tokens": tokens})
             
@@ -1265,16 +1429,8 @@ async def _regenerate_single_prompt(request):
             
             prompt_data, tokens = await _run_blocking(prompt_gen.regenerate_single_video_prompt, target_shot, img_prompt_text)
             
-            prompts = list(project.video_prompts or [])
-            existing_idx = next((i for i, p in enumerate(prompts) if p.get("shot_number") == shot_number), -1)
-            if existing_idx >= 0:
-                prompts[existing_idx] = prompt_data
-            else:
-                prompts.append(prompt_data)
-                prompts.sort(key=lambda x: x.get("shot_number", 0))
-                
-            ps.update_project(pid, {"video_prompts": prompts})
-            ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0))
+            ps.modify_list(pid, "video_prompts", functools.partial(_put_shot_prompt, shot_number=shot_number, prompt_data=prompt_data))
+            ps.add_tokens(pid, tokens.get("prompt_tokens", 0), tokens.get("completion_tokens", 0), stage="shot_prompts")
             
             return web.json_response({"prompt": prompt_data, "tokens": tokens})
             
@@ -1285,6 +1441,44 @@ async def _regenerate_single_prompt(request):
         db.close()
 
 
+def _shot_status_callback(pid, kind):
+    """on_status_update callback for the image/video generators: one shot row per event, the project row is not touched"""
+    prefix = f"shot_status_{kind}_"
+
+    def status_callback(key, value, extra=None):
+        try:
+            # Create a new session for thread safety as this runs in thread pool
+            db_cb = next(get_db())
+            try:
+                extra = extra or {}
+                shot_num = int(extra.get("shot_number") or key[len(prefix):])
+                ss_cb = ShotService(db_cb)
+                if extra.get("path"):
+                    if kind == "image":
+                        ss_cb.add_image_take(pid, shot_num, extra["path"], select=True)
+                    else:
+                        ss_cb.add_video_take(pid, shot_num, extra["path"])
+                ss_cb.set_status(pid, shot_num, kind, value, error=extra.get("error"))
+
+                if "error" in extra:
+                    req_id = extra.get("request_id", "unknown")
+                    label = "" if kind == "image" else " video"
+                    LogService(db_cb).log(
+                        pid,
+                        None,
+                        "ERROR",
+                        f"Shot {shot_num}{label} failed: {extra['error']} (ReqID: {req_id})",
+                        module=f"{kind}_generator",
+                        details=extra
+                    )
+            finally:
+                db_cb.close()
+        except Exception as e:
+            logger.error(f"Status callback failed: {e}")
+
+    return status_callback
+
+
 async def _generate_images(request):
     pid = request.match_info["pid"]
     data = await request.json()
@@ -1311,55 +1505,7 @@ async def _generate_images(request):
     def worker():
         db_w = next(get_db())
         ps_w = ProjectService(db_w)
-        
-        def status_callback(key, value, extra=None):
-            try:
-                # Create a new session for thread safety as this runs in thread pool
-                db_cb = next(get_db())
-                ps_cb = ProjectService(db_cb)
-                try:
-                    project = ps_cb.get_project(pid)
-                    if project:
-                        meta = dict(project.topic_meta or {})
-                        meta[key] = value
-                        
-                        updates = {"topic_meta": meta}
-                        
-                        if extra and "path" in extra and "shot_number" in extra:
-                            shot_images = dict(meta.get("shot_images") or {})
-                            shot_num = str(extra["shot_number"])
-                            if shot_num not in shot_images:
-                                shot_images[shot_num] = []
-                            # Append if not exists (simple check)
-                            if extra["path"] not in shot_images[shot_num]:
-                                shot_images[shot_num].append(extra["path"])
-                            meta["shot_images"] = shot_images
-                            updates["topic_meta"] = meta
-                        
-                        # Handle error detail
-                        if extra and "error" in extra:
-                            # Extract shot number if available
-                            shot_num = str(extra.get("shot_number", "unknown"))
-                            meta[f"shot_error_image_{shot_num}"] = extra["error"]
-                            updates["topic_meta"] = meta
-                            
-                            # Log to DB
-                            ls_cb = LogService(db_cb)
-                            req_id = extra.get("request_id", "unknown")
-                            ls_cb.log(
-                                pid, 
-                                None, 
-                                "ERROR", 
-                                f"Shot {shot_num} failed: {extra['error']} (ReqID: {req_id})", 
-                                module="image_generator", 
-                                details=extra
-                            )
-                            
-                        ps_cb.update_project(pid, updates)
-                finally:
-                    db_cb.close()
-            except Exception as e:
-                logger.error(f"Status callback failed: {e}")
+        status_callback = _shot_status_callback(pid, "image")
 
         try:
             # Build Reference Map
@@ -1433,24 +1579,13 @@ async def _generate_images(request):
                 reference_map=reference_map
             )
             
-            # Fetch latest project state to preserve history from callbacks or previous runs
-            project = ps_w.get_project(pid)
-            meta = dict(project.topic_meta or {})
-            current_shot_images = dict(meta.get("shot_images") or {})
-            current_image_paths = list(project.image_paths or [])
-            
-            # Ensure current_image_paths matches prompts length
-            while len(current_image_paths) < len(image_prompts):
-                current_image_paths.append(None)
+            ss_w = ShotService(db_w)
+            selected = {}
 
-            # Merge new results
+            # Merge new results (takes are idempotent, in case a callback was missed)
             for s_num, paths in shot_images.items():
-                s_key = str(s_num)
-                if s_key not in current_shot_images:
-                    current_shot_images[s_key] = []
                 for p in paths:
-                    if p not in current_shot_images[s_key]:
-                        current_shot_images[s_key].append(p)
+                    ss_w.add_image_take(pid, s_num, p)
                 
                 # Update current selection to the latest generated image
                 # Assuming prompts are ordered by shot_number or index corresponds
@@ -1458,18 +1593,23 @@ async def _generate_images(request):
                 for idx, prompt in enumerate(image_prompts):
                     if prompt.get("shot_number", idx+1) == s_num:
                         if paths:
-                            current_image_paths[idx] = paths[-1]
+                            selected[idx] = paths[-1]
                         break
-            
-            ps_w.update_project(pid, {
-                "image_paths": current_image_paths,
-                "topic_meta": {**meta, "shot_images": current_shot_images},
-                "current_step": 6
-            })
+
+            # Applied to the latest list to preserve selections from previous runs
+            def merge(current_image_paths):
+                # Ensure current_image_paths matches prompts length
+                while len(current_image_paths) < len(image_prompts):
+                    current_image_paths.append(None)
+                for idx, path in selected.items():
+                    current_image_paths[idx] = path
+
+            current_image_paths = ps_w.modify_list(pid, "image_paths", merge)
+            ps_w.update_project(pid, {"current_step": 6})
             
             # Update usage stats
             total_gen_images = sum(len(paths) for paths in shot_images.values())
-            ps_w.add_usage(pid, images=total_gen_images)
+            ps_w.add_usage(pid, images=total_gen_images, stage="shot_images")
             
             ps_w.update_step(pid, 5, {"status": "completed", "token_usage": usage})
             return {"image_paths": current_image_paths, "shot_images": shot_images}, usage
@@ -1561,38 +1701,20 @@ async def _upload_shot_image(request):
             if not project:
                 return web.json_response({"error": "project not found"}, status=404)
                 
-            meta = dict(project.topic_meta or {})
-            shot_images = dict(meta.get("shot_images") or {})
-            shot_num_str = str(shot_number)
-            
-            if shot_num_str not in shot_images:
-                shot_images[shot_num_str] = []
-            
             # Use TOS URL if available, else local path (but usually TOS is required for frontend access if not proxied)
             # Frontend uses normalizePath which handles both.
             # But standard is TOS url if uploaded.
             stored_path = final_url if final_url else str(image_path)
             
-            shot_images[shot_num_str].append(stored_path)
-            
-            # Update current image path
-            current_image_paths = list(project.image_paths or [])
-            # Ensure size
-            image_prompts = project.image_prompts or []
-            while len(current_image_paths) < len(image_prompts):
-                current_image_paths.append(None)
-                
-            if 0 < shot_number <= len(current_image_paths):
-                current_image_paths[shot_number-1] = stored_path
-                
-            meta["shot_images"] = shot_images
+            ss = ShotService(db)
+            ss.add_image_take(pid, shot_number, stored_path, source="upload", select=True)
             # Mark as completed manually since we have an image
-            meta[f"shot_status_image_{shot_number}"] = "completed"
+            ss.set_status(pid, shot_number, "image", "completed")
             
-            ps.update_project(pid, {
-                "topic_meta": meta,
-                "image_paths": current_image_paths
-            })
+            # Update current image path
+            ps.modify_list(pid, "image_paths", functools.partial(
+                _select_shot_path, shot_number=shot_number, path=stored_path, size=len(project.image_prompts or [])
+            ))
             
             return web.json_response({"status": "ok", "path": stored_path})
             
@@ -1620,15 +1742,9 @@ async def _select_shot_image(request):
         if not project:
             return web.json_response({"error": "not found"}, status=404)
             
-        current_image_paths = list(project.image_paths or [])
-        # Ensure size
-        image_prompts = project.image_prompts or []
-        while len(current_image_paths) < len(image_prompts):
-            current_image_paths.append(None)
-            
-        if 0 < shot_number <= len(current_image_paths):
-            current_image_paths[shot_number-1] = path
-            ps.update_project(pid, {"image_paths": current_image_paths})
+        if ps.modify_list(pid, "image_paths", functools.partial(
+            _select_shot_path, shot_number=shot_number, path=path, size=len(project.image_prompts or [])
+        )) is not None:
             return web.json_response({"status": "ok"})
         else:
              return web.json_response({"error": "shot number out of range"}, status=400)
@@ -1660,7 +1776,9 @@ async def _generate_single_shot_image(request):
         new_prompt_text = data.get("prompt")
         if new_prompt_text:
             target_prompt["positive_prompt"] = new_prompt_text
-            ps.update_project(pid, {"image_prompts": image_prompts})
+            ps.modify_list(pid, "image_prompts", functools.partial(
+                _set_shot_prompt_field, shot_number=shot_number, key="positive_prompt", value=new_prompt_text
+            ))
             
         meta = project.topic_meta or {}
         ratio = meta.get("aspect_ratio", "16:9")
@@ -1669,46 +1787,7 @@ async def _generate_single_shot_image(request):
     finally:
         db.close()
         
-    def status_callback(key, value, extra=None):
-        try:
-            # Create a new session for thread safety
-            db_cb = next(get_db())
-            ps_cb = ProjectService(db_cb)
-            try:
-                project = ps_cb.get_project(pid)
-                if project:
-                    meta = dict(project.topic_meta or {})
-                    meta[key] = value
-                    
-                    updates = {"topic_meta": meta}
-                    
-                    if extra and "path" in extra and "shot_number" in extra:
-                        shot_images = dict(meta.get("shot_images") or {})
-                        shot_num = str(extra["shot_number"])
-                        if shot_num not in shot_images:
-                            shot_images[shot_num] = []
-                        # Append if not exists
-                        if extra["path"] not in shot_images[shot_num]:
-                            shot_images[shot_num].append(extra["path"])
-                        meta["shot_images"] = shot_images
-                        updates["topic_meta"] = meta
-                    
-                    # Handle error detail
-                    if extra and "error" in extra:
-                        # Extract shot number if available
-                        shot_num = str(extra.get("shot_number", "unknown"))
-                        meta[f"shot_error_image_{shot_num}"] = extra["error"]
-                        updates["topic_meta"] = meta
-                        
-                        # Log to DB
-                        ls_cb = LogService(db_cb)
-                        ls_cb.log(pid, None, "ERROR", f"Shot {shot_num} failed: {extra['error']}", module="image_generator", details=extra)
-                        
-                    ps_cb.update_project(pid, updates)
-            finally:
-                db_cb.close()
-        except Exception as e:
-            logger.error(f"Status callback failed: {e}")
+    status_callback = _shot_status_callback(pid, "image")
 
     # Explicitly set status to processing before starting (optional but good for immediate feedback)
     # Actually callback inside generate_shot_images does this, but it runs in thread.
@@ -1800,48 +1879,27 @@ async def _generate_single_shot_image(request):
     db = next(get_db())
     ps = ProjectService(db)
     try:
-        project = ps.get_project(pid)
-        # Refresh meta
-        meta = project.topic_meta or {}
-        current_shot_images = dict(meta.get("shot_images") or {})
-        current_image_paths = list(project.image_paths or [])
-        
-        while len(current_image_paths) < len(image_prompts):
-            current_image_paths.append(None)
+        ss = ShotService(db)
 
-        # Ensure new images are in shot_images (in case callback missed or we want to double check)
-        # Also update current_image_paths
+        # Ensure new images are recorded as takes (in case callback missed or we want to double check)
+        # Also update the current image path
         success = False
-        if shot_number in new_shot_images:
-            shot_num_str = str(shot_number)
-            if shot_num_str not in current_shot_images:
-                current_shot_images[shot_num_str] = []
-            
-            # Merge new images
-            if new_shot_images[shot_number]:
-                success = True
-                for path in new_shot_images[shot_number]:
-                    if path not in current_shot_images[shot_num_str]:
-                        current_shot_images[shot_num_str].append(path)
-            
-                # Update current path to the latest one
-                if 0 < shot_number <= len(current_image_paths):
-                    current_image_paths[shot_number-1] = new_shot_images[shot_number][-1] # Use last generated
+        if new_shot_images.get(shot_number):
+            success = True
+            for path in new_shot_images[shot_number]:
+                ss.add_image_take(pid, shot_number, path)
+        
+            # Update current path to the latest one (use last generated)
+            ps.modify_list(pid, "image_paths", functools.partial(
+                _select_shot_path, shot_number=shot_number, path=new_shot_images[shot_number][-1], size=len(image_prompts)
+            ))
                 
         # Update status explicitly based on success
-        if success:
-            meta[f"shot_status_image_{shot_number}"] = "completed"
-        else:
-            meta[f"shot_status_image_{shot_number}"] = "failed"
-                
-        ps.update_project(pid, {
-            "image_paths": current_image_paths,
-            "topic_meta": {**meta, "shot_images": current_shot_images}
-        })
+        ss.set_status(pid, shot_number, "image", "completed" if success else "failed")
         
         # Update usage stats
         generated_count = len(new_shot_images.get(shot_number, []))
-        ps.add_usage(pid, images=generated_count)
+        ps.add_usage(pid, images=generated_count, stage="shot_images")
     finally:
         db.close()
     
@@ -1867,12 +1925,9 @@ async def _update_image_selection(request):
         if not project:
             return web.json_response({"error": "not found"}, status=404)
             
-        image_paths = list(project.image_paths or [])
-        while len(image_paths) < shot_number:
-            image_paths.append(None)
-            
-        image_paths[shot_number-1] = image_path
-        ps.update_project(pid, {"image_paths": image_paths})
+        ps.modify_list(pid, "image_paths", functools.partial(
+            _select_shot_path, shot_number=shot_number, path=image_path, size=shot_number
+        ))
         
         return web.json_response({"status": "ok"})
     finally:
@@ -1905,46 +1960,7 @@ async def _generate_videos(request):
         db_w = next(get_db())
         ps_w = ProjectService(db_w)
         
-        def status_callback(key, value, extra=None):
-            try:
-                db_cb = next(get_db())
-                ps_cb = ProjectService(db_cb)
-                try:
-                    project = ps_cb.get_project(pid)
-                    if project:
-                        meta = dict(project.topic_meta or {})
-                        meta[key] = value
-                        updates = {"topic_meta": meta}
-                        
-                        if extra and "path" in extra and "index" in extra:
-                            current_paths = list(project.video_paths or [])
-                            idx = extra["index"]
-                            while len(current_paths) <= idx:
-                                current_paths.append(None)
-                            current_paths[idx] = extra["path"]
-                            updates["video_paths"] = current_paths
-                            
-                        # Handle error logging
-                        if extra and "error" in extra:
-                            shot_num = extra.get("shot_number", "unknown")
-                            err_msg = extra.get("error", "Unknown error")
-                            req_id = extra.get("request_id", "unknown")
-                            
-                            ls_cb = LogService(db_cb)
-                            ls_cb.log(
-                                pid, 
-                                None, 
-                                "ERROR", 
-                                f"Shot {shot_num} video failed: {err_msg} (ReqID: {req_id})", 
-                                module="video_generator", 
-                                details=extra
-                            )
-                            
-                        ps_cb.update_project(pid, updates)
-                finally:
-                    db_cb.close()
-            except Exception as e:
-                logger.error(f"Status callback failed: {e}")
+        status_callback = _shot_status_callback(pid, "video")
 
         try:
             video_paths, usage = video_gen.generate_shot_videos(
@@ -1970,7 +1986,7 @@ async def _generate_videos(request):
                         total_duration += float(shots[i].get("duration", 5))
                     else:
                         total_duration += 5.0
-            ps_w.add_usage(pid, videos=total_videos, duration=total_duration)
+            ps_w.add_usage(pid, videos=total_videos, duration=total_duration, stage="videos")
             
             ps_w.update_step(pid, 4, {"status": "completed", "token_usage": usage})
             return {"video_paths": video_paths}, usage
@@ -2004,15 +2020,15 @@ async def _generate_single_shot_video(request):
                 
         if target_prompt and new_prompt_text is not None:
             target_prompt["video_prompt"] = new_prompt_text
-            ps.update_project(pid, {"video_prompts": video_prompts})
-            
-        image_paths = project.image_paths or []
-        while len(image_paths) < shot_number:
-            image_paths.append(None)
+            ps.modify_list(pid, "video_prompts", functools.partial(
+                _set_shot_prompt_field, shot_number=shot_number, key="video_prompt", value=new_prompt_text
+            ))
             
+        image_paths = list(project.image_paths or [])
         if new_image_path:
-            image_paths[shot_number-1] = new_image_path
-            ps.update_project(pid, {"image_paths": image_paths})
+            image_paths = ps.modify_list(pid, "image_paths", functools.partial(
+                _select_shot_path, shot_number=shot_number, path=new_image_path, size=shot_number
+            )) or image_paths
             
         image_path = image_paths[shot_number-1] if 0 < shot_number <= len(image_paths) else None
         
@@ -2023,13 +2039,12 @@ async def _generate_single_shot_video(request):
             duration = float(shots[shot_number-1].get("duration", 5))
             
         # Extract meta
-        meta = dict(project.topic_meta or {})
+        meta = project.topic_meta or {}
         ratio = meta.get("aspect_ratio", "16:9")
         resolution = meta.get("resolution", "1080p")
         
         # Mark as processing
-        meta[f"shot_status_video_{shot_number}"] = "processing"
-        ps.update_project(pid, {"topic_meta": meta})
+        ShotService(db).set_status(pid, shot_number, "video", "processing")
         
     finally:
         db.close()
@@ -2059,25 +2074,38 @@ async def _generate_single_shot_video(request):
         try:
             ts_w.update_task(task_id, status="running", progress=0)
             
-            # Submit single task
+            # Submit single task; the row id is chosen first so the callback URL can be signed for it
+            video_task_pk = generate_uuid()
             submission_result = video_gen.submit_single_video_task(
                 params,
-                pid
+                pid,
+                callback_ref=video_task_pk
             )
             
             if "error" in submission_result:
                 raise Exception(submission_result["error"])
                 
             volc_task_id = submission_result["task_id"]
+            model_id = submission_result.get("usage", {}).get("model")
+            callback = bool(submission_result.get("usage", {}).get("callback"))
+            
+            # Count the child before it exists so an early finish never sees total=0
+            ts_w.add_children(task_id)
             
             # Create VideoTask record
             vt = VideoTask(
-                id=generate_uuid(),
+                id=video_task_pk,
                 project_id=pid,
                 task_id=task_id,
                 shot_number=shot_number,
                 volc_task_id=volc_task_id,
-                status="submitted"
+                status="submitted",
+                model_id=model_id,
+                duration=int(duration),
+                callback_registered=callback,
+                params=params,
+                # First poll lands near the earliest plausible finish instead of right away
+                next_check_at=poll_planner.next_check_at(model_id, duration, None, callback=callback)
             )
             db_w.add(vt)
             db_w.commit()
@@ -2085,14 +2113,8 @@ async def _generate_single_shot_video(request):
         except Exception as e:
             logger.error(f"Single video submission failed: {e}")
             ts_w.update_task(task_id, status="failed", error=str(e))
-            # Also update meta to failed
-            ps_w = ProjectService(db_w)
-            project = ps_w.get_project(pid)
-            if project:
-                meta = dict(project.topic_meta or {})
-                meta[f"shot_status_video_{shot_number}"] = "failed"
-                meta[f"shot_error_video_{shot_number}"] = str(e)
-                ps_w.update_project(pid, {"topic_meta": meta})
+            # Also mark the shot as failed
+            ShotService(db_w).set_status(pid, shot_number, "video", "failed", error=str(e))
         finally:
             db_w.close()
 
@@ -2115,12 +2137,12 @@ async def _merge_videos(request):
         shots = storyboard.get("shots", [])
         num_shots = len(shots)
         
-        current_video_paths = list(project.video_paths or [])
+        current_video_paths = ShotService(db).selected_paths(pid, "video", project.video_paths)
         # Ensure list size matches shots
         while len(current_video_paths) < num_shots:
             current_video_paths.append(None)
             
-        updated = False
+        synced = {}
         for i in range(num_shots):
             shot_number = i + 1
             # Find latest completed task for this shot
@@ -2134,11 +2156,20 @@ async def _merge_videos(request):
                 if current_video_paths[i] != latest_task.video_url:
                     logger.info(f"Syncing video path for shot {shot_number}: {current_video_paths[i]} -> {latest_task.video_url}")
                     current_video_paths[i] = latest_task.video_url
-                    updated = True
-        
-        if updated:
-            ps.update_project(pid, {"video_paths": current_video_paths})
-            # Update local var
+                    synced[i] = latest_task.video_url
+        
+        written = None
+        if synced:
+            # Only the synced slots are written, so selections changed meanwhile are kept
+            def merge(paths):
+                while len(paths) < num_shots:
+                    paths.append(None)
+                for i, url in synced.items():
+                    paths[i] = url
+            written = ps.modify_list(pid, "video_paths", merge)
+        if written is not None:
+            video_paths = written
+        elif synced:
             video_paths = current_video_paths
         else:
             video_paths = project.video_paths or []
@@ -2177,28 +2208,24 @@ async def _merge_videos(request):
 
 
 async def _list_projects(request):
-    db = next(get_db())
-    ps = ProjectService(db)
+    # Parse query params
+    filters = {}
+    for key in ["name", "status", "input_type", "platform", "resolution", "aspect_ratio"]:
+        val = request.query.get(key)
+        if val:
+            filters[key] = val
+
     try:
-        # Parse query params
-        filters = {}
-        for key in ["name", "status", "input_type", "platform", "resolution", "aspect_ratio"]:
-            val = request.query.get(key)
-            if val:
-                filters[key] = val
-                
-        projects = ps.get_all_projects(filters)
-        simple_list = []
-        for p in projects:
-            simple_list.append({
-                "project_id": p.id,
-                "project_name": p.name,
-                "status": p.status,
-                "created_at": p.created_at.isoformat() if p.created_at else None
-            })
-        return web.json_response({"projects": simple_list})
-    finally:
-        db.close()
+        limit = int(request.query["limit"]) if request.query.get("limit") else None
+        if limit is not None and limit <= 0:
+            raise ValueError("limit must be positive")
+        projects, next_cursor = await run_db(
+            request,
+            lambda db: ProjectService(db).list_project_summaries(filters, limit=limit, cursor=request.query.get("cursor"))
+        )
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    return web.json_response({"projects": projects, "next_cursor": next_cursor})
 
 
 async def _delete_project(request):
@@ -2296,13 +2323,22 @@ async def _reload_config_api(request):
         
         # 2. Reload VEADKClient
         from src.models.veadk_client import veadk_client
+        http_transport.reload_config()
+        rate_limiter.reload_config()
+        llm_cache.reload_config()
+        circuit_breakers.reload_config()
         veadk_client.reload_config()
+        VideoScheduler().reload_config()
+        video_ingestion.reload_config()
+        video_callback.reload_config()
+        poll_planner.reload_config()
         
         # 3. Reload Generators
         # Using global instances defined in this module
         image_gen.reload_config()
         video_gen.reload_config()
         prompt_gen.reload_config()
+        job_scheduler.reload_config()
         
         # 4. Check TOS update logic (re-init client)
         def configure_tos():
@@ -2328,6 +2364,89 @@ async def _reload_config_api(request):
 
 
 
+async def _system_stats(request):
+    """Runtime stats of shared infrastructure (connection pools etc.)"""
+    return web.json_response({
+        "http_transport": http_transport.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "llm_cache": llm_cache.stats(),
+        "circuit_breakers": circuit_breakers.stats(),
+        "video_scheduler": VideoScheduler().stats(),
+        "video_ingestion": video_ingestion.stats(),
+        "video_callback": video_callback.stats(),
+        "poll_planner": poll_planner.stats(),
+        "job_scheduler": job_scheduler.stats(),
+        "model_summary": metrics.model_summary()
+    })
+
+
+async def _system_metrics(request):
+    """Model call metrics; ?format=prometheus for the text exposition format"""
+    if request.query.get("format") == "prometheus":
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+    return web.json_response({"models": metrics.model_summary(), **metrics.snapshot()})
+
+
+def _video_task_volc_id(db, task_pk):
+    return db.query(VideoTask.volc_task_id).filter(VideoTask.id == task_pk).scalar()
+
+
+async def _video_callback(request):
+    """Completion callback for video tasks submitted with a signed callback_url"""
+    task_pk = request.query.get("task")
+    if not video_callback.verify(task_pk, request.query.get("exp"), request.query.get("sig")):
+        video_callback.count("rejected")
+        return web.json_response({"error": "invalid or expired signature"}, status=403)
+    video_callback.count("received")
+    try:
+        data = await request.json()
+    except Exception:
+        return web.json_response({"error": "invalid json"}, status=400)
+
+    volc_task_id = data.get("id") or data.get("task_id") or (data.get("data") or {}).get("id")
+    if not volc_task_id:
+        return web.json_response({"error": "missing task id"}, status=400)
+    # The URL was signed for one VideoTask; refuse other provider tasks (e.g. one replaced by a resubmission).
+    # A row not written yet is left to the claim in handle_callback
+    current = await run_db(request, _video_task_volc_id, task_pk)
+    if current is not None and current != volc_task_id:
+        video_callback.count("rejected")
+        return web.json_response({"error": "task does not match the signed callback"}, status=403)
+    if str(data.get("status", "")).lower() in ("queued", "running"):
+        video_callback.count("ignored")
+        return web.json_response({"status": "ok", "applied": False})
+
+    # The pushed body is not trusted: the provider API is the source of truth
+    result = await async_veadk_client.acheck_video_task_status(volc_task_id)
+    if result[0] not in ("SUCCEEDED", "FAILED", "EXPIRED"):
+        video_callback.count("ignored")
+        return web.json_response({"status": "ok", "applied": False})
+
+    loop = asyncio.get_running_loop()
+    applied = await loop.run_in_executor(None, VideoScheduler().handle_callback, task_pk, volc_task_id, result)
+    video_callback.count("applied" if applied else "ignored")
+    return web.json_response({"status": "ok", "applied": applied})
+
+
+async def _get_circuits(request):
+    """Circuit breaker state per external operation"""
+    return web.json_response({
+        "enabled": circuit_breakers.enabled,
+        "circuits": circuit_breakers.stats()
+    })
+
+
+async def _reset_circuits(request):
+    """Manually close a circuit (or all circuits when no name is given)"""
+    name = None
+    if request.can_read_body:
+        data = await request.json()
+        name = data.get("name")
+    if not circuit_breakers.reset(name):
+        return web.json_response({"error": f"circuit '{name}' not found"}, status=404)
+    return web.json_response({"status": "ok", "circuits": circuit_breakers.stats()})
+
+
 async def _list_buckets(request):
     """List available TOS buckets"""
     # Support explicit credentials via POST
@@ -2492,6 +2611,14 @@ async def _create_app():
             raise
 
     app.middlewares.append(request_logger)
+    # Request-scoped async DB session for handlers that use run_db
+    app.middlewares.append(db_session_middleware)
+
+    async def _close_async_client(app):
+        await async_veadk_client.close()
+
+    app.on_cleanup.append(_close_async_client)
+    app.on_cleanup.append(close_async_engine)
 
     app.router.add_get("/", _index)
     app.router.add_get("/health", _health)
@@ -2505,12 +2632,20 @@ async def _create_app():
     # Task & Log APIs
     app.router.add_get("/api/tasks/{task_id}", _get_task_status)
     app.router.add_get("/api/projects/{pid}/tasks", _get_project_tasks)
+    app.router.add_get("/api/projects/{pid}/queue", _get_project_queue)
+    app.router.add_get("/api/projects/{pid}/usage", _get_project_usage)
+    app.router.add_patch("/api/projects/{pid}/meta", _patch_project_meta)  # Partial topic_meta update
     app.router.add_get("/api/logs", _get_logs_api)
 
     # Config APIs
     app.router.add_get("/api/config", _get_config)
     app.router.add_post("/api/config", _update_config)
     app.router.add_post("/api/system/reload", _reload_config_api) # Add reload API
+    app.router.add_get("/api/system/stats", _system_stats) # Transport / scheduler stats
+    app.router.add_get("/api/system/metrics", _system_metrics)
+    app.router.add_post("/api/callbacks/video", _video_callback)
+    app.router.add_get("/api/system/circuits", _get_circuits)
+    app.router.add_post("/api/system/circuits/reset", _reset_circuits)
     app.router.add_get("/api/buckets", _list_buckets)  # List Buckets
     app.router.add_post("/api/buckets", _list_buckets) # List Buckets (with creds)
     app.router.add_get("/api/buckets/{bucket}/directories", _list_directories) # List Directories
@@ -2597,7 +2732,8 @@ def start_server_in_thread(host: str, port: int):
     t = threading.Thread(target=_runner, daemon=True)
     t.start()
     
-    # Start Video Scheduler
+    # Start Video Scheduler (status polling) and the ingestion pool it hands finished videos to
+    video_ingestion.start()
     VideoScheduler().start()
     
     return t
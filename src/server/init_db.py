@@ -1,9 +1,12 @@
 from .database import engine, Base
-from .models import Project, Task, Log, VideoTask
+from .models import Project, Task, Log, VideoTask, Shot, ImageTake, VideoTake, UsageEvent
+from .update_schema import update_schema
 
 def init_db():
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    # create_all does not add columns to existing tables
+    update_schema()
     print("Database tables created.")
 
 if __name__ == "__main__":
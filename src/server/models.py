@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, JSON, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Column, String, Integer, JSON, DateTime, ForeignKey, Text, Float, Index, Boolean, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -17,6 +17,10 @@ class Project(Base):
     status = Column(String, default="pending") # pending, in_progress, completed, failed
     current_step = Column(Integer, default=0)
     steps = Column(JSON, default=[])
+    # Copies of topic_meta keys the project list filters on (kept in sync by ProjectService)
+    platform = Column(String, nullable=True)
+    resolution = Column(String, nullable=True)
+    aspect_ratio = Column(String, nullable=True)
     
     # JSON fields for flexible data storage
     topic_meta = Column(JSON, default={})
@@ -29,14 +33,38 @@ class Project(Base):
     image_paths = Column(JSON, default=[])
     video_paths = Column(JSON, default=[])
     final_video = Column(String, nullable=True)
-    total_tokens = Column(JSON, default={})
-    usage_stats = Column(JSON, default={})
+    total_tokens = Column(JSON, default={}) # Legacy; totals now live in the usage_* rollup columns
+    usage_stats = Column(JSON, default={}) # Legacy
+    # Usage rollup, incremented atomically alongside each UsageEvent row
+    usage_prompt_tokens = Column(Integer, default=0)
+    usage_completion_tokens = Column(Integer, default=0)
+    usage_images = Column(Integer, default=0)
+    usage_videos = Column(Integer, default=0)
+    usage_video_seconds = Column(Float, default=0.0)
+    
+    # Optimistic concurrency: every ORM update is UPDATE ... WHERE version = :v and bumps it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Version of the editor-owned content (storyboard / prompts); pipeline progress writes leave it alone
+    edit_version = Column(Integer, nullable=False, default=1, server_default="1")
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
     tasks = relationship("Task", back_populates="project", cascade="all, delete-orphan")
     logs = relationship("Log", back_populates="project", cascade="all, delete-orphan")
+    shots = relationship("Shot", back_populates="project", cascade="all, delete-orphan", order_by="Shot.shot_number")
+    usage_events = relationship("UsageEvent", back_populates="project", cascade="all, delete-orphan")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    # Project list: newest first with keyset pagination on (created_at, id), optionally filtered
+    __table_args__ = (
+        Index("ix_projects_created_id", "created_at", "id"),
+        Index("ix_projects_status_created", "status", "created_at", "id"),
+        Index("ix_projects_platform_created", "platform", "created_at", "id"),
+        Index("ix_projects_resolution_created", "resolution", "created_at", "id"),
+        Index("ix_projects_aspect_ratio_created", "aspect_ratio", "created_at", "id"),
+    )
 
     def to_dict(self):
         base_dict = {
@@ -46,6 +74,7 @@ class Project(Base):
             "input_content": self.input_content,
             "status": self.status,
             "current_step": self.current_step,
+            "version": self.edit_version,
             "steps": self.steps,
             "topic_meta": self.topic_meta,
             "script": self.script,
@@ -57,8 +86,8 @@ class Project(Base):
             "image_paths": self.image_paths,
             "video_paths": self.video_paths,
             "final_video": self.final_video,
-            "total_tokens": self.total_tokens,
-            "usage_stats": self.usage_stats,
+            "total_tokens": self.token_totals(),
+            "usage_stats": self.usage_totals(),
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
@@ -66,8 +95,77 @@ class Project(Base):
         if self.topic_meta:
             for k, v in self.topic_meta.items():
                 base_dict[k] = v
+        if self.shots:
+            self._overlay_shots(base_dict)
         return base_dict
 
+    def token_totals(self):
+        prompt_tokens = self.usage_prompt_tokens or 0
+        completion_tokens = self.usage_completion_tokens or 0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+    def usage_totals(self):
+        return {
+            "total_images": self.usage_images or 0,
+            "total_videos": self.usage_videos or 0,
+            "total_video_duration": self.usage_video_seconds or 0.0
+        }
+
+    def _overlay_shots(self, base_dict):
+        """Assemble the legacy per-shot keys (shot_status_*, shot_error_*, shot_images, *_paths) from Shot rows"""
+        shot_images = {k: list(v) for k, v in (base_dict.get("shot_images") or {}).items()}
+        paths = {"image": list(self.image_paths or []), "video": list(self.video_paths or [])}
+        for shot in self.shots:
+            n = shot.shot_number
+            for kind in ("image", "video"):
+                status = getattr(shot, f"{kind}_status")
+                if status:
+                    base_dict[f"shot_status_{kind}_{n}"] = status
+                error = getattr(shot, f"{kind}_error")
+                if error:
+                    base_dict[f"shot_error_{kind}_{n}"] = error
+                selected = getattr(shot, f"{kind}_path")
+                if selected and n > 0:
+                    while len(paths[kind]) < n:
+                        paths[kind].append(None)
+                    paths[kind][n - 1] = selected
+            if shot.image_takes:
+                takes = shot_images.setdefault(str(n), [])
+                for take in shot.image_takes:
+                    if take.path not in takes:
+                        takes.append(take.path)
+        base_dict["shot_images"] = shot_images
+        base_dict["image_paths"] = paths["image"]
+        base_dict["video_paths"] = paths["video"]
+
+
+class UsageEvent(Base):
+    """Append-only usage ledger: one row per model call batch, summed into the Project usage_* columns"""
+    __tablename__ = "usage_events"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    project_id = Column(String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    stage = Column(String, nullable=True) # script, characters, storyboard, images, videos ...
+    model = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    images = Column(Integer, default=0)
+    videos = Column(Integer, default=0)
+    video_seconds = Column(Float, default=0.0)
+    request_id = Column(String, nullable=True) # Idempotency key: an event is counted once per project
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    project = relationship("Project", back_populates="usage_events")
+
+    __table_args__ = (
+        UniqueConstraint("project_id", "request_id", name="uq_usage_events_project_request"),
+        Index("ix_usage_events_project_created", "project_id", "created_at"),
+    )
+
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -80,6 +178,10 @@ class Task(Base):
     current_step = Column(String, nullable=True) # Description of current step
     result = Column(JSON, nullable=True)
     error = Column(Text, nullable=True)
+    # Child VideoTask counters, maintained with atomic increments (NULL = task predates them)
+    total_count = Column(Integer, nullable=True)
+    completed_count = Column(Integer, nullable=True)
+    failed_count = Column(Integer, nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
@@ -105,6 +207,70 @@ class Log(Base):
     task = relationship("Task", back_populates="logs")
 
 
+class Shot(Base):
+    """Per-shot state; status changes are single-row updates instead of rewriting Project.topic_meta"""
+    __tablename__ = "shots"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    project_id = Column(String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    shot_number = Column(Integer, nullable=False)
+    image_prompt = Column(JSON, nullable=True)
+    video_prompt = Column(JSON, nullable=True)
+    image_path = Column(String, nullable=True) # Selected image
+    video_path = Column(String, nullable=True) # Selected video
+    image_status = Column(String, nullable=True) # processing, completed, failed
+    video_status = Column(String, nullable=True)
+    image_error = Column(Text, nullable=True)
+    video_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+    project = relationship("Project", back_populates="shots")
+    image_takes = relationship("ImageTake", back_populates="shot", cascade="all, delete-orphan",
+                               order_by="ImageTake.created_at", lazy="selectin")
+    video_takes = relationship("VideoTake", back_populates="shot", cascade="all, delete-orphan",
+                               order_by="VideoTake.created_at", lazy="selectin")
+
+    __table_args__ = (
+        UniqueConstraint("project_id", "shot_number", name="uq_shots_project_shot"),
+    )
+
+
+class ImageTake(Base):
+    """Every image generated or uploaded for a shot"""
+    __tablename__ = "image_takes"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    shot_id = Column(String, ForeignKey("shots.id", ondelete="CASCADE"), nullable=False)
+    path = Column(String, nullable=False)
+    source = Column(String, default="generated") # generated, upload
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    shot = relationship("Shot", back_populates="image_takes")
+
+    __table_args__ = (
+        UniqueConstraint("shot_id", "path", name="uq_image_takes_shot_path"),
+    )
+
+
+class VideoTake(Base):
+    """Every video produced for a shot"""
+    __tablename__ = "video_takes"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    shot_id = Column(String, ForeignKey("shots.id", ondelete="CASCADE"), nullable=False)
+    path = Column(String, nullable=False)
+    video_task_id = Column(String, ForeignKey("video_tasks.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    shot = relationship("Shot", back_populates="video_takes")
+
+    __table_args__ = (
+        UniqueConstraint("shot_id", "path", name="uq_video_takes_shot_path"),
+    )
+
+
 class VideoTask(Base):
     __tablename__ = "video_tasks"
 
@@ -113,11 +279,29 @@ class VideoTask(Base):
     task_id = Column(String, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=True)
     shot_number = Column(Integer, nullable=False)
     volc_task_id = Column(String, nullable=False)
-    status = Column(String, default="submitted") # submitted, completed, failed
+    status = Column(String, default="submitted") # submitted, ingesting, completed, failed
     video_url = Column(String, nullable=True)
+    source_url = Column(String, nullable=True) # Provider result URL, downloaded during ingestion
     error_msg = Column(Text, nullable=True)
+    model_id = Column(String, nullable=True) # Video model the task was submitted to
+    duration = Column(Integer, nullable=True) # Requested clip length (seconds)
+    last_checked_at = Column(DateTime(timezone=True), nullable=True) # Last status poll by the scheduler
+    next_check_at = Column(DateTime(timezone=True), nullable=True) # Planned next status poll (NULL = due now)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    lease_owner = Column(String, nullable=True) # Scheduler replica currently polling / processing the task
+    lease_until = Column(DateTime(timezone=True), nullable=True)
+    callback_registered = Column(Boolean, default=False) # Submitted with a completion callback URL
+    params = Column(JSON, nullable=True) # Submission params, reused when the reaper resubmits
+    attempts = Column(Integer, default=1) # Submissions so far
+    submitted_at = Column(DateTime(timezone=True), nullable=True) # Latest resubmission (NULL = created_at)
+    unknown_count = Column(Integer, default=0) # Consecutive polls without a usable status
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
     project = relationship("Project")
+
+    __table_args__ = (
+        Index("ix_video_tasks_status_checked", "status", "last_checked_at"),
+        Index("ix_video_tasks_status_next_check", "status", "next_check_at"),
+    )
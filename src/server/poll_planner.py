@@ -0,0 +1,168 @@
+"""
+视频任务轮询计划
+根据各模型历史完成耗时 (按每秒视频时长归一化) 与镜头时长，计算任务的下次状态查询时间:
+任务尚早时一次跳到预计最早完成点，进入预计完成区间后按最小间隔密集查询，超期后逐步退避
+"""
+
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+
+from loguru import logger
+
+from src.utils.config_loader import config_loader
+from src.utils.video_callback import video_callback
+
+
+def _as_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """SQLite 返回无时区时间 (存储为 UTC)"""
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _quantile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    pos = q * (len(sorted_values) - 1)
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+class PollPlanner:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(PollPlanner, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._history: Dict[str, deque] = {}
+            cls._instance.reload_config()
+        return cls._instance
+
+    def reload_config(self):
+        """重新加载配置 (app.video_scheduler)"""
+        conf = config_loader.get("app.video_scheduler", {}) or {}
+        self.adaptive = bool(conf.get("adaptive", True))
+        self.min_interval = float(conf.get("min_interval", conf.get("poll_interval", 5)))
+        self.max_interval = float(conf.get("max_interval", 60))
+        self.history_size = int(conf.get("history_size", 200))
+        self.min_samples = int(conf.get("min_samples", 10))
+        # Prior before a model has history: ~20s of generation per second of video
+        self.default_seconds_per_clip_second = float(conf.get("default_seconds_per_clip_second", 20))
+        self.default_duration = int(conf.get("default_duration", 5))
+        with self._lock:
+            for model_id, samples in list(self._history.items()):
+                self._history[model_id] = deque(samples, maxlen=self.history_size)
+
+    def load_history(self, db):
+        """从已完成任务加载历史耗时 (调度线程启动时调用)"""
+        from sqlalchemy import func
+        from src.server.models import VideoTask
+
+        # Same baseline as observe(): the latest (re)submission, not the row's creation
+        submitted_at = func.coalesce(VideoTask.submitted_at, VideoTask.created_at).label("submitted_at")
+        rows = db.query(
+            VideoTask.model_id, VideoTask.duration, submitted_at, VideoTask.completed_at
+        ).filter(
+            VideoTask.status == "completed",
+            VideoTask.completed_at.isnot(None),
+            VideoTask.model_id.isnot(None)
+        ).order_by(VideoTask.completed_at.desc()).limit(self.history_size * 20).all()
+
+        loaded = 0
+        with self._lock:
+            self._history = {}
+            # Oldest first so the deque keeps the most recent samples
+            for row in reversed(rows):
+                elapsed = (_as_utc(row.completed_at) - _as_utc(row.submitted_at)).total_seconds()
+                if elapsed > 0:
+                    self._append(row.model_id, row.duration, elapsed)
+                    loaded += 1
+        logger.info(f"PollPlanner loaded {loaded} completion samples for {len(self._history)} models")
+
+    def _append(self, model_id: str, duration: Optional[int], elapsed: float):
+        samples = self._history.get(model_id)
+        if samples is None:
+            samples = self._history[model_id] = deque(maxlen=self.history_size)
+        samples.append(elapsed / max(1, duration or self.default_duration))
+
+    def observe(self, model_id: Optional[str], duration: Optional[int], elapsed: float):
+        """记录一次成功完成的任务耗时 (秒，自提交起算)"""
+        if not model_id or elapsed <= 0:
+            return
+        with self._lock:
+            self._append(model_id, duration, elapsed)
+
+    def expected_window(self, model_id: Optional[str], duration: Optional[int]) -> Dict[str, Any]:
+        """预计完成区间 (秒，自提交起算): early=P10, expected=P50, late=P90"""
+        clip = max(1, duration or self.default_duration)
+        with self._lock:
+            samples = sorted(self._history.get(model_id or "", ()))
+        if len(samples) >= self.min_samples:
+            return {
+                "early": _quantile(samples, 0.1) * clip,
+                "expected": _quantile(samples, 0.5) * clip,
+                "late": _quantile(samples, 0.9) * clip,
+                "samples": len(samples)
+            }
+        expected = self.default_seconds_per_clip_second * clip
+        return {"early": expected * 0.5, "expected": expected, "late": expected * 1.5, "samples": len(samples)}
+
+    def next_delay(self, model_id: Optional[str], duration: Optional[int], age: float) -> float:
+        """
+        距下次查询的秒数
+
+        Args:
+            age: 任务已运行秒数
+        """
+        if not self.adaptive:
+            return self.min_interval
+        window = self.expected_window(model_id, duration)
+        if age < window["early"]:
+            # Too young to be done: jump to the earliest plausible finish
+            delay = window["early"] - age
+        elif age <= window["late"]:
+            # Inside the completion window every check has a real chance of success
+            delay = self.min_interval
+        else:
+            # Overdue: back off proportionally to how late the task already is
+            delay = (age - window["late"]) * 0.25
+        return min(self.max_interval, max(self.min_interval, delay))
+
+    def next_check_at(self, model_id: Optional[str], duration: Optional[int],
+                      created_at: Optional[datetime], now: Optional[datetime] = None,
+                      callback: bool = False) -> datetime:
+        """
+        Args:
+            callback: 任务提交时登记了完成回调，轮询只作为慢速对账
+        """
+        now = now or datetime.now(timezone.utc)
+        if callback and video_callback.enabled:
+            return now + timedelta(seconds=video_callback.reconcile_interval)
+        age = (now - _as_utc(created_at)).total_seconds() if created_at else 0.0
+        return now + timedelta(seconds=self.next_delay(model_id, duration, max(0.0, age)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = list(self._history.keys())
+        result = {}
+        for model_id in models:
+            window = self.expected_window(model_id, self.default_duration)
+            result[model_id] = {
+                "samples": window["samples"],
+                f"p10_{self.default_duration}s": round(window["early"], 1),
+                f"p50_{self.default_duration}s": round(window["expected"], 1),
+                f"p90_{self.default_duration}s": round(window["late"], 1)
+            }
+        return {
+            "adaptive": self.adaptive,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "models": result
+        }
+
+
+poll_planner = PollPlanner()
@@ -1,8 +1,100 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from .models import Project
+import base64
+import copy
+import json
+import random
+import time
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import desc, func, cast, literal, select, exists, update, inspect, or_, and_, String, Text, Numeric, JSON
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from src.utils.config_loader import config_loader
+from .database import insert_ignore
+from .models import Project, UsageEvent, generate_uuid
+from .shot_service import ShotService
 from datetime import datetime
 
+# JSON columns that may be patched in place
+JSON_COLUMNS = {"topic_meta": "{}", "steps": "[]", "total_tokens": "{}", "usage_stats": "{}"}
+
+# topic_meta keys mirrored into indexed Project columns for list filtering
+META_COLUMNS = ("platform", "resolution", "aspect_ratio")
+
+# Legacy list columns mirrored into shot rows
+SHOT_LIST_COLUMNS = ("image_prompts", "video_prompts", "image_paths", "video_paths")
+
+# Columns the storyboard / prompt editors overwrite; Project.edit_version moves only when one of them changes
+EDITED_COLUMNS = ("storyboard", "image_prompts", "video_prompts")
+
+# UsageEvent field -> Project rollup column
+USAGE_ROLLUP = {
+    "prompt_tokens": "usage_prompt_tokens",
+    "completion_tokens": "usage_completion_tokens",
+    "images": "usage_images",
+    "videos": "usage_videos",
+    "video_seconds": "usage_video_seconds",
+}
+USAGE_COLUMNS = tuple(USAGE_ROLLUP.values())
+
+# Columns loaded for list / dashboard views; the large JSON columns (script, storyboard, prompts ...) stay unloaded
+SUMMARY_COLUMNS = (
+    "id", "name", "input_type", "status", "current_step", "final_video", "created_at", "updated_at"
+) + META_COLUMNS + USAGE_COLUMNS
+
+
+class ProjectConflictError(Exception):
+    """The project changed since the caller read it (edit_version mismatch, or the row kept moving)"""
+
+    def __init__(self, project_id, expected=None, actual=None):
+        self.project_id = project_id
+        self.expected = expected
+        self.actual = actual
+        if expected is None:
+            super().__init__(f"Project {project_id} kept changing concurrently; update not applied")
+        else:
+            super().__init__(f"Project {project_id} is at version {actual}, not {expected}")
+
+
+def _meta_columns(meta):
+    return {key: meta.get(key) for key in META_COLUMNS if key in (meta or {})}
+
+
+def encode_cursor(project):
+    raw = json.dumps([project.created_at.isoformat(), project.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Raises ValueError on a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, project_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(project_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def _segments(path):
+    """"a.b" -> ["a", "b"]; a tuple/list is taken as is (ints index into arrays)"""
+    if isinstance(path, (list, tuple)):
+        return list(path)
+    return str(path).split(".")
+
+
+def _sqlite_path(segments):
+    return "$" + "".join(f"[{s}]" if isinstance(s, int) else f'."{s}"' for s in segments)
+
+
+def _pg_path(segments):
+    return literal([str(s) for s in segments], ARRAY(Text))
+
+
+def _json_text(value):
+    return literal(json.dumps(value, ensure_ascii=False), String)
+
+
+def _container(value, key):
+    return value.setdefault(key, {}) if isinstance(value, dict) else value[key]
+
 class ProjectService:
     def __init__(self, db: Session):
         self.db = db
@@ -27,6 +119,7 @@ class ProjectService:
             current_step=0 if input_type == "topic" else 1,
             steps=steps,
             topic_meta=meta or {},
+            **_meta_columns(meta),
             total_tokens={
                 "prompt_tokens": 0,
                 "completion_tokens": 0,
@@ -42,103 +135,452 @@ class ProjectService:
         return self.db.query(Project).filter(Project.id == project_id).first()
 
     def get_all_projects(self, filters=None):
+        return self.list_projects(filters)[0]
+
+    def list_projects(self, filters=None, limit=None, cursor=None, summary=False):
+        """
+        Projects newest first, filtered in SQL.
+
+        Args:
+            limit: page size (None = all)
+            cursor: opaque cursor from a previous page; keyset on (created_at, id)
+            summary: load only SUMMARY_COLUMNS; touching any other attribute raises instead of lazy loading
+
+        Returns:
+            (projects, next_cursor) - next_cursor is None on the last page
+        """
+        filters = filters or {}
         query = self.db.query(Project)
-        
-        if filters:
-            if filters.get("name"):
-                query = query.filter(Project.name.ilike(f"%{filters['name']}%"))
-            if filters.get("status"):
-                query = query.filter(Project.status == filters["status"])
-            if filters.get("input_type"):
-                query = query.filter(Project.input_type == filters["input_type"])
-                
-        # Fetch all results first, then filter by JSON fields in memory if needed
-        # (SQLite JSON support varies, python filtering is safer for this scale)
-        results = query.order_by(desc(Project.created_at)).all()
-        
-        if not filters:
-            return results
-            
-        final_results = []
-        for p in results:
-            meta = p.topic_meta or {}
-            
-            if filters.get("platform"):
-                if meta.get("platform") != filters["platform"]:
-                    continue
-                    
-            if filters.get("resolution"):
-                if meta.get("resolution") != filters["resolution"]:
-                    continue
-                    
-            if filters.get("aspect_ratio"):
-                if meta.get("aspect_ratio") != filters["aspect_ratio"]:
+        if summary:
+            query = query.options(load_only(*(getattr(Project, c) for c in SUMMARY_COLUMNS), raiseload=True))
+        if filters.get("name"):
+            query = query.filter(Project.name.ilike(f"%{filters['name']}%"))
+        for key in ("status", "input_type") + META_COLUMNS:
+            if filters.get(key):
+                query = query.filter(getattr(Project, key) == filters[key])
+
+        if cursor:
+            created_at, project_id = decode_cursor(cursor)
+            if self._dialect() == "sqlite":
+                # Compare in the stored text format: CURRENT_TIMESTAMP has no fractional seconds
+                fmt = "%Y-%m-%d %H:%M:%S.%f" if created_at.microsecond else "%Y-%m-%d %H:%M:%S"
+                created_at = literal(created_at.strftime(fmt), String)
+            query = query.filter(or_(
+                Project.created_at < created_at,
+                and_(Project.created_at == created_at, Project.id < project_id)
+            ))
+        query = query.order_by(desc(Project.created_at), desc(Project.id))
+
+        if not limit:
+            return query.all(), None
+        # One extra row tells whether another page exists
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor(rows[-1])
+        return rows, None
+
+    def list_project_summaries(self, filters=None, limit=None, cursor=None):
+        """
+        Like list_projects, but returns summary dicts with per-project aggregates
+        (shot / image / video counts from the shots table, token and usage totals).
+
+        Returns:
+            (summaries, next_cursor)
+        """
+        projects, next_cursor = self.list_projects(filters, limit=limit, cursor=cursor, summary=True)
+        counts = ShotService(self.db).counts([p.id for p in projects])
+        return [self._summary(p, counts.get(p.id)) for p in projects], next_cursor
+
+    @staticmethod
+    def _summary(project, counts=None):
+        counts = counts or {}
+        tokens = project.token_totals()
+        usage = project.usage_totals()
+        return {
+            "project_id": project.id,
+            "project_name": project.name,
+            "input_type": project.input_type,
+            "status": project.status,
+            "current_step": project.current_step,
+            "platform": project.platform,
+            "resolution": project.resolution,
+            "aspect_ratio": project.aspect_ratio,
+            "has_final_video": bool(project.final_video),
+            "shot_count": counts.get("shot_count", 0),
+            "completed_images": counts.get("completed_images", 0),
+            "completed_videos": counts.get("completed_videos", 0),
+            "total_tokens": tokens.get("total_tokens", 0),
+            "prompt_tokens": tokens.get("prompt_tokens", 0),
+            "completion_tokens": tokens.get("completion_tokens", 0),
+            "total_video_duration": usage.get("total_video_duration", 0),
+            "created_at": project.created_at.isoformat() if project.created_at else None,
+            "updated_at": project.updated_at.isoformat() if project.updated_at else None
+        }
+
+    def update_project(self, project_id, updates, expected_version=None):
+        """
+        Set the given fields. The write is conditional on the row version; if another writer
+        commits in between, the fields are re-applied on the fresh row.
+
+        Args:
+            expected_version: edit_version the caller's edit was based on; raises ProjectConflictError
+                instead of overwriting if the edited content has changed since. Status, step and
+                usage updates from running stages do not count as changes.
+        """
+        def apply(project):
+            if expected_version is not None and project.edit_version != expected_version:
+                raise ProjectConflictError(project_id, expected_version, project.edit_version)
+            for key, value in updates.items():
+                if key in ("version", "edit_version"):
                     continue
-                    
-            final_results.append(p)
-            
-        return final_results
+                if hasattr(project, key):
+                    setattr(project, key, value)
+                elif key == "project_name": # map project_name to name
+                     project.name = value
+            if "topic_meta" in updates:
+                for key in META_COLUMNS:
+                    setattr(project, key, (updates["topic_meta"] or {}).get(key))
 
-    def update_project(self, project_id, updates):
-        project = self.get_project(project_id)
+        project = self.modify_project(project_id, apply)
         if not project:
             return None
-        
-        for key, value in updates.items():
-            if hasattr(project, key):
-                setattr(project, key, value)
-            elif key == "project_name": # map project_name to name
-                 project.name = value
-        
-        # Manually force update of updated_at if not handled by SQLAlchmey automatically in some contexts, 
-        # but onupdate=func.now() should handle it.
-        # However, for JSON fields, SQLAlchemy tracks mutations if using MutableDict, otherwise we might need to flag modified.
-        # Since we are re-assigning the whole dict/list usually, it should be detected.
-        
-        self.db.commit()
+
+        # Keep shot rows consistent with whole-list writes so Project.to_dict never mixes old and new selections
+        shot_lists = {k: updates[k] for k in SHOT_LIST_COLUMNS if k in updates}
+        if shot_lists:
+            ShotService(self.db).sync_from_lists(project_id, **shot_lists)
+
         self.db.refresh(project)
         return project
 
-    def update_step(self, project_id, step_index, step_updates):
-        project = self.get_project(project_id)
-        if not project or not project.steps:
+    def modify_project(self, project_id, mutate, attempts=None):
+        """
+        Optimistic read-modify-write on one project.
+
+        mutate(project) edits a freshly loaded row (assign new values; in-place changes to
+        JSON columns are not tracked) and may return False to skip the write. The commit is
+        an UPDATE ... WHERE version = :v; when another writer got there first the row is
+        reloaded and mutate runs again, with a short jittered backoff. Changing one of the
+        EDITED_COLUMNS also bumps edit_version.
+
+        Returns:
+            the project, or None if it does not exist
+
+        Raises:
+            ProjectConflictError: every attempt conflicted (or mutate raised it)
+        """
+        attempts = attempts or int(config_loader.get("app.optimistic_lock.attempts", 8))
+        base_delay = float(config_loader.get("app.optimistic_lock.base_delay", 0.05))
+        for attempt in range(attempts):
+            # populate_existing: never build on a stale copy from the identity map
+            project = self.db.query(Project).populate_existing().filter(Project.id == project_id).first()
+            if not project:
+                return None
+            try:
+                if mutate(project) is False:
+                    self.db.rollback()
+                    return project
+                state = inspect(project)
+                if any(state.attrs[column].history.has_changes() for column in EDITED_COLUMNS):
+                    project.edit_version = (project.edit_version or 1) + 1
+                self.db.commit()
+                return project
+            except StaleDataError:
+                self.db.rollback()
+                time.sleep(random.uniform(0, base_delay * (2 ** attempt)))
+            except BaseException:
+                self.db.rollback()
+                raise
+        raise ProjectConflictError(project_id)
+
+    def modify_list(self, project_id, column, edit):
+        """
+        Optimistic edit of a JSON list column: edit(items) changes a deep copy of the current
+        list in place (return False to leave it unchanged) and is re-run if another writer
+        commits first.
+
+        Returns:
+            the written list, or None if the project does not exist or edit returned False
+        """
+        edited = {}
+
+        def mutate(project):
+            edited.clear()
+            items = copy.deepcopy(getattr(project, column) or [])
+            if edit(items) is False:
+                return False
+            setattr(project, column, items)
+            edited["items"] = items
+
+        if not self.modify_project(project_id, mutate) or "items" not in edited:
             return None
-        
-        # Deep copy steps to modify
-        steps = list(project.steps)
-        if 0 <= step_index < len(steps):
-            steps[step_index].update(step_updates)
-            project.steps = steps # Re-assign to trigger update
-            self.db.commit()
-            return True
-        return False
+        if column in SHOT_LIST_COLUMNS:
+            ShotService(self.db).sync_from_lists(project_id, **{column: edited["items"]})
+        return edited["items"]
 
-    def add_tokens(self, project_id, prompt_tokens, completion_tokens):
-        project = self.get_project(project_id)
-        if not project:
-            return
-            
-        tokens = dict(project.total_tokens or {})
-        tokens["prompt_tokens"] = tokens.get("prompt_tokens", 0) + prompt_tokens
-        tokens["completion_tokens"] = tokens.get("completion_tokens", 0) + completion_tokens
-        tokens["total_tokens"] = tokens["prompt_tokens"] + tokens["completion_tokens"]
-        
-        project.total_tokens = tokens
-        self.db.commit()
+    def update_step(self, project_id, step_index, step_updates):
+        if step_index < 0:
+            return False
+        return self.patch_json(project_id, "steps", {(step_index, k): v for k, v in step_updates.items()})
+
+    def add_tokens(self, project_id, prompt_tokens, completion_tokens, stage=None, model=None, request_id=None):
+        return self.record_usage(
+            project_id, stage=stage, model=model, request_id=request_id,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
 
-    def add_usage(self, project_id, images=0, videos=0, duration=0.0):
+    def add_usage(self, project_id, images=0, videos=0, duration=0.0, stage=None, model=None, request_id=None):
         """Accumulate usage statistics"""
-        project = self.get_project(project_id)
+        return self.record_usage(
+            project_id, stage=stage, model=model, request_id=request_id,
+            images=images, videos=videos, video_seconds=duration
+        )
+
+    def record_usage(self, project_id, stage=None, model=None, request_id=None, **amounts):
+        """
+        Append a UsageEvent and add its amounts to the project's usage_* columns
+        (UPDATE ... SET x = x + :d) in the same transaction.
+
+        Args:
+            model: defaults to the configured llm / video / image model for the kind of usage
+            request_id: idempotency key; an event already recorded for the project is not counted again
+            amounts: prompt_tokens, completion_tokens, images, videos, video_seconds
+
+        Returns:
+            False if nothing was recorded (no amounts, duplicate request_id or unknown project)
+        """
+        unknown = set(amounts) - USAGE_ROLLUP.keys()
+        if unknown:
+            raise ValueError(f"Unknown usage fields: {sorted(unknown)}")
+        amounts = {k: v for k, v in amounts.items() if v}
+        if not amounts:
+            return False
+        if model is None:
+            model = self._default_model(amounts)
+
+        event = {"id": generate_uuid(), "project_id": project_id, "stage": stage, "model": model,
+                 "request_id": request_id, **amounts}
+        if request_id is not None:
+            if not insert_ignore(self.db, UsageEvent, [event], ["project_id", "request_id"]):
+                self.db.rollback()
+                return False
+        else:
+            self.db.add(UsageEvent(**event))
+            self.db.flush()
+        rollup = {}
+        for key, delta in amounts.items():
+            column = getattr(Project, USAGE_ROLLUP[key])
+            rollup[column.key] = func.coalesce(column, 0) + delta
+        updated = self.db.execute(update(Project).where(Project.id == project_id).values(rollup)).rowcount
+        if not updated:
+            self.db.rollback()
+            return False
+        self.db.commit()
+        return True
+
+    def _default_model(self, amounts):
+        if amounts.keys() & {"prompt_tokens", "completion_tokens"}:
+            kind = "llm"
+        elif amounts.keys() & {"videos", "video_seconds"}:
+            kind = "video"
+        else:
+            kind = "image"
+        platform = config_loader.get("platform", "volcengine")
+        return config_loader.get(f"platforms.{platform}.models.{kind}.model_id") or None
+
+    def usage_breakdown(self, project_id):
+        """Ledger totals per (stage, model) for one project"""
+        rows = self.db.query(
+            UsageEvent.stage,
+            UsageEvent.model,
+            func.count(UsageEvent.id),
+            *(func.coalesce(func.sum(getattr(UsageEvent, key)), 0) for key in USAGE_ROLLUP)
+        ).filter(UsageEvent.project_id == project_id).group_by(UsageEvent.stage, UsageEvent.model).all()
+        breakdown = []
+        for stage, model, events, *sums in rows:
+            item = {"stage": stage, "model": model, "events": events, **dict(zip(USAGE_ROLLUP, sums))}
+            item["total_tokens"] = item["prompt_tokens"] + item["completion_tokens"]
+            breakdown.append(item)
+        return breakdown
+
+    # Atomic JSON updates: computed by the database in one UPDATE, so concurrent
+    # writers never overwrite each other's keys (json_set on SQLite, jsonb_set on Postgres)
+
+    def patch_meta(self, project_id, patch):
+        """Set topic_meta keys in place: {"aspect_ratio": "9:16", "a.b": 1} (dotted paths create missing objects)"""
+        columns = {key: value for key, value in patch.items() if key in META_COLUMNS}
+        return self.patch_json(project_id, "topic_meta", patch, columns=columns)
+
+    def append_meta(self, project_id, path, value, unique=False):
+        """Append to an array inside topic_meta (created if missing); unique skips values already present"""
+        return self.append_json(project_id, "topic_meta", path, value, unique=unique)
+
+    def _dialect(self):
+        return self.db.get_bind().dialect.name
+
+    def _json_column(self, column):
+        if column not in JSON_COLUMNS:
+            raise ValueError(f"Not a patchable JSON column: {column}")
+        return getattr(Project, column)
+
+    def _sqlite_base(self, col, column):
+        # A None assigned through the ORM is stored as the JSON text 'null'
+        return func.coalesce(func.nullif(col, literal("null", String)), literal(JSON_COLUMNS[column], String))
+
+    def _pg_base(self, col, column):
+        null = cast(literal("null", String), JSONB)
+        return func.coalesce(func.nullif(cast(col, JSONB), null), cast(literal(JSON_COLUMNS[column], String), JSONB))
+
+    def _pg_ensure_parents(self, expr, segments):
+        """jsonb_set only creates the last key of a path: create missing parent objects first"""
+        for depth in range(1, len(segments)):
+            prefix = _pg_path(segments[:depth])
+            expr = func.jsonb_set(expr, prefix, func.coalesce(
+                expr.op("#>")(prefix), cast(literal("{}", String), JSONB)
+            ), True)
+        return expr
+
+    def _apply(self, project_id, values, *conditions):
+        # JSON rewrites bump the row version so modify_project callers holding the old content retry;
+        # edit_version is untouched, so editors saving storyboard / prompts don't conflict with pipeline progress
+        updated = self.db.execute(
+            update(Project).where(Project.id == project_id, *conditions).values({**values, "version": Project.version + 1})
+        ).rowcount
+        self.db.commit()
+        return bool(updated)
+
+    def _locked_update(self, project_id, column, mutate, columns=None):
+        """Other databases: row lock + read / modify / write"""
+        project = self.db.query(Project).populate_existing().filter(Project.id == project_id).with_for_update().first()
         if not project:
-            return
-            
-        stats = dict(project.usage_stats or {})
-        stats["total_images"] = stats.get("total_images", 0) + images
-        stats["total_videos"] = stats.get("total_videos", 0) + videos
-        stats["total_video_duration"] = stats.get("total_video_duration", 0.0) + float(duration)
-        
-        project.usage_stats = stats
+            self.db.rollback()
+            return False
+        value = copy.deepcopy(getattr(project, column)) or json.loads(JSON_COLUMNS[column])
+        if mutate(value) is False:
+            self.db.rollback()
+            return False
+        setattr(project, column, value)
+        for key, extra in (columns or {}).items():
+            setattr(project, key, extra)
         self.db.commit()
+        return True
+
+    def patch_json(self, project_id, column, patch, columns=None):
+        """
+        Set values at paths of a JSON column in one atomic UPDATE. Returns False if nothing was written.
+
+        Args:
+            columns: plain column values written in the same UPDATE
+        """
+        col = self._json_column(column)
+        items = [(_segments(path), value) for path, value in patch.items()]
+        if not items:
+            return False
+        dialect = self._dialect()
+        if dialect == "sqlite":
+            args = []
+            for segments, value in items:
+                args += [_sqlite_path(segments), func.json(_json_text(value))]
+            conditions = []
+            for segments, _ in items:
+                # Paths into arrays only update existing elements
+                if isinstance(segments[0], int):
+                    conditions.append(func.json_array_length(col) > segments[0])
+            expr = func.json_set(self._sqlite_base(col, column), *args)
+            return self._apply(project_id, {column: expr, **(columns or {})}, *conditions)
+        if dialect == "postgresql":
+            expr = self._pg_base(col, column)
+            conditions = []
+            for segments, value in items:
+                if isinstance(segments[0], int):
+                    conditions.append(func.jsonb_array_length(cast(col, JSONB)) > segments[0])
+                expr = self._pg_ensure_parents(expr, segments)
+                expr = func.jsonb_set(expr, _pg_path(segments), cast(_json_text(value), JSONB), True)
+            return self._apply(project_id, {column: cast(expr, JSON), **(columns or {})}, *conditions)
+
+        def mutate(data):
+            for segments, value in items:
+                target = data
+                try:
+                    for key in segments[:-1]:
+                        target = _container(target, key)
+                    target[segments[-1]] = value
+                except (IndexError, KeyError, TypeError):
+                    return False
+        return self._locked_update(project_id, column, mutate, columns=columns)
+
+    def append_json(self, project_id, column, path, value, unique=False):
+        """Append a value to the array at path (created if missing). Returns False if nothing was written."""
+        col = self._json_column(column)
+        segments = _segments(path)
+        dialect = self._dialect()
+        if dialect == "sqlite":
+            json_path = _sqlite_path(segments)
+            base = self._sqlite_base(col, column)
+            ensured = func.json_set(base, json_path, func.json(
+                func.coalesce(func.json_extract(col, json_path), literal("[]", String))
+            ))
+            expr = func.json_insert(ensured, json_path + "[#]", func.json(_json_text(value)))
+            conditions = []
+            if unique:
+                items = func.json_each(col, json_path).table_valued("value")
+                conditions.append(~exists(
+                    select(literal(1)).select_from(items).where(
+                        items.c.value == func.json_extract(func.json(_json_text(value)), "$")
+                    )
+                ))
+            return self._apply(project_id, {column: expr}, *conditions)
+        if dialect == "postgresql":
+            pg_path = _pg_path(segments)
+            new_item = func.jsonb_build_array(cast(_json_text(value), JSONB))
+            current = func.coalesce(cast(col, JSONB).op("#>")(pg_path), cast(literal("[]", String), JSONB))
+            expr = self._pg_ensure_parents(self._pg_base(col, column), segments)
+            expr = func.jsonb_set(expr, pg_path, current.op("||")(new_item), True)
+            conditions = [~current.op("@>")(new_item)] if unique else []
+            return self._apply(project_id, {column: cast(expr, JSON)}, *conditions)
+
+        def mutate(data):
+            target = data
+            for key in segments[:-1]:
+                target = _container(target, key)
+            items = target.setdefault(segments[-1], []) if isinstance(target, dict) else target[segments[-1]]
+            if unique and value in items:
+                return False
+            items.append(value)
+        return self._locked_update(project_id, column, mutate)
+
+    def increment_json(self, project_id, column, deltas):
+        """Add deltas to numeric keys of a JSON object column (missing keys count as 0)"""
+        col = self._json_column(column)
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return False
+        dialect = self._dialect()
+        if dialect == "sqlite":
+            args = []
+            for key, delta in deltas.items():
+                json_path = _sqlite_path(_segments(key))
+                args += [json_path, func.coalesce(func.json_extract(col, json_path), 0) + delta]
+            expr = func.json_set(self._sqlite_base(col, column), *args)
+            return self._apply(project_id, {column: expr})
+        if dialect == "postgresql":
+            expr = self._pg_base(col, column)
+            for key, delta in deltas.items():
+                segments = _segments(key)
+                current = cast(cast(col, JSONB).op("#>>")(_pg_path(segments)), Numeric)
+                expr = self._pg_ensure_parents(expr, segments)
+                expr = func.jsonb_set(expr, _pg_path(segments), func.to_jsonb(func.coalesce(current, 0) + delta), True)
+            return self._apply(project_id, {column: cast(expr, JSON)})
+
+        def mutate(data):
+            for key, delta in deltas.items():
+                segments = _segments(key)
+                target = data
+                for k in segments[:-1]:
+                    target = _container(target, k)
+                target[segments[-1]] = (target.get(segments[-1]) or 0) + delta
+        return self._locked_update(project_id, column, mutate)
 
     def delete_project(self, project_id):
         project = self.get_project(project_id)
@@ -1,5 +1,8 @@
 from sqlalchemy.orm import Session
-from .models import Task, Log, Project
+from sqlalchemy import func
+from .models import Task, Log, Project, VideoTask
+from .shot_service import ShotService
+from .log_service import LogService
 import datetime
 import json
 from src.utils.redis_client import redis_client
@@ -53,6 +56,32 @@ class TaskService:
             return task
         return None
 
+    def add_children(self, task_id, count=1):
+        """Register child VideoTasks on a parent task (atomic increment)."""
+        self.db.query(Task).filter(Task.id == task_id).update(
+            {
+                Task.total_count: func.coalesce(Task.total_count, 0) + count,
+                Task.completed_count: func.coalesce(Task.completed_count, 0),
+                Task.failed_count: func.coalesce(Task.failed_count, 0)
+            },
+            synchronize_session=False
+        )
+        self.db.commit()
+
+    def record_child_result(self, task_id, succeeded):
+        """
+        Count one finished child with an atomic increment and return (total, completed, failed).
+        Returns None for tasks created before the counters existed.
+        """
+        column = Task.completed_count if succeeded else Task.failed_count
+        self.db.query(Task).filter(Task.id == task_id, Task.total_count.isnot(None)).update(
+            {column: func.coalesce(column, 0) + 1}, synchronize_session=False
+        )
+        self.db.commit()
+        return self.db.query(Task.total_count, Task.completed_count, Task.failed_count).filter(
+            Task.id == task_id, Task.total_count.isnot(None)
+        ).first()
+
     def get_task(self, task_id):
         # Cache-Aside: Try Redis first
         cached = redis_client.hgetall(self._cache_key(task_id))
@@ -106,3 +135,89 @@ class TaskService:
         }
         redis_client.hset(self._cache_key(task.id), mapping=data)
         redis_client.expire(self._cache_key(task.id), 3600) # 1 hour TTL
+
+
+class VideoTaskService:
+    """VideoTask status transitions and write-back of shot results to the project."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def transition(self, task: VideoTask, from_status: str, to_status: str, **fields) -> bool:
+        """
+        Conditional status change: only applies while the row is still in from_status,
+        so a result is written once even when several workers race on the same task.
+        Returns False if another worker already moved the task on.
+        """
+        values = {"status": to_status, **fields}
+        if to_status in ("completed", "failed"):
+            values.setdefault("completed_at", datetime.datetime.now(datetime.timezone.utc))
+            values.setdefault("lease_owner", None)
+            values.setdefault("lease_until", None)
+        updated = self.db.query(VideoTask).filter(
+            VideoTask.id == task.id, VideoTask.status == from_status
+        ).update(values, synchronize_session=False)
+        self.db.commit()
+        if updated:
+            self.db.refresh(task)
+        return bool(updated)
+
+    def record_shot_result(self, task: VideoTask, error=None, message=None):
+        """Write a finished task back to its shot row (selected video / status) and refresh the parent task."""
+        ss = ShotService(self.db)
+        ls = LogService(self.db)
+        if task.status == "completed":
+            # Shot number is 1-based
+            if task.shot_number > 0:
+                ss.add_video_take(task.project_id, task.shot_number, task.video_url, video_task_id=task.id)
+            ss.set_status(task.project_id, task.shot_number, "video", "completed")
+        else:
+            ss.set_status(task.project_id, task.shot_number, "video", "failed", error=error or "")
+
+        if message:
+            level = "INFO" if task.status == "completed" else "ERROR"
+            ls.log(task.project_id, None, level, message, module="video_scheduler")
+
+        if task.task_id:
+            self.update_parent_task(task.task_id, task.status == "completed")
+
+    def update_parent_task(self, parent_task_id, succeeded):
+        """Count the finished child on its parent task and derive progress / terminal status in O(1)."""
+        ts = TaskService(self.db)
+        counts = ts.record_child_result(parent_task_id, succeeded)
+        if counts is None:
+            counts = self._recount_parent(parent_task_id)
+            if counts is None:
+                return
+        total, completed, failed = counts
+        
+        # Calculate progress
+        progress = int((completed + failed) / total * 100) if total > 0 else 0
+
+        if completed + failed == total:
+            # All done
+            if failed == total:
+                 ts.update_task(parent_task_id, status="failed", error="All video tasks failed")
+            else:
+                 # Partial success is considered success for the batch task, 
+                 # as users can see individual failures.
+                 ts.update_task(parent_task_id, status="completed", progress=100, result={"completed": completed, "failed": failed})
+        else:
+            # Still running
+            ts.update_task(parent_task_id, status="running", progress=progress)
+
+    def _recount_parent(self, parent_task_id):
+        """Legacy parent tasks without counters: count siblings once and store the counters."""
+        rows = self.db.query(VideoTask.status, func.count()).filter(
+            VideoTask.task_id == parent_task_id
+        ).group_by(VideoTask.status).all()
+        if not rows:
+            return None
+        by_status = dict(rows)
+        counts = (sum(by_status.values()), by_status.get("completed", 0), by_status.get("failed", 0))
+        self.db.query(Task).filter(Task.id == parent_task_id).update(
+            {Task.total_count: counts[0], Task.completed_count: counts[1], Task.failed_count: counts[2]},
+            synchronize_session=False
+        )
+        self.db.commit()
+        return counts
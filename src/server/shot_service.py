@@ -0,0 +1,179 @@
+from sqlalchemy import update, func, case
+from sqlalchemy.orm import Session
+from .database import insert_ignore
+from .models import Shot, ImageTake, VideoTake, generate_uuid
+
+KINDS = ("image", "video")
+
+
+class ShotService:
+    """Per-shot state. Every write touches only the shot's own row (plus a take row), never the project row."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _insert_ignore(self, model, rows, conflict):
+        return insert_ignore(self.db, model, rows, conflict)
+
+    def _shot_ids(self, project_id, shot_numbers):
+        """shot_number -> Shot.id, creating missing rows."""
+        shot_numbers = set(shot_numbers)
+        rows = self.db.query(Shot.shot_number, Shot.id).filter(
+            Shot.project_id == project_id, Shot.shot_number.in_(shot_numbers)
+        ).all()
+        ids = dict(rows)
+        missing = shot_numbers - ids.keys()
+        if missing:
+            self._insert_ignore(
+                Shot,
+                [{"id": generate_uuid(), "project_id": project_id, "shot_number": n} for n in sorted(missing)],
+                ["project_id", "shot_number"]
+            )
+            ids.update(self.db.query(Shot.shot_number, Shot.id).filter(
+                Shot.project_id == project_id, Shot.shot_number.in_(missing)
+            ).all())
+        return ids
+
+    def _shot_id(self, project_id, shot_number):
+        return self._shot_ids(project_id, [int(shot_number)])[int(shot_number)]
+
+    def get_shots(self, project_id):
+        return self.db.query(Shot).filter(Shot.project_id == project_id).order_by(Shot.shot_number).all()
+
+    def counts(self, project_ids):
+        """project_id -> shot_count / completed_images / completed_videos, one grouped query for a page of projects"""
+        if not project_ids:
+            return {}
+        completed = lambda column: func.sum(case((column.isnot(None), 1), else_=0))
+        result = {}
+        project_ids = list(project_ids)
+        # Chunked so an unpaginated list stays under the bound-parameter limit
+        for start in range(0, len(project_ids), 500):
+            rows = self.db.query(
+                Shot.project_id,
+                func.count(Shot.id),
+                completed(Shot.image_path),
+                completed(Shot.video_path)
+            ).filter(Shot.project_id.in_(project_ids[start:start + 500])).group_by(Shot.project_id).all()
+            for project_id, shots, images, videos in rows:
+                result[project_id] = {"shot_count": shots, "completed_images": images or 0, "completed_videos": videos or 0}
+        return result
+
+    def set_status(self, project_id, shot_number, kind, status, error=None):
+        """Set the image/video status of one shot; a completed status clears the previous error."""
+        values = {f"{kind}_status": status}
+        if error is not None:
+            values[f"{kind}_error"] = str(error)
+        elif status == "completed":
+            values[f"{kind}_error"] = None
+        shot_id = self._shot_id(project_id, shot_number)
+        self.db.execute(update(Shot).where(Shot.id == shot_id).values(**values))
+        self.db.commit()
+
+    def add_image_take(self, project_id, shot_number, path, source="generated", select=False):
+        """Record an image for the shot (idempotent per path); optionally make it the selected image."""
+        shot_id = self._shot_id(project_id, shot_number)
+        self._insert_ignore(
+            ImageTake, [{"id": generate_uuid(), "shot_id": shot_id, "path": path, "source": source}], ["shot_id", "path"]
+        )
+        if select:
+            self.db.execute(update(Shot).where(Shot.id == shot_id).values(image_path=path))
+        self.db.commit()
+
+    def add_video_take(self, project_id, shot_number, path, video_task_id=None, select=True):
+        """Record a video for the shot (idempotent per path); by default it becomes the selected video."""
+        shot_id = self._shot_id(project_id, shot_number)
+        self._insert_ignore(
+            VideoTake,
+            [{"id": generate_uuid(), "shot_id": shot_id, "path": path, "video_task_id": video_task_id}],
+            ["shot_id", "path"]
+        )
+        if select:
+            self.db.execute(update(Shot).where(Shot.id == shot_id).values(video_path=path))
+        self.db.commit()
+
+    def selected_paths(self, project_id, kind, base=None):
+        """Legacy positional path list (index = shot_number - 1) with each shot's selection applied."""
+        paths = list(base or [])
+        column = getattr(Shot, f"{kind}_path")
+        for shot_number, path in self.db.query(Shot.shot_number, column).filter(
+            Shot.project_id == project_id, column.isnot(None)
+        ):
+            if shot_number > 0:
+                while len(paths) < shot_number:
+                    paths.append(None)
+                paths[shot_number - 1] = path
+        return paths
+
+    def sync_from_lists(self, project_id, image_prompts=None, video_prompts=None, image_paths=None, video_paths=None):
+        """
+        Mirror whole-list writes of the legacy Project columns into the shot rows,
+        updating only shots whose value actually changed.
+        """
+        changes = {}
+
+        def collect(items, column, key_of):
+            if items is None:
+                return
+            for i, item in enumerate(items):
+                shot_number = key_of(i, item)
+                if shot_number is not None:
+                    changes.setdefault(int(shot_number), {})[column] = item
+
+        prompt_key = lambda i, p: p.get("shot_number", i + 1) if isinstance(p, dict) else None
+        path_key = lambda i, p: i + 1
+        collect(image_prompts, "image_prompt", prompt_key)
+        collect(video_prompts, "video_prompt", prompt_key)
+        collect(image_paths, "image_path", path_key)
+        collect(video_paths, "video_path", path_key)
+        if not changes:
+            return 0
+
+        ids = self._shot_ids(project_id, changes.keys())
+        current = {
+            shot.shot_number: shot for shot in self.db.query(Shot).filter(
+                Shot.project_id == project_id, Shot.shot_number.in_(changes.keys())
+            )
+        }
+        rows = []
+        for shot_number, values in changes.items():
+            shot = current.get(shot_number)
+            diff = {k: v for k, v in values.items() if shot is None or getattr(shot, k) != v}
+            if diff:
+                rows.append({"id": ids[shot_number], **diff})
+        for row in rows:
+            self.db.execute(update(Shot).where(Shot.id == row.pop("id")).values(**row))
+        self.db.commit()
+        return len(rows)
+
+    def import_legacy(self, project):
+        """Build shot rows from a project's legacy topic_meta keys and path lists. Returns the number of shots touched."""
+        meta = project.topic_meta or {}
+        touched = self.sync_from_lists(
+            project.id, project.image_prompts, project.video_prompts, project.image_paths, project.video_paths
+        )
+        numbers = set()
+        for key in meta:
+            for kind in KINDS:
+                for prefix in (f"shot_status_{kind}_", f"shot_error_{kind}_"):
+                    if key.startswith(prefix) and key[len(prefix):].isdigit():
+                        numbers.add(int(key[len(prefix):]))
+        shot_images = meta.get("shot_images") or {}
+        numbers.update(int(k) for k in shot_images if str(k).isdigit())
+        ids = self._shot_ids(project.id, numbers)
+        for n in numbers:
+            values = {}
+            for kind in KINDS:
+                if meta.get(f"shot_status_{kind}_{n}"):
+                    values[f"{kind}_status"] = meta[f"shot_status_{kind}_{n}"]
+                if meta.get(f"shot_error_{kind}_{n}"):
+                    values[f"{kind}_error"] = str(meta[f"shot_error_{kind}_{n}"])
+            if values:
+                self.db.execute(update(Shot).where(Shot.id == ids[n]).values(**values))
+            self._insert_ignore(
+                ImageTake,
+                [{"id": generate_uuid(), "shot_id": ids[n], "path": p} for p in dict.fromkeys(shot_images.get(str(n)) or []) if p],
+                ["shot_id", "path"]
+            )
+        self.db.commit()
+        return max(touched, len(numbers))
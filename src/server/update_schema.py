@@ -1,31 +1,102 @@
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 from src.server.database import engine
 
+# (table, column, column DDL) added to existing databases that predate the column
+COLUMNS = [
+    ("projects", "characters", "JSON"),
+    ("projects", "scenes", "JSON"),
+    ("projects", "final_video", "VARCHAR"),
+    ("projects", "steps", "JSON"),
+    ("projects", "platform", "VARCHAR"),
+    ("projects", "resolution", "VARCHAR"),
+    ("projects", "aspect_ratio", "VARCHAR"),
+    ("projects", "usage_prompt_tokens", "INTEGER"),
+    ("projects", "usage_completion_tokens", "INTEGER"),
+    ("projects", "usage_images", "INTEGER"),
+    ("projects", "usage_videos", "INTEGER"),
+    ("projects", "usage_video_seconds", "FLOAT"),
+    ("projects", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("projects", "edit_version", "INTEGER NOT NULL DEFAULT 1"),
+    ("tasks", "total_count", "INTEGER"),
+    ("tasks", "completed_count", "INTEGER"),
+    ("tasks", "failed_count", "INTEGER"),
+    ("video_tasks", "last_checked_at", "TIMESTAMP"),
+    ("video_tasks", "model_id", "VARCHAR"),
+    ("video_tasks", "duration", "INTEGER"),
+    ("video_tasks", "next_check_at", "TIMESTAMP"),
+    ("video_tasks", "completed_at", "TIMESTAMP"),
+    ("video_tasks", "lease_owner", "VARCHAR"),
+    ("video_tasks", "lease_until", "TIMESTAMP"),
+    ("video_tasks", "source_url", "VARCHAR"),
+    ("video_tasks", "callback_registered", "BOOLEAN DEFAULT FALSE"),
+    ("video_tasks", "params", "JSON"),
+    ("video_tasks", "attempts", "INTEGER DEFAULT 1"),
+    ("video_tasks", "submitted_at", "TIMESTAMP"),
+    ("video_tasks", "unknown_count", "INTEGER DEFAULT 0"),
+]
+
+# Columns copied out of a JSON column, filled once when the column is added:
+# (table, column, json column, key, SQL type of the value)
+BACKFILLS = [
+    ("projects", "platform", "topic_meta", "platform", "VARCHAR"),
+    ("projects", "resolution", "topic_meta", "resolution", "VARCHAR"),
+    ("projects", "aspect_ratio", "topic_meta", "aspect_ratio", "VARCHAR"),
+    ("projects", "usage_prompt_tokens", "total_tokens", "prompt_tokens", "INTEGER"),
+    ("projects", "usage_completion_tokens", "total_tokens", "completion_tokens", "INTEGER"),
+    ("projects", "usage_images", "usage_stats", "total_images", "INTEGER"),
+    ("projects", "usage_videos", "usage_stats", "total_videos", "INTEGER"),
+    ("projects", "usage_video_seconds", "usage_stats", "total_video_duration", "FLOAT"),
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_video_tasks_status_checked ON video_tasks (status, last_checked_at)",
+    "CREATE INDEX IF NOT EXISTS ix_video_tasks_status_next_check ON video_tasks (status, next_check_at)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_created_id ON projects (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_status_created ON projects (status, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_platform_created ON projects (platform, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_resolution_created ON projects (resolution, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_aspect_ratio_created ON projects (aspect_ratio, created_at, id)",
+]
+
+
 def update_schema():
-    with engine.connect() as conn:
-        try:
-            conn.execute(text("ALTER TABLE projects ADD COLUMN characters JSON"))
-            print("Added characters column to projects table.")
-        except Exception as e:
-            print(f"Characters column might already exist or error: {e}")
-            
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    existing = {t: {c["name"] for c in inspector.get_columns(t)} for t in tables}
+
+    # One transaction per statement: a failure must not abort the remaining migrations
+    added = set()
+    for table, column, ddl in COLUMNS:
+        if table not in tables or column in existing[table]:
+            continue
         try:
-            conn.execute(text("ALTER TABLE projects ADD COLUMN scenes JSON"))
-            print("Added scenes column to projects table.")
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            added.add((table, column))
+            print(f"Added {column} column to {table} table.")
         except Exception as e:
-            print(f"Scenes column might already exist or error: {e}")
+            print(f"Failed to add {column} column to {table}: {e}")
 
+    for table, column, json_column, key, sql_type in BACKFILLS:
+        if (table, column) not in added:
+            continue
+        if engine.dialect.name == "postgresql":
+            value = f"CAST(CAST({json_column} AS JSONB) ->> '{key}' AS {sql_type})"
+        else:
+            value = f"json_extract({json_column}, '$.{key}')"
         try:
-            conn.execute(text("ALTER TABLE projects ADD COLUMN final_video VARCHAR"))
-            print("Added final_video column to projects table.")
+            with engine.begin() as conn:
+                conn.execute(text(f"UPDATE {table} SET {column} = {value} WHERE {column} IS NULL"))
+            print(f"Backfilled {table}.{column} from {json_column}.")
         except Exception as e:
-            print(f"final_video column might already exist or error: {e}")
+            print(f"Failed to backfill {table}.{column}: {e}")
 
+    for statement in INDEXES:
         try:
-            conn.execute(text("ALTER TABLE projects ADD COLUMN steps JSON"))
-            print("Added steps column to projects table.")
+            with engine.begin() as conn:
+                conn.execute(text(statement))
         except Exception as e:
-            print(f"Steps column might already exist or error: {e}")
+            print(f"Index migration error ({statement}): {e}")
 
 if __name__ == "__main__":
     update_schema()
@@ -0,0 +1,228 @@
+"""
+成片入库模块
+视频任务成功后的下载 + TOS 上传由独立的有界队列和工作线程池完成，
+状态轮询只负责发现 SUCCEEDED 并入队，慢下载不会拖住其他镜头的完成
+"""
+
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any
+
+from loguru import logger
+from sqlalchemy import or_
+
+from src.core.video_generator import VideoGenerator
+from src.server.database import get_db
+from src.server.models import VideoTask
+from src.server.services import VideoTaskService
+from src.utils.config_loader import config_loader
+
+
+class VideoIngestion:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(VideoIngestion, cls).__new__(cls)
+            cls._instance.running = False
+            cls._instance.video_gen = VideoGenerator()
+            # Rows in "ingesting" are leased to the pool of the replica that owns them
+            cls._instance.owner = f"{socket.gethostname()}:{os.getpid()}:ingest-{uuid.uuid4().hex[:8]}"
+            cls._instance._lock = threading.Lock()
+            cls._instance._progress: Dict[str, Dict[str, Any]] = {}
+            cls._instance._stats = {
+                "enqueued": 0,
+                "rejected": 0,
+                "recovered": 0,
+                "completed": 0,
+                "failed": 0,
+                "retries": 0,
+                "bytes_downloaded": 0
+            }
+            cls._instance.reload_config()
+            cls._instance._queue = queue.Queue(maxsize=cls._instance.queue_size)
+        return cls._instance
+
+    def reload_config(self):
+        """重新加载配置 (app.video_ingestion)；workers / queue_size 在重启后生效"""
+        conf = config_loader.get("app.video_ingestion", {}) or {}
+        self.workers = int(conf.get("workers", 4))
+        self.queue_size = int(conf.get("queue_size", 200))
+        self.max_attempts = int(conf.get("max_attempts", 3))
+        self.retry_backoff = float(conf.get("retry_backoff", 5))
+        # Must cover one download + upload; an expired lease lets any replica take the task over
+        self.lease_seconds = float(conf.get("lease_seconds", 900))
+        self.recover_interval = float(conf.get("recover_interval", 30))
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"video-ingest-{i}", daemon=True).start()
+        threading.Thread(target=self._recover_loop, name="video-ingest-recover", daemon=True).start()
+        logger.info(f"Video Ingestion started ({self.workers} workers)")
+
+    def submit(self, task_pk: str) -> bool:
+        """入队；队列已满时释放租约，由恢复扫描稍后接手"""
+        try:
+            self._queue.put_nowait(task_pk)
+        except queue.Full:
+            logger.warning(f"Ingestion queue full, deferring video task {task_pk}")
+            with self._lock:
+                self._stats["rejected"] += 1
+            self._release(task_pk)
+            return False
+        with self._lock:
+            self._stats["enqueued"] += 1
+        return True
+
+    def _release(self, task_pk: str):
+        db = next(get_db())
+        try:
+            db.query(VideoTask).filter(
+                VideoTask.id == task_pk, VideoTask.status == "ingesting", VideoTask.lease_owner == self.owner
+            ).update({VideoTask.lease_until: None}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _lease(self, db, task_pk: str, owner_condition) -> bool:
+        """续租 / 认领；返回 False 表示任务已不归本副本处理"""
+        updated = db.query(VideoTask).filter(
+            VideoTask.id == task_pk, VideoTask.status == "ingesting", owner_condition
+        ).update(
+            {
+                VideoTask.lease_owner: self.owner,
+                VideoTask.lease_until: datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+            },
+            synchronize_session=False
+        )
+        db.commit()
+        return bool(updated)
+
+    def _recover_loop(self):
+        while self.running:
+            time.sleep(self.recover_interval)
+            try:
+                self.recover()
+            except Exception as e:
+                logger.error(f"Video ingestion recovery error: {e}")
+
+    def recover(self) -> int:
+        """接手租约已失效的 ingesting 任务 (进程崩溃或入队被拒)，按队列空位认领"""
+        capacity = self.queue_size - self._queue.qsize()
+        if capacity <= 0:
+            return 0
+        db = next(get_db())
+        try:
+            now = datetime.now(timezone.utc)
+            expired = or_(VideoTask.lease_until.is_(None), VideoTask.lease_until < now)
+            ids = [r.id for r in db.query(VideoTask.id).filter(
+                VideoTask.status == "ingesting", expired
+            ).limit(capacity).with_for_update(skip_locked=True).all()]
+            claimed = [task_pk for task_pk in ids if self._lease(db, task_pk, expired)]
+        finally:
+            db.close()
+
+        for task_pk in claimed:
+            logger.info(f"Recovered video task {task_pk} for ingestion")
+            self.submit(task_pk)
+        if claimed:
+            with self._lock:
+                self._stats["recovered"] += len(claimed)
+        return len(claimed)
+
+    def _worker(self):
+        while self.running:
+            task_pk = self._queue.get()
+            try:
+                self._ingest(task_pk)
+            except Exception as e:
+                logger.error(f"Video ingestion error ({task_pk}): {e}")
+            finally:
+                with self._lock:
+                    self._progress.pop(task_pk, None)
+                self._queue.task_done()
+
+    def _ingest(self, task_pk: str):
+        db = next(get_db())
+        try:
+            task = db.query(VideoTask).filter(
+                VideoTask.id == task_pk, VideoTask.status == "ingesting", VideoTask.lease_owner == self.owner
+            ).first()
+            if not task:
+                logger.info(f"Video task {task_pk} is no longer leased for ingestion, skipping")
+                return
+
+            progress = {
+                "project_id": task.project_id,
+                "shot_number": task.shot_number,
+                "attempt": 0,
+                "stage": "queued",
+                "bytes": 0,
+                "total": 0,
+                "started_at": datetime.now(timezone.utc).isoformat()
+            }
+            with self._lock:
+                self._progress[task_pk] = progress
+
+            def on_progress(stage, done, total):
+                progress.update(stage=stage, bytes=done, total=total)
+                if stage == "download":
+                    progress["downloaded"] = done
+
+            final_url, error = None, None
+            for attempt in range(1, self.max_attempts + 1):
+                progress.update(attempt=attempt, stage="download", bytes=0, total=0, downloaded=0)
+                # Renew before every attempt so a slow retry does not hand the task to another replica
+                if not self._lease(db, task_pk, VideoTask.lease_owner == self.owner):
+                    logger.warning(f"Lost ingestion lease on video task {task_pk}")
+                    return
+                final_url, error = self.video_gen.process_completed_video(
+                    task.source_url, task.project_id, task.shot_number, on_progress=on_progress
+                )
+                with self._lock:
+                    self._stats["bytes_downloaded"] += progress["downloaded"]
+                if final_url:
+                    break
+                if attempt < self.max_attempts:
+                    with self._lock:
+                        self._stats["retries"] += 1
+                    delay = self.retry_backoff * attempt
+                    logger.warning(f"Ingestion of shot {task.shot_number} failed ({error}), retrying in {delay:.0f}s")
+                    progress["stage"] = "retry_wait"
+                    time.sleep(delay)
+
+            vts = VideoTaskService(db)
+            if final_url:
+                if vts.transition(task, "ingesting", "completed", video_url=final_url):
+                    vts.record_shot_result(task, message=f"Shot {task.shot_number} video completed")
+                    with self._lock:
+                        self._stats["completed"] += 1
+            else:
+                if vts.transition(task, "ingesting", "failed", error_msg=f"Processing failed: {error}"):
+                    vts.record_shot_result(task, error=error, message=f"Shot {task.shot_number} processing failed: {error}")
+                    with self._lock:
+                        self._stats["failed"] += 1
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "owner": self.owner,
+                "workers": self.workers,
+                "queued": self._queue.qsize(),
+                "queue_size": self.queue_size,
+                "in_progress": [{"task_id": k, **v} for k, v in self._progress.items()]
+            }
+
+
+video_ingestion = VideoIngestion()
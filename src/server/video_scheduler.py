@@ -1,14 +1,27 @@
+import asyncio
+import os
+import socket
 import time
 import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
+from sqlalchemy import func, or_, update, bindparam, DateTime
 from sqlalchemy.orm import Session
 from src.server.database import get_db
 from src.server.models import VideoTask, Project
-from src.models.veadk_client import veadk_client
+from src.models.async_veadk_client import async_veadk_client
+from src.models.veadk_client import ModelCallError
 from src.core.video_generator import VideoGenerator
-from src.server.project_service import ProjectService
 from src.server.log_service import LogService
-from src.server.services import TaskService
+from src.server.services import VideoTaskService
+from src.server.video_ingestion import video_ingestion
+from src.utils.circuit_breaker import circuit_breakers
+from src.utils.config_loader import config_loader
+from src.server.poll_planner import poll_planner, _as_utc
+
 
 class VideoScheduler:
     _instance = None
@@ -17,9 +30,47 @@ class VideoScheduler:
         if cls._instance is None:
             cls._instance = super(VideoScheduler, cls).__new__(cls)
             cls._instance.running = False
+            cls._instance._batch_supported = True
+            # Used to resubmit stale tasks
             cls._instance.video_gen = VideoGenerator()
+            cls._instance._last_reap = 0.0
+            # Identifies this replica in row leases
+            cls._instance.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            cls._instance._stats = {
+                "cycles": 0,
+                "mode": None,
+                "due": 0,
+                "claimed": 0,
+                "checked": 0,
+                "status_checks": 0,
+                "finished": 0,
+                "resubmitted": 0,
+                "abandoned": 0,
+                "lag_seconds": 0.0,
+                "last_cycle_seconds": 0.0,
+                "last_cycle_at": None
+            }
+            cls._instance.reload_config()
         return cls._instance
 
+    def reload_config(self):
+        """重新加载配置 (app.video_scheduler)"""
+        conf = config_loader.get("app.video_scheduler", {}) or {}
+        self.poll_interval = float(conf.get("poll_interval", 5))
+        self.batch_size = int(conf.get("batch_size", 500))
+        self.concurrency = int(conf.get("concurrency", 20))
+        self.batch_query = bool(conf.get("batch_query", True))
+        self.list_page_size = int(conf.get("list_page_size", 100))
+        # Polling lease must outlive one status fetch
+        self.lease_seconds = float(conf.get("lease_seconds", 120))
+        reaper = conf.get("reaper", {}) or {}
+        self.reaper_enabled = bool(reaper.get("enable", True))
+        self.reap_interval = float(reaper.get("interval", 60))
+        self.max_lifetime = float(reaper.get("max_lifetime", 1800))
+        self.max_unknown = int(reaper.get("max_unknown", 10))
+        self.resubmit = bool(reaper.get("resubmit", True))
+        self.max_submit_attempts = int(reaper.get("max_attempts", 2))
+
     def start(self):
         if self.running:
             return
@@ -29,112 +80,301 @@ class VideoScheduler:
         logger.info("Video Scheduler started")
 
     def _loop(self):
-        while self.running:
-            try:
-                self._process_pending_tasks()
-            except Exception as e:
-                logger.error(f"Video Scheduler Error: {e}")
-            time.sleep(5) # Poll every 5 seconds
-
-    def _process_pending_tasks(self):
-        # Use a new session for each cycle to ensure freshness
+        # A dedicated event loop lets one thread keep many status requests in flight
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        # Completed videos are downloaded / uploaded off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="video-sched")
+        db = next(get_db())
+        try:
+            poll_planner.load_history(db)
+        except Exception as e:
+            logger.warning(f"Failed to load video completion history: {e}")
+        finally:
+            db.close()
+        try:
+            while self.running:
+                started = time.monotonic()
+                try:
+                    loop.run_until_complete(self._process_pending_tasks())
+                except Exception as e:
+                    logger.error(f"Video Scheduler Error: {e}")
+                time.sleep(max(0.0, self.poll_interval - (time.monotonic() - started)))
+        finally:
+            loop.run_until_complete(async_veadk_client.close())
+            loop.close()
+            self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        """调度统计 (lag_seconds = 当前时间 - 最早到期任务的计划检查时间)"""
+        return {**self._stats, "owner": self.owner, "concurrency": self.concurrency, "batch_supported": self._batch_supported}
+
+    def _claim_due_tasks(self) -> Tuple[List, float]:
+        """
+        认领计划检查时间已到、且无有效租约的任务，并计算调度延迟
+
+        Postgres 使用 FOR UPDATE SKIP LOCKED，多个副本各自拿到不相交的一批；
+        SQLite 忽略行锁，由带租约条件的 UPDATE 保证同一行只被一个副本认领
+        """
+        db = next(get_db())
+        try:
+            now = datetime.now(timezone.utc)
+            due = [
+                VideoTask.status == "submitted",
+                or_(VideoTask.next_check_at.is_(None), VideoTask.next_check_at <= now),
+                or_(VideoTask.lease_until.is_(None), VideoTask.lease_until < now)
+            ]
+
+            oldest = db.query(
+                func.min(func.coalesce(VideoTask.next_check_at, VideoTask.created_at))
+            ).filter(*due).scalar()
+            oldest = _as_utc(oldest)
+            lag = max(0.0, (now - oldest).total_seconds()) if oldest else 0.0
+
+            claimed = self._lease_rows(db, due, now, order_by=(
+                VideoTask.next_check_at.is_(None).desc(),
+                VideoTask.next_check_at.asc()
+            ))
+            if not claimed:
+                return [], lag
+
+            rows = db.query(
+                VideoTask.id, VideoTask.volc_task_id, VideoTask.model_id, VideoTask.duration,
+                # Age counts from the latest (re)submission
+                func.coalesce(
+                    VideoTask.submitted_at, VideoTask.created_at, type_=DateTime(timezone=True)
+                ).label("submitted_at"),
+                VideoTask.callback_registered, VideoTask.unknown_count
+            ).filter(VideoTask.id.in_(claimed)).all()
+            return rows, lag
+        finally:
+            db.close()
+
+    def _lease_rows(self, db: Session, conditions: List, now: datetime, order_by=()) -> List[str]:
+        """按条件认领一批行并写入本副本租约，返回认领成功的 id"""
+        candidates = [r.id for r in db.query(VideoTask.id).filter(*conditions).order_by(
+            *order_by
+        ).limit(self.batch_size).with_for_update(skip_locked=True).all()]
+        if not candidates:
+            db.commit()
+            return []
+
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        db.query(VideoTask).filter(VideoTask.id.in_(candidates), *conditions).update(
+            {VideoTask.lease_owner: self.owner, VideoTask.lease_until: lease_until},
+            synchronize_session=False
+        )
+        db.commit()
+        return [r.id for r in db.query(VideoTask.id).filter(
+            VideoTask.id.in_(candidates),
+            VideoTask.lease_owner == self.owner,
+            VideoTask.lease_until == lease_until
+        ).all()]
+
+    def _mark_checked(self, tasks: List, unresolved: List):
+        """记录本轮检查、按轮询计划写入下次检查时间，并释放本副本的租约"""
+        if not tasks and not unresolved:
+            return
+        now = datetime.now(timezone.utc)
+        table = VideoTask.__table__
         db = next(get_db())
         try:
-            # Limit batch size to avoid holding DB too long if many tasks
-            tasks = db.query(VideoTask).filter(VideoTask.status == "submitted").limit(10).all()
+            conn = db.connection()
             if tasks:
-                logger.debug(f"Video Scheduler checking {len(tasks)} tasks...")
-            
-            for task in tasks:
-                self._check_task(task, db)
+                conn.execute(
+                    update(table).where(
+                        table.c.id == bindparam("task_pk"), table.c.lease_owner == self.owner
+                    ).values(
+                        last_checked_at=now, next_check_at=bindparam("next_at"), unknown_count=0,
+                        lease_owner=None, lease_until=None
+                    ),
+                    [
+                        {
+                            "task_pk": t.id,
+                            "next_at": poll_planner.next_check_at(
+                                t.model_id, t.duration, t.submitted_at, now, callback=bool(t.callback_registered)
+                            )
+                        }
+                        for t in tasks
+                    ]
+                )
+            if unresolved:
+                # No usable status (network error / not found): retry with exponential backoff,
+                # the reaper gives up on the task after max_unknown in a row
+                conn.execute(
+                    update(table).where(
+                        table.c.id == bindparam("task_pk"), table.c.lease_owner == self.owner
+                    ).values(
+                        last_checked_at=now, next_check_at=bindparam("next_at"), unknown_count=bindparam("unknown"),
+                        lease_owner=None, lease_until=None
+                    ),
+                    [
+                        {
+                            "task_pk": t.id,
+                            "unknown": (t.unknown_count or 0) + 1,
+                            "next_at": now + timedelta(seconds=min(
+                                poll_planner.max_interval, poll_planner.min_interval * 2 ** min(t.unknown_count or 0, 6)
+                            ))
+                        }
+                        for t in unresolved
+                    ]
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _fetch_statuses(self, volc_ids: List[str]) -> Dict[str, Tuple[str, Optional[str], Optional[str]]]:
+        """批量接口优先；不支持或缺失的任务回退为受限并发的逐个查询"""
+        results = {}
+        if self.batch_query and self._batch_supported:
+            pages = [volc_ids[i:i + self.list_page_size] for i in range(0, len(volc_ids), self.list_page_size)]
+            responses = await asyncio.gather(
+                *(async_veadk_client.alist_video_task_status(page) for page in pages),
+                return_exceptions=True
+            )
+            for page, response in zip(pages, responses):
+                if isinstance(response, ModelCallError) and response.status_code in (400, 404, 405):
+                    logger.warning(f"Video task list query unsupported ({response.status_code}), falling back to per-task polling")
+                    self._batch_supported = False
+                elif isinstance(response, Exception):
+                    logger.warning(f"Video task list query failed: {response}")
+                else:
+                    results.update(response)
+
+        missing = [vid for vid in volc_ids if vid not in results]
+        if missing:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def check(volc_id):
+                async with semaphore:
+                    return volc_id, await async_veadk_client.acheck_video_task_status(volc_id)
+
+            for volc_id, result in await asyncio.gather(*(check(vid) for vid in missing)):
+                results[volc_id] = result
+
+        self._stats["mode"] = "fanout" if len(missing) == len(volc_ids) else ("batch" if not missing else "mixed")
+        return results
+
+    async def _process_pending_tasks(self):
+        if self.reaper_enabled and time.monotonic() - self._last_reap >= self.reap_interval:
+            self._last_reap = time.monotonic()
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._reap_stale_tasks)
+
+        if circuit_breakers.get("video_status").is_open:
+            # Status endpoint is down; skip the cycle instead of failing every task one by one
+            logger.debug("Video Scheduler: video_status circuit open, skipping cycle")
+            return
+
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        tasks, lag = await loop.run_in_executor(self._executor, self._claim_due_tasks)
+        self._stats["lag_seconds"] = round(lag, 2)
+        self._stats["due"] = len(tasks)
+        self._stats["claimed"] += len(tasks)
+        if not tasks:
+            return
+        logger.debug(f"Video Scheduler checking {len(tasks)} tasks (lag {lag:.1f}s)...")
+
+        statuses = await self._fetch_statuses([t.volc_task_id for t in tasks])
+
+        checked, unresolved, finished = [], [], []
+        for task in tasks:
+            result = statuses.get(task.volc_task_id)
+            if result is None or result[0] == "UNKNOWN":
+                unresolved.append(task)
+                continue
+            if result[0] in ("SUCCEEDED", "FAILED", "EXPIRED"):
+                finished.append(loop.run_in_executor(self._executor, self._apply_result, task.id, *result))
+            else:
+                checked.append(task)
+
+        await loop.run_in_executor(self._executor, self._mark_checked, checked, unresolved)
+        if finished:
+            await asyncio.gather(*finished)
+
+        self._stats.update({
+            "cycles": self._stats["cycles"] + 1,
+            "checked": len(checked) + len(finished),
+            "status_checks": self._stats["status_checks"] + len(tasks),
+            "finished": self._stats["finished"] + len(finished),
+            "last_cycle_seconds": round(time.monotonic() - started, 3),
+            "last_cycle_at": datetime.now(timezone.utc).isoformat()
+        })
+
+    def handle_callback(self, task_pk: str, volc_task_id: str, result: Tuple[str, Optional[str], Optional[str]]) -> bool:
+        """
+        处理完成回调 (结果已回查平台确认)：认领未被租用的任务后按轮询结果同样处理
+
+        Args:
+            task_pk: 回调签名绑定的 VideoTask ID，平台任务须仍属于该记录
+
+        Returns:
+            False 表示任务不存在、已处理，或正被轮询/其他副本持有
+        """
+        db = next(get_db())
+        try:
+            now = datetime.now(timezone.utc)
+            claimed = db.query(VideoTask).filter(
+                VideoTask.id == task_pk,
+                VideoTask.volc_task_id == volc_task_id,
+                VideoTask.status == "submitted",
+                or_(VideoTask.lease_until.is_(None), VideoTask.lease_until < now)
+            ).update(
+                {VideoTask.lease_owner: self.owner, VideoTask.lease_until: now + timedelta(seconds=self.lease_seconds)},
+                synchronize_session=False
+            )
+            db.commit()
+            if not claimed:
+                return False
+        finally:
+            db.close()
+        self._apply_result(task_pk, *result)
+        return True
+
+    def _apply_result(self, task_pk: str, status: str, video_url: Optional[str], error: Optional[str]):
+        """处理终态结果 (在线程池中执行，独立会话)"""
+        db = next(get_db())
+        try:
+            task = db.query(VideoTask).filter(
+                VideoTask.id == task_pk,
+                VideoTask.status == "submitted",
+                VideoTask.lease_owner == self.owner
+            ).first()
+            if not task:
+                logger.info(f"Video task {task_pk} is no longer leased by this scheduler, skipping")
+                return
+            if status == "SUCCEEDED":
+                # Generation time feeds the per-model completion distribution
+                elapsed = (datetime.now(timezone.utc) - _as_utc(task.submitted_at or task.created_at)).total_seconds()
+                poll_planner.observe(task.model_id, task.duration, elapsed)
+            self._check_task(task, db, (status, video_url, error))
         finally:
             db.close()
 
-    def _check_task(self, task: VideoTask, db: Session):
+    def _check_task(self, task: VideoTask, db: Session, result: Tuple[str, Optional[str], Optional[str]]):
         try:
-            status, video_url, error = veadk_client.check_video_task_status(task.volc_task_id)
+            status, video_url, error = result
             
             if status == "RUNNING":
                 return # Do nothing
             
-            ps = ProjectService(db)
-            ls = LogService(db)
+            vts = VideoTaskService(db)
             
             if status == "SUCCEEDED" and video_url:
-                logger.info(f"Task {task.volc_task_id} (Shot {task.shot_number}) succeeded. Processing result...")
-                
-                # Process result (Download/Upload)
-                final_url, proc_error = self.video_gen.process_completed_video(
-                    video_url, 
-                    task.project_id, 
-                    task.shot_number
-                )
-                
-                if final_url:
-                    # Update Task
-                    task.status = "completed"
-                    task.video_url = final_url
-                    db.commit() # Commit task update first
-                    
-                    # Update Project
-                    project = ps.get_project(task.project_id)
-                    if project:
-                        video_paths = list(project.video_paths or [])
-                        # Ensure size
-                        while len(video_paths) < task.shot_number:
-                            video_paths.append(None)
-                        # Shot number is 1-based index usually
-                        if task.shot_number > 0:
-                            video_paths[task.shot_number - 1] = final_url
-                            ps.update_project(task.project_id, {"video_paths": video_paths})
-                            
-                            # Update meta status
-                            meta = dict(project.topic_meta or {})
-                            meta[f"shot_status_video_{task.shot_number}"] = "completed"
-                            ps.update_project(task.project_id, {"topic_meta": meta})
-                            
-                            # Log
-                            ls.log(task.project_id, None, "INFO", f"Shot {task.shot_number} video completed", module="video_scheduler")
-                    
-                    if task.task_id:
-                        self._update_parent_task(task.task_id, db)
-
-                else:
-                    # Processing failed
-                    task.status = "failed"
-                    task.error_msg = f"Processing failed: {proc_error}"
-                    db.commit()
-                    ls.log(task.project_id, None, "ERROR", f"Shot {task.shot_number} processing failed: {proc_error}", module="video_scheduler")
-                    
-                    # Update meta
-                    project = ps.get_project(task.project_id)
-                    if project:
-                        meta = dict(project.topic_meta or {})
-                        meta[f"shot_status_video_{task.shot_number}"] = "failed"
-                        meta[f"shot_error_video_{task.shot_number}"] = proc_error
-                        ps.update_project(task.project_id, {"topic_meta": meta})
-                    
-                    if task.task_id:
-                        self._update_parent_task(task.task_id, db)
+                # Download + TOS upload run in the ingestion pool so polling never waits on them
+                lease_until = datetime.now(timezone.utc) + timedelta(seconds=video_ingestion.lease_seconds)
+                if vts.transition(task, "submitted", "ingesting", source_url=video_url,
+                                  lease_owner=video_ingestion.owner, lease_until=lease_until):
+                    logger.info(f"Task {task.volc_task_id} (Shot {task.shot_number}) succeeded, queued for ingestion")
+                    video_ingestion.submit(task.id)
 
             elif status == "FAILED":
                 logger.info(f"Task {task.volc_task_id} (Shot {task.shot_number}) failed: {error}")
-                task.status = "failed"
-                task.error_msg = error
-                db.commit()
-                
-                ls.log(task.project_id, None, "ERROR", f"Shot {task.shot_number} generation failed: {error}", module="video_scheduler")
-                
-                # Update meta
-                project = ps.get_project(task.project_id)
-                if project:
-                    meta = dict(project.topic_meta or {})
-                    meta[f"shot_status_video_{task.shot_number}"] = "failed"
-                    meta[f"shot_error_video_{task.shot_number}"] = error
-                    ps.update_project(task.project_id, {"topic_meta": meta})
-                
-                if task.task_id:
-                    self._update_parent_task(task.task_id, db)
+                if vts.transition(task, "submitted", "failed", error_msg=error):
+                    vts.record_shot_result(task, error=error, message=f"Shot {task.shot_number} generation failed: {error}")
+
+            elif status == "EXPIRED":
+                self._reap(task, db, f"expired by provider ({error or 'no result'})")
             
             # If UNKNOWN, maybe retry later?
             
@@ -142,33 +382,69 @@ class VideoScheduler:
             logger.error(f"Error checking task {task.id}: {e}")
             # Don't mark failed immediately unless critical?
 
-    def _update_parent_task(self, parent_task_id, db: Session):
-        # Check all sibling tasks
-        siblings = db.query(VideoTask).filter(VideoTask.task_id == parent_task_id).all()
-        if not siblings:
-            return
+    def _reap_stale_tasks(self) -> int:
+        """认领超出最大存活时间、或连续多次查询不到状态的任务并处理"""
+        db = next(get_db())
+        try:
+            now = datetime.now(timezone.utc)
+            submitted_at = func.coalesce(VideoTask.submitted_at, VideoTask.created_at)
+            stale = [
+                VideoTask.status == "submitted",
+                or_(VideoTask.lease_until.is_(None), VideoTask.lease_until < now),
+                or_(
+                    submitted_at < now - timedelta(seconds=self.max_lifetime),
+                    VideoTask.unknown_count >= self.max_unknown
+                )
+            ]
+            claimed = self._lease_rows(db, stale, now)
+            for task in db.query(VideoTask).filter(VideoTask.id.in_(claimed)).all() if claimed else []:
+                if (task.unknown_count or 0) >= self.max_unknown:
+                    reason = f"status unavailable for {task.unknown_count} consecutive checks"
+                else:
+                    reason = f"not finished after {self.max_lifetime / 60:.0f} minutes"
+                self._reap(task, db, reason)
+            return len(claimed)
+        except Exception as e:
+            logger.error(f"Video task reaper error: {e}")
+            return 0
+        finally:
+            db.close()
 
-        total = len(siblings)
-        completed = sum(1 for t in siblings if t.status == "completed")
-        failed = sum(1 for t in siblings if t.status == "failed")
-        
-        # Calculate progress
-        progress = int((completed + failed) / total * 100) if total > 0 else 0
-        
-        ts = TaskService(db)
-        parent_task = ts.get_task(parent_task_id)
-        if not parent_task:
+    def _reap(self, task: VideoTask, db: Session, reason: str):
+        """重新提交 (有保存的参数且未超过次数) 或标记为最终失败"""
+        vts = VideoTaskService(db)
+        attempts = task.attempts or 1
+        if self.resubmit and task.params and attempts < self.max_submit_attempts:
+            logger.warning(f"Resubmitting video task {task.volc_task_id} (Shot {task.shot_number}): {reason}")
+            submission = self.video_gen.submit_single_video_task(task.params, task.project_id, callback_ref=task.id)
+            usage = submission.get("usage") or {}
+            now = datetime.now(timezone.utc)
+            if "task_id" in submission:
+                callback = bool(usage.get("callback"))
+                if vts.transition(
+                    task, "submitted", "submitted",
+                    volc_task_id=submission["task_id"],
+                    model_id=usage.get("model") or task.model_id,
+                    attempts=attempts + 1,
+                    submitted_at=now,
+                    unknown_count=0,
+                    callback_registered=callback,
+                    last_checked_at=None,
+                    next_check_at=poll_planner.next_check_at(usage.get("model") or task.model_id, task.duration, now, now, callback=callback),
+                    error_msg=f"Resubmitted (attempt {attempts + 1}): {reason}",
+                    lease_owner=None,
+                    lease_until=None
+                ):
+                    self._stats["resubmitted"] += 1
+                    LogService(db).log(task.project_id, None, "WARNING",
+                                       f"Shot {task.shot_number} video task resubmitted: {reason}", module="video_scheduler")
+                return
+            # The failed resubmission counts as an attempt; the next reap pass retries or gives up
+            vts.transition(task, "submitted", "submitted", attempts=attempts + 1, lease_owner=None, lease_until=None,
+                           error_msg=f"Resubmission failed: {submission.get('error')}")
             return
 
-        if completed + failed == total:
-            # All done
-            if failed == total:
-                 ts.update_task(parent_task_id, status="failed", error="All video tasks failed")
-            else:
-                 # Partial success is considered success for the batch task, 
-                 # as users can see individual failures.
-                 ts.update_task(parent_task_id, status="completed", progress=100, result={"completed": completed, "failed": failed})
-        else:
-            # Still running
-            ts.update_task(parent_task_id, status="running", progress=progress)
-
+        if vts.transition(task, "submitted", "failed", error_msg=reason):
+            self._stats["abandoned"] += 1
+            logger.warning(f"Video task {task.volc_task_id} (Shot {task.shot_number}) abandoned: {reason}")
+            vts.record_shot_result(task, error=reason, message=f"Shot {task.shot_number} video task abandoned: {reason}")
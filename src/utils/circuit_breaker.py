@@ -0,0 +1,243 @@
+"""
+熔断器模块
+按外部端点/操作 (llm、image、video_submit、video_status、tos) 维护 closed → open → half-open 状态，
+端点持续故障时快速失败，避免每个工作线程各自等满超时
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Optional
+
+from loguru import logger
+
+from .config_loader import config_loader
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求未发出"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    单个端点的熔断器
+
+    closed:    连续失败达到 failure_threshold 后转为 open
+    open:      直接拒绝请求，reset_timeout 秒后转为 half_open
+    half_open: 最多放行 half_open_max_calls 个探测请求，成功则恢复 closed，失败则重新 open
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self.half_open_max_calls = int(half_open_max_calls)
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_in_flight = 0
+
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.times_opened = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def reconfigure(self, failure_threshold: int, reset_timeout: float, half_open_max_calls: int):
+        """应用新配置，保留当前状态与计数 (已打开的熔断器按新的 reset_timeout 计算恢复时间)"""
+        with self._lock:
+            self.failure_threshold = int(failure_threshold)
+            self.reset_timeout = float(reset_timeout)
+            self.half_open_max_calls = int(half_open_max_calls)
+
+    def _transition(self, state: str):
+        """切换状态 (需持有锁)"""
+        if state == self.state:
+            return
+        logger.warning(f"Circuit '{self.name}': {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == HALF_OPEN:
+            self.half_open_in_flight = 0
+        elif state == CLOSED:
+            self.consecutive_failures = 0
+
+    def _current_state(self) -> str:
+        """open 超过 reset_timeout 后自动进入 half_open (需持有锁)"""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+        return self.state
+
+    def allow(self):
+        """放行检查；被拒绝时抛出 CircuitOpenError"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self.half_open_in_flight < self.half_open_max_calls:
+                self.half_open_in_flight += 1
+                return
+            self.total_rejected += 1
+            retry_in = max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED)
+
+    def record_failure(self, error: Exception = None):
+        with self._lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            if error is not None:
+                self.last_error = str(error)[:200]
+            if self.state == HALF_OPEN:
+                self._transition(OPEN)
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def reset(self):
+        with self._lock:
+            self._transition(CLOSED)
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._current_state() == OPEN
+
+    @contextmanager
+    def guard(self, is_failure: Callable[[Exception], bool] = None):
+        """
+        保护一段调用: with breaker.guard(): ...
+
+        Args:
+            is_failure: 判断异常是否计为端点故障 (默认全部计入)；不计入的异常视为端点可用
+        """
+        self.allow()
+        try:
+            yield
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_success()
+            raise
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_in": round(max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 2) if state == OPEN else 0,
+                "times_opened": self.times_opened,
+                "total_failures": self.total_failures,
+                "total_rejected": self.total_rejected,
+                "last_error": self.last_error
+            }
+
+
+class _DisabledBreaker(CircuitBreaker):
+    """熔断关闭时使用：只统计，不拒绝"""
+
+    def allow(self):
+        return
+
+    def record_failure(self, error: Exception = None):
+        with self._lock:
+            self.total_failures += 1
+            if error is not None:
+                self.last_error = str(error)[:200]
+
+
+class CircuitBreakers:
+    """熔断器注册表"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CircuitBreakers, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._breakers = {}
+            cls._instance.reload_config()
+        return cls._instance
+
+    def reload_config(self):
+        """重新加载配置 (已有熔断器就地更新阈值与超时，保留状态；需要清零时使用 reset)"""
+        conf = config_loader.get("app.circuit_breaker", {}) or {}
+        self.enabled = conf.get("enable", True)
+        self.default_conf = {
+            "failure_threshold": conf.get("failure_threshold", 5),
+            "reset_timeout": conf.get("reset_timeout", 30),
+            "half_open_max_calls": conf.get("half_open_max_calls", 1)
+        }
+        self.operation_confs = conf.get("operations", {}) or {}
+        breaker_cls = CircuitBreaker if self.enabled else _DisabledBreaker
+        with self._lock:
+            for name, breaker in list(self._breakers.items()):
+                if type(breaker) is breaker_cls:
+                    breaker.reconfigure(**self._conf_for(name))
+                    continue
+                # 启用/停用切换: 换用对应实现，沿用累计统计
+                replacement = breaker_cls(name, **self._conf_for(name))
+                replacement.total_failures = breaker.total_failures
+                replacement.total_rejected = breaker.total_rejected
+                replacement.times_opened = breaker.times_opened
+                replacement.last_error = breaker.last_error
+                self._breakers[name] = replacement
+
+    def _conf_for(self, name: str) -> Dict[str, Any]:
+        return {**self.default_conf, **(self.operation_confs.get(name) or {})}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is not None:
+            return breaker
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker_cls = CircuitBreaker if self.enabled else _DisabledBreaker
+                breaker = breaker_cls(name, **self._conf_for(name))
+                self._breakers[name] = breaker
+        return breaker
+
+    def reset(self, name: Optional[str] = None) -> bool:
+        """手动复位 (name 为空时复位全部)"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        if name is None:
+            for breaker in breakers.values():
+                breaker.reset()
+            return True
+        if name not in breakers:
+            return False
+        breakers[name].reset()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: b.stats() for name, b in breakers.items()}
+
+
+circuit_breakers = CircuitBreakers()
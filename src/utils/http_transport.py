@@ -0,0 +1,173 @@
+"""
+HTTP 传输层模块
+为模型调用、资源下载提供按主机复用的长连接池 (Keep-Alive)
+"""
+
+import threading
+from typing import Dict, Any
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from .config_loader import config_loader
+
+
+class HttpTransport:
+    """共享 HTTP 传输层 (每个主机一个连接池)"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(HttpTransport, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._sessions = {}
+            # Requests / open streaming responses per session; sessions replaced by a reload close at zero
+            cls._instance._in_use = {}
+            cls._instance._retired = set()
+            cls._instance._stats = {}
+            cls._instance.reload_config()
+        return cls._instance
+
+    def reload_config(self):
+        """重新加载配置，按 app.concurrency.* 计算连接池大小"""
+        http_conf = config_loader.get("app.http", {}) or {}
+        concurrency = config_loader.get("app.concurrency", {}) or {}
+
+        # Every stage may hit the same Ark host at once, so size the pool for the sum
+        default_size = sum(int(v) for v in concurrency.values() if isinstance(v, (int, float))) or 10
+        self.pool_maxsize = int(http_conf.get("pool_maxsize") or default_size)
+        self.pool_block = bool(http_conf.get("pool_block", False))
+
+        # New requests get fresh sessions; in-flight downloads keep reading from the old pool
+        idle = []
+        with self._lock:
+            old_sessions = self._sessions
+            self._sessions = {}
+            for session in old_sessions.values():
+                if self._in_use.get(session):
+                    self._retired.add(session)
+                else:
+                    idle.append(session)
+        for session in idle:
+            session.close()
+
+        logger.info(f"HttpTransport 配置已更新, pool_maxsize={self.pool_maxsize}, pool_block={self.pool_block}")
+
+    def _host_key(self, url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=0
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _checkout(self, host: str) -> requests.Session:
+        """取主机的当前会话并登记占用 (与 reload_config 互斥，取到的会话在归还前不会被关闭)"""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._new_session()
+                self._stats.setdefault(host, {
+                    "requests": 0,
+                    "in_flight": 0,
+                    "peak_in_flight": 0,
+                    "saturated": 0
+                })
+                logger.debug(f"Created HTTP pool for {host} (maxsize={self.pool_maxsize})")
+            self._in_use[session] = self._in_use.get(session, 0) + 1
+            stats = self._stats[host]
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+            # More concurrent requests than pooled connections: either blocks or opens throwaway connections
+            if stats["in_flight"] > self.pool_maxsize:
+                stats["saturated"] += 1
+        return session
+
+    def _checkin(self, host: str, session: requests.Session):
+        with self._lock:
+            self._stats[host]["in_flight"] -= 1
+            remaining = self._in_use[session] - 1
+            if remaining:
+                self._in_use[session] = remaining
+                return
+            del self._in_use[session]
+            if session not in self._retired:
+                return
+            self._retired.discard(session)
+        # Last user of a session replaced by reload_config
+        session.close()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送请求；stream=True 时连接在响应关闭后才归还"""
+        host = self._host_key(url)
+        session = self._checkout(host)
+        try:
+            response = session.request(method, url, **kwargs)
+        except Exception:
+            self._checkin(host, session)
+            raise
+
+        if not kwargs.get("stream"):
+            self._checkin(host, session)
+            return response
+
+        # Streaming body keeps the connection checked out until the caller closes it
+        original_close = response.close
+        released = []
+
+        def _close():
+            try:
+                original_close()
+            finally:
+                # After the body is closed: the checkin may close a session retired by reload_config
+                if not released:
+                    released.append(True)
+                    self._checkin(host, session)
+
+        response.close = _close
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池使用情况 (用于观察池饱和)"""
+        with self._lock:
+            hosts = {}
+            for host, s in self._stats.items():
+                hosts[host] = {
+                    **s,
+                    "utilization": round(s["in_flight"] / self.pool_maxsize, 3) if self.pool_maxsize else 0
+                }
+        return {
+            "pool_maxsize": self.pool_maxsize,
+            "pool_block": self.pool_block,
+            "hosts": hosts
+        }
+
+    def close(self):
+        """关闭全部会话 (进程退出时调用，不等待在途请求)"""
+        with self._lock:
+            sessions = list(self._sessions.values()) + list(self._retired)
+            self._sessions = {}
+            self._retired = set()
+        for session in sessions:
+            session.close()
+
+
+http_transport = HttpTransport()
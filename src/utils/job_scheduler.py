@@ -0,0 +1,243 @@
+"""
+全局生成任务调度模块
+所有项目的 LLM / 图像 / 视频提交任务进入同一个进程级队列，
+按 (项目, 任务类型) 加权公平排队 (start-time fair queuing)，
+在全局并发上限与各类型并发上限内执行，取代各生成器各自创建的线程池
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from loguru import logger
+
+from .config_loader import config_loader
+
+# Job class -> app.concurrency key that used to size the per-call pools
+CLASS_CONCURRENCY_KEYS = {"llm": "prompt", "image": "image", "video_submit": "video"}
+DEFAULT_CLASS_CONCURRENCY = {"llm": 10, "image": 5, "video_submit": 3}
+
+FlowKey = Tuple[str, str]
+
+
+class _Job:
+    __slots__ = ("future", "fn", "args", "kwargs", "start_tag", "enqueued_at")
+
+    def __init__(self, future: Future, fn: Callable, args, kwargs, start_tag: float):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.start_tag = start_tag
+        self.enqueued_at = time.monotonic()
+
+
+class _Flow:
+    """一个 (项目, 任务类型) 的队列"""
+
+    __slots__ = ("project_id", "job_class", "weight", "jobs", "last_finish_tag", "running")
+
+    def __init__(self, project_id: str, job_class: str, weight: float):
+        self.project_id = project_id
+        self.job_class = job_class
+        self.weight = weight
+        self.jobs = deque()
+        self.last_finish_tag = 0.0
+        self.running = 0
+
+
+class JobScheduler:
+    """进程级加权公平调度器"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(JobScheduler, cls).__new__(cls)
+            cls._instance._cond = threading.Condition()
+            cls._instance._flows: Dict[FlowKey, _Flow] = {}
+            cls._instance._virtual_time = 0.0
+            cls._instance._running_by_class: Dict[str, int] = {}
+            cls._instance._avg_seconds: Dict[str, float] = {}
+            cls._instance._workers = []
+            cls._instance._local = threading.local()
+            cls._instance._stats = {"submitted": 0, "completed": 0, "failed": 0, "inline": 0}
+            cls._instance.reload_config()
+        return cls._instance
+
+    def reload_config(self):
+        """重新加载配置 (app.job_scheduler；类型并发上限默认沿用 app.concurrency.*)"""
+        conf = config_loader.get("app.job_scheduler", {}) or {}
+        concurrency = config_loader.get("app.concurrency", {}) or {}
+        class_confs = conf.get("classes", {}) or {}
+
+        self.class_limits = {}
+        self.class_weights = {}
+        for job_class, default in DEFAULT_CLASS_CONCURRENCY.items():
+            class_conf = class_confs.get(job_class) or {}
+            self.class_limits[job_class] = int(
+                class_conf.get("max_concurrency", concurrency.get(CLASS_CONCURRENCY_KEYS[job_class], default))
+            )
+            self.class_weights[job_class] = float(class_conf.get("weight", 1))
+        self.max_workers = int(conf.get("max_workers", sum(self.class_limits.values())))
+        self.project_weights = {str(k): float(v) for k, v in (conf.get("project_weights", {}) or {}).items()}
+
+        with self._cond:
+            for flow in self._flows.values():
+                flow.weight = self._flow_weight(flow.project_id, flow.job_class)
+            # Workers only grow; a lower ceiling is enforced in _next_job
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._worker, name=f"job-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._cond.notify_all()
+        logger.info(f"JobScheduler 配置已更新, max_workers={self.max_workers}, classes={self.class_limits}")
+
+    def _flow_weight(self, project_id: str, job_class: str) -> float:
+        return max(0.01, self.project_weights.get(project_id, 1.0) * self.class_weights.get(job_class, 1.0))
+
+    def submit(self, project_id: Optional[str], job_class: str, fn: Callable, *args, **kwargs) -> Future:
+        """
+        提交一个任务，返回 concurrent.futures.Future (可配合 as_completed 使用)
+
+        Args:
+            project_id: 公平排队的单位 (None 归入公共队列)
+            job_class: llm / image / video_submit
+        """
+        if job_class not in self.class_limits:
+            raise ValueError(f"Unknown job class: {job_class}")
+        future = Future()
+        if getattr(self._local, "in_worker", False):
+            # Waiting on a queued job from inside a worker could deadlock the pool
+            with self._cond:
+                self._stats["inline"] += 1
+            self._run(future, fn, args, kwargs)
+            return future
+
+        key = (project_id or "", job_class)
+        with self._cond:
+            flow = self._flows.get(key)
+            if flow is None:
+                flow = self._flows[key] = _Flow(key[0], job_class, self._flow_weight(key[0], job_class))
+            # Start tag: a flow that was idle restarts at the current virtual time
+            start_tag = max(self._virtual_time, flow.last_finish_tag)
+            flow.last_finish_tag = start_tag + 1.0 / flow.weight
+            flow.jobs.append(_Job(future, fn, args, kwargs, start_tag))
+            self._stats["submitted"] += 1
+            self._cond.notify()
+        return future
+
+    def _next_job(self) -> Tuple[_Flow, _Job]:
+        """取出可运行任务中 start tag 最小者 (需持有锁)"""
+        while True:
+            total_running = sum(self._running_by_class.values())
+            best = None
+            if total_running < self.max_workers:
+                for flow in self._flows.values():
+                    if not flow.jobs:
+                        continue
+                    if self._running_by_class.get(flow.job_class, 0) >= self.class_limits[flow.job_class]:
+                        continue
+                    if best is None or flow.jobs[0].start_tag < best.jobs[0].start_tag:
+                        best = flow
+            if best is not None:
+                job = best.jobs.popleft()
+                if job.future.set_running_or_notify_cancel():
+                    self._virtual_time = max(self._virtual_time, job.start_tag)
+                    best.running += 1
+                    self._running_by_class[best.job_class] = self._running_by_class.get(best.job_class, 0) + 1
+                    return best, job
+                continue
+            self._cond.wait()
+
+    def _worker(self):
+        self._local.in_worker = True
+        while True:
+            with self._cond:
+                flow, job = self._next_job()
+            started = time.monotonic()
+            ok = self._run(job.future, job.fn, job.args, job.kwargs, already_running=True)
+            elapsed = time.monotonic() - started
+            with self._cond:
+                flow.running -= 1
+                self._running_by_class[flow.job_class] -= 1
+                avg = self._avg_seconds.get(flow.job_class)
+                self._avg_seconds[flow.job_class] = elapsed if avg is None else avg * 0.8 + elapsed * 0.2
+                self._stats["completed" if ok else "failed"] += 1
+                if not flow.jobs and not flow.running:
+                    del self._flows[(flow.project_id, flow.job_class)]
+                self._cond.notify_all()
+
+    def _run(self, future: Future, fn: Callable, args, kwargs, already_running: bool = False) -> bool:
+        if not already_running and not future.set_running_or_notify_cancel():
+            return False
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            return False
+        future.set_result(result)
+        return True
+
+    def project_status(self, project_id: str) -> Dict[str, Any]:
+        """
+        项目的排队情况: 各类型排队/运行数、排在前面的任务数与预计完成时间
+
+        ETA 按类型估算: (前面的任务 + 本项目排队任务) × 平均耗时 ÷ 类型并发上限，取各类型最大值
+        """
+        with self._cond:
+            classes = {}
+            for job_class, limit in self.class_limits.items():
+                own = self._flows.get((project_id, job_class))
+                queued = len(own.jobs) if own else 0
+                running = own.running if own else 0
+                if not queued and not running:
+                    continue
+                ahead = 0
+                if queued:
+                    head = own.jobs[0].start_tag
+                    ahead = sum(
+                        sum(1 for j in flow.jobs if j.start_tag < head)
+                        for key, flow in self._flows.items()
+                        if flow.job_class == job_class and key[0] != project_id
+                    )
+                avg = self._avg_seconds.get(job_class)
+                eta = None
+                if avg is not None:
+                    eta = round((ahead + queued + running) * avg / max(1, limit), 1)
+                classes[job_class] = {
+                    "queued": queued,
+                    "running": running,
+                    "ahead": ahead,
+                    "avg_job_seconds": round(avg, 2) if avg is not None else None,
+                    "eta_seconds": eta
+                }
+        etas = [c["eta_seconds"] for c in classes.values() if c["eta_seconds"] is not None]
+        return {
+            "project_id": project_id,
+            "classes": classes,
+            "eta_seconds": max(etas) if etas else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued_by_class: Dict[str, int] = {}
+            projects = set()
+            for flow in self._flows.values():
+                queued_by_class[flow.job_class] = queued_by_class.get(flow.job_class, 0) + len(flow.jobs)
+                if flow.jobs or flow.running:
+                    projects.add(flow.project_id)
+            return {
+                **self._stats,
+                "max_workers": self.max_workers,
+                "class_limits": dict(self.class_limits),
+                "running": dict(self._running_by_class),
+                "queued": queued_by_class,
+                "active_projects": len(projects),
+                "avg_job_seconds": {k: round(v, 2) for k, v in self._avg_seconds.items()}
+            }
+
+
+job_scheduler = JobScheduler()
@@ -0,0 +1,84 @@
+"""
+增量 JSON 解析模块
+从流式输出的 JSON 文本中，逐个取出指定数组字段里已闭合的元素
+"""
+
+import json
+from typing import Any, List
+
+from loguru import logger
+
+
+class JsonArrayStreamParser:
+    """
+    增量解析 {"...": ..., "<key>": [ {...}, {...} ]} 中的数组元素
+
+    只跟踪括号深度与字符串状态，不构建完整语法树；
+    元素闭合后立即 json.loads 并返回，允许前面夹带 ```json 代码块标记等非 JSON 文本
+    """
+
+    def __init__(self, key: str = "shots"):
+        self.key = key
+        self.buffer = ""
+        self.items: List[Any] = []
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key = None
+        self._array_depth = None
+        self._item_start = -1
+
+    def feed(self, text: str) -> List[Any]:
+        """追加一段文本，返回本次新闭合的元素"""
+        self.buffer += text
+        completed = []
+        buf = self.buffer
+
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._array_depth is None:
+                        self._last_key = buf[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1 and self._array_depth is None and self._last_key == self.key:
+                    self._array_depth = self._depth + 1
+                elif ch == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._array_depth is None:
+                    continue
+                if ch == "}" and self._depth == self._array_depth and self._item_start >= 0:
+                    item = self._decode(buf[self._item_start:i + 1])
+                    self._item_start = -1
+                    if item is not None:
+                        self.items.append(item)
+                        completed.append(item)
+                elif ch == "]" and self._depth < self._array_depth:
+                    # Array closed; later keys with the same name are not tracked
+                    self._array_depth = -1
+
+        self._pos = len(buf)
+        return completed
+
+    def _decode(self, text: str):
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            logger.warning(f"Streamed {self.key} item could not be decoded: {e}")
+            return None
@@ -0,0 +1,200 @@
+"""
+LLM 补全缓存模块
+按 (model_id, temperature, max_tokens, system prompt, messages) 的哈希缓存完整响应
+优先使用 Redis，未启用时回退到本地磁盘 (TTL + LRU 淘汰)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from loguru import logger
+
+from .config_loader import config_loader
+from .redis_client import redis_client
+
+
+class LLMCache:
+    """内容寻址的 LLM 补全缓存"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(LLMCache, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._index = None
+            cls._instance.hits = 0
+            cls._instance.misses = 0
+            cls._instance.writes = 0
+            cls._instance.evictions = 0
+            cls._instance.reload_config()
+        return cls._instance
+
+    def reload_config(self):
+        """重新加载配置"""
+        conf = config_loader.get("app.llm_cache", {}) or {}
+        self.enabled = bool(conf.get("enable", False))
+        self.ttl = int(conf.get("ttl", 7 * 24 * 3600))
+        self.max_entries = int(conf.get("max_entries", 5000))
+
+        cache_dir = Path(conf.get("dir", "./data/cache/llm"))
+        if not cache_dir.is_absolute():
+            cache_dir = config_loader.root_path / cache_dir
+        self.cache_dir = cache_dir
+
+        with self._lock:
+            self._index = None
+        if self.enabled:
+            backend = "redis" if redis_client.enabled else f"disk ({self.cache_dir})"
+            logger.info(f"LLM缓存已启用: backend={backend}, ttl={self.ttl}s, max_entries={self.max_entries}")
+
+    def make_key(self, model_id: str, temperature: float, max_tokens: int,
+                 system_prompt: Optional[str], messages: List[Dict]) -> str:
+        """计算缓存键 (规范化 JSON 的 SHA-256)"""
+        material = json.dumps({
+            "model": model_id,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "system": system_prompt or "",
+            "messages": messages
+        }, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict]]:
+        """读取缓存，返回 (content, usage) 或 None"""
+        entry = self._redis_get(key) if redis_client.enabled else self._disk_get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry["content"], entry.get("usage", {})
+
+    def set(self, key: str, content: str, usage: Dict):
+        entry = {"created": time.time(), "content": content, "usage": usage}
+        if redis_client.enabled:
+            # Redis-side LRU is governed by the server's maxmemory-policy (allkeys-lru recommended)
+            stored = redis_client.set(self._redis_key(key), json.dumps(entry, ensure_ascii=False), ex=self.ttl)
+        else:
+            stored = self._disk_set(key, entry)
+        if stored:
+            with self._lock:
+                self.writes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "backend": "redis" if redis_client.enabled else "disk",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "disk_entries": len(self._index) if self._index is not None else None
+            }
+
+    # Redis backend
+
+    def _redis_key(self, key: str) -> str:
+        return f"llm_cache:{key}"
+
+    def _redis_get(self, key: str) -> Optional[Dict]:
+        raw = redis_client.get(self._redis_key(key))
+        if not raw:
+            return None
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            return None
+        # Sliding expiry keeps frequently used entries alive
+        redis_client.expire(self._redis_key(key), self.ttl)
+        return entry
+
+    # Disk backend
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_index(self):
+        """按 mtime 构建 LRU 索引 (需持有锁)"""
+        if self._index is not None:
+            return
+        entries = []
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*/*.json"):
+                try:
+                    entries.append((path.stat().st_mtime, path.stem))
+                except OSError:
+                    continue
+        entries.sort()
+        self._index = OrderedDict((key, True) for _, key in entries)
+
+    def _disk_get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl:
+            self._disk_remove(key)
+            return None
+
+        with self._lock:
+            self._load_index()
+            self._index[key] = True
+            self._index.move_to_end(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    def _disk_set(self, key: str, entry: Dict) -> bool:
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"LLM cache write failed: {e}")
+            return False
+
+        evicted = []
+        with self._lock:
+            self._load_index()
+            self._index[key] = True
+            self._index.move_to_end(key)
+            while len(self._index) > self.max_entries:
+                old_key, _ = self._index.popitem(last=False)
+                evicted.append(old_key)
+            self.evictions += len(evicted)
+        for old_key in evicted:
+            try:
+                self._path(old_key).unlink()
+            except OSError:
+                pass
+        return True
+
+    def _disk_remove(self, key: str):
+        with self._lock:
+            if self._index is not None:
+                self._index.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+
+llm_cache = LLMCache()
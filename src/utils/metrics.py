@@ -0,0 +1,243 @@
+"""
+进程内指标模块
+计数器 / 仪表 / 直方图，按 (platform, model_id, operation) 等标签聚合，
+供 /api/system/metrics 以 JSON 或 Prometheus 文本格式导出
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple
+
+# Model calls range from sub-second status polls to multi-minute LLM completions
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300, 600)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, "" if v is None else str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """累计分桶直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶线性插值估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower * 2 or 1.0
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "avg": round(self.sum / self.count, 4) if self.count else 0,
+            "p50": round(self.quantile(0.5), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "p99": round(self.quantile(0.99), 4),
+            "buckets": cumulative
+        }
+
+
+class _CallTracker:
+    """一次模型调用的记录器 (由 MetricsRegistry.track 创建)"""
+
+    def __init__(self, registry: "MetricsRegistry", labels: Dict[str, str]):
+        self.registry = registry
+        self.labels = labels
+        self.outcome = "success"
+
+    def error(self, error_class: str):
+        """记录一次失败尝试 (含随后重试成功的尝试)"""
+        self.registry.inc("model_call_errors_total", **self.labels, error_class=error_class)
+
+    def attempts(self, n: int):
+        self.registry.inc("model_call_attempts_total", n, **self.labels)
+
+    def fail(self):
+        self.outcome = "failure"
+
+
+class MetricsRegistry:
+    """进程级指标注册表"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MetricsRegistry, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance.reset()
+        return cls._instance
+
+    def reset(self):
+        with self._lock:
+            self._counters: Dict[str, Dict[LabelKey, float]] = {}
+            self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+            self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+            self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + delta
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    def record_tokens(self, platform: str, model_id: str, operation: str, prompt: int = 0, completion: int = 0):
+        labels = {"platform": platform or "", "model_id": model_id or "", "operation": operation}
+        if prompt:
+            self.inc("model_tokens_total", prompt, **labels, kind="prompt")
+        if completion:
+            self.inc("model_tokens_total", completion, **labels, kind="completion")
+
+    @contextmanager
+    def track(self, platform: str, model_id: str, operation: str):
+        """
+        记录一次模型调用: 在途数、耗时 (含重试与退避) 与结果
+
+        with metrics.track(platform, model_id, "llm") as call:
+            ...; call.error("timeout"); call.fail()
+        """
+        labels = {"platform": platform or "", "model_id": model_id or "", "operation": operation}
+        call = _CallTracker(self, labels)
+        self.add_gauge("model_calls_in_flight", 1, **labels)
+        started = time.monotonic()
+        try:
+            yield call
+        except BaseException:
+            call.outcome = "failure"
+            raise
+        finally:
+            self.add_gauge("model_calls_in_flight", -1, **labels)
+            self.observe("model_call_duration_seconds", time.monotonic() - started, **labels, outcome=call.outcome)
+            self.inc("model_calls_total", **labels, outcome=call.outcome)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            def series(store, render):
+                return {
+                    name: [{"labels": dict(key), "value": render(v)} for key, v in values.items()]
+                    for name, values in store.items()
+                }
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "counters": series(self._counters, lambda v: v),
+                "gauges": series(self._gauges, lambda v: v),
+                "histograms": series(self._histograms, lambda h: h.to_dict())
+            }
+
+    def model_summary(self) -> List[Dict[str, Any]]:
+        """按 (platform, model_id, operation) 汇总，按总耗时降序 (找出占用墙钟时间最多的模型)"""
+        rows: Dict[LabelKey, Dict[str, Any]] = {}
+
+        def row_for(labels: Dict[str, str]) -> Dict[str, Any]:
+            key = (labels.get("platform", ""), labels.get("model_id", ""), labels.get("operation", ""))
+            return rows.setdefault(key, {
+                "platform": key[0], "model_id": key[1], "operation": key[2],
+                "calls": 0, "failures": 0, "total_seconds": 0.0, "p50": 0.0, "p95": 0.0,
+                "attempts": 0, "errors": {}, "prompt_tokens": 0, "completion_tokens": 0, "in_flight": 0
+            })
+
+        with self._lock:
+            for key, hist in self._histograms.get("model_call_duration_seconds", {}).items():
+                labels = dict(key)
+                row = row_for(labels)
+                row["calls"] += hist.count
+                row["total_seconds"] += hist.sum
+                if labels.get("outcome") == "failure":
+                    row["failures"] += hist.count
+                else:
+                    row["p50"] = round(hist.quantile(0.5), 3)
+                    row["p95"] = round(hist.quantile(0.95), 3)
+            for key, value in self._counters.get("model_call_attempts_total", {}).items():
+                row_for(dict(key))["attempts"] += int(value)
+            for key, value in self._counters.get("model_call_errors_total", {}).items():
+                labels = dict(key)
+                errors = row_for(labels)["errors"]
+                errors[labels["error_class"]] = errors.get(labels["error_class"], 0) + int(value)
+            for key, value in self._counters.get("model_tokens_total", {}).items():
+                labels = dict(key)
+                row_for(labels)[f"{labels['kind']}_tokens"] += int(value)
+            for key, value in self._gauges.get("model_calls_in_flight", {}).items():
+                row_for(dict(key))["in_flight"] += int(value)
+
+        for row in rows.values():
+            row["total_seconds"] = round(row["total_seconds"], 3)
+        return sorted(rows.values(), key=lambda r: r["total_seconds"], reverse=True)
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        def fmt(labels: Dict[str, str]) -> str:
+            if not labels:
+                return ""
+            escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels.items())
+            return "{" + ",".join(escaped) + "}"
+
+        lines = []
+        with self._lock:
+            for name, values in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{fmt(dict(k))} {v}" for k, v in values.items())
+            for name, values in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{fmt(dict(k))} {v}" for k, v in values.items())
+            for name, values in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in values.items():
+                    labels = dict(key)
+                    running = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        running += n
+                        lines.append(f"{name}_bucket{fmt({**labels, 'le': bound})} {running}")
+                    lines.append(f"{name}_bucket{fmt({**labels, 'le': '+Inf'})} {hist.count}")
+                    lines.append(f"{name}_sum{fmt(labels)} {hist.sum}")
+                    lines.append(f"{name}_count{fmt(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
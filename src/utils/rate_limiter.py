@@ -0,0 +1,267 @@
+"""
+模型调用限流模块
+按 (platform, model_id) 维护进程级令牌桶 + 并发上限，并根据 429 自适应调整速率
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Tuple
+
+from loguru import logger
+
+from .config_loader import config_loader
+
+
+class RateLimitTimeout(Exception):
+    """等待配额超时"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头 (秒数或 HTTP 日期)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class ModelLimiter:
+    """单个模型端点的令牌桶 + 并发限制 (AIMD 自适应速率)"""
+
+    def __init__(self, key: Tuple[str, str], qps: float, concurrency: int, min_qps: float = 0.2,
+                 decrease_factor: float = 0.5, increase_step: float = None):
+        self.key = key
+        self.max_rate = float(qps)
+        self.rate = float(qps)
+        self.min_rate = min(float(min_qps), self.max_rate)
+        self.concurrency = int(concurrency)
+        self.decrease_factor = decrease_factor
+        # Recover to the configured rate over roughly 20 successful calls
+        self.increase_step = increase_step if increase_step is not None else self.max_rate / 20
+
+        self.tokens = self.rate
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.waiting = 0
+
+        self.total_requests = 0
+        self.throttled = 0
+        self._cond = threading.Condition()
+
+    def reconfigure(self, qps: float, concurrency: int, min_qps: float = 0.2):
+        """
+        应用新配置，保留运行状态: AIMD 降速、Retry-After 暂停、在途请求计数
+
+        当前速率只收窄到新的 [min_qps, qps] 区间；调高 qps 后按成功调用逐步加速到新上限
+        """
+        with self._cond:
+            self.max_rate = float(qps)
+            self.min_rate = min(float(min_qps), self.max_rate)
+            self.rate = min(max(self.rate, self.min_rate), self.max_rate)
+            self.increase_step = self.max_rate / 20
+            self.concurrency = int(concurrency)
+            self.tokens = min(self.tokens, max(self.rate, 1.0))
+            # Waiters re-check against the new concurrency / rate
+            self._cond.notify_all()
+
+    def _refill(self, now: float):
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        # Burst capacity equals one second worth of tokens
+        self.tokens = min(max(self.rate, 1.0), self.tokens + elapsed * self.rate)
+
+    def _try_acquire(self) -> float:
+        """尝试获取一个配额；成功返回 0，否则返回建议等待秒数 (需持有锁)"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= self.concurrency:
+            return 0.05
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.in_flight += 1
+            self.total_requests += 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self, timeout: float = None):
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    wait = self._try_acquire()
+                    if wait == 0:
+                        return
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise RateLimitTimeout(f"Rate limit wait timed out for {self.key}")
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self, timeout: float = None):
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            self.waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire()
+                if wait == 0:
+                    return
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RateLimitTimeout(f"Rate limit wait timed out for {self.key}")
+                    wait = min(wait, remaining)
+                await asyncio.sleep(wait)
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def release(self, status_code: int = None, retry_after: float = None):
+        with self._cond:
+            self.in_flight -= 1
+            if status_code == 429:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self.tokens = min(self.tokens, 0)
+                pause = retry_after if retry_after is not None else 1.0 / self.rate
+                self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+                logger.warning(f"Rate limited (429) on {self.key}, rate -> {self.rate:.2f} qps, pause {pause:.1f}s")
+            elif status_code is not None and status_code < 500:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "rate_qps": round(self.rate, 3),
+                "max_qps": self.max_rate,
+                "concurrency": self.concurrency,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                "total_requests": self.total_requests,
+                "throttled": self.throttled
+            }
+
+
+class _Slot:
+    """一次限流占用，调用方通过 record 回报响应状态"""
+
+    def __init__(self):
+        self.status_code = None
+        self.retry_after = None
+
+    def record(self, status_code: int, headers: Dict = None):
+        self.status_code = status_code
+        if headers is not None:
+            self.retry_after = parse_retry_after(headers.get("Retry-After"))
+
+
+class RateLimiter:
+    """进程级限流器注册表"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RateLimiter, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._limiters = {}
+            cls._instance.reload_config()
+        return cls._instance
+
+    def reload_config(self):
+        """重新加载配置 (已有限流器原地更新，保留降速与暂停状态)"""
+        conf = config_loader.get("app.rate_limits", {}) or {}
+        self.enabled = conf.get("enable", True)
+        self.default_conf = conf.get("default", {}) or {}
+        self.model_confs = conf.get("models", {}) or {}
+        self.acquire_timeout = float(conf.get("acquire_timeout", 300))
+        with self._lock:
+            limiters = dict(self._limiters)
+        # Requests holding or waiting on a limiter keep using the same object
+        for (_, model_id), limiter in limiters.items():
+            limiter.reconfigure(**self._limits(model_id))
+
+    def _limits(self, model_id: str) -> Dict[str, float]:
+        conf = {**self.default_conf, **(self.model_confs.get(model_id) or {})}
+        return {
+            "qps": conf.get("qps", 10),
+            "concurrency": conf.get("concurrency", 20),
+            "min_qps": conf.get("min_qps", 0.2)
+        }
+
+    def get(self, platform: str, model_id: str) -> ModelLimiter:
+        key = (platform or "", model_id or "")
+        limiter = self._limiters.get(key)
+        if limiter is not None:
+            return limiter
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = ModelLimiter(key, **self._limits(model_id))
+                self._limiters[key] = limiter
+        return limiter
+
+    def _wait_limit(self, timeout: Optional[float]) -> float:
+        """排队等待上限: acquire_timeout 与调用方剩余截止时间取小"""
+        if timeout is None:
+            return self.acquire_timeout
+        return min(self.acquire_timeout, timeout)
+
+    @contextmanager
+    def limit(self, platform: str, model_id: str, timeout: Optional[float] = None):
+        """
+        同步限流上下文: with rate_limiter.limit(p, m) as slot: ...; slot.record(code, headers)
+
+        Args:
+            timeout: 调用方剩余的截止时间 (秒)，排队等待不超过它
+        """
+        slot = _Slot()
+        if not self.enabled:
+            yield slot
+            return
+        limiter = self.get(platform, model_id)
+        limiter.acquire(self._wait_limit(timeout))
+        try:
+            yield slot
+        finally:
+            limiter.release(slot.status_code, slot.retry_after)
+
+    @asynccontextmanager
+    async def alimit(self, platform: str, model_id: str, timeout: Optional[float] = None):
+        """异步限流上下文，等待时不占用事件循环 (timeout 同 limit)"""
+        slot = _Slot()
+        if not self.enabled:
+            yield slot
+            return
+        limiter = self.get(platform, model_id)
+        await limiter.acquire_async(self._wait_limit(timeout))
+        try:
+            yield slot
+        finally:
+            limiter.release(slot.status_code, slot.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {f"{p}/{m}": l.stats() for (p, m), l in limiters.items()}
+
+
+rate_limiter = RateLimiter()
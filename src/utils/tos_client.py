@@ -1,8 +1,19 @@
 
 import tos
+from tos.exceptions import TosClientError, TosServerError
 from typing import List, Dict, Optional, Tuple
 from loguru import logger
 from ..utils.config_loader import config_loader
+from ..utils.http_transport import http_transport
+from ..utils.circuit_breaker import circuit_breakers
+
+
+def _is_tos_outage(e: Exception) -> bool:
+    """网络错误与 5xx 计为 TOS 故障，4xx (ACL/权限/参数) 不计"""
+    if isinstance(e, TosServerError):
+        return (e.status_code or 0) >= 500
+    return isinstance(e, TosClientError)
+
 
 class TosClient:
     def __init__(self):
@@ -111,18 +122,19 @@ class TosClient:
             raise Exception("TOS Client not initialized")
             
         try:
-            try:
-                # Try upload with ACL
-                self.client.put_object(bucket_name, key, content=content, acl=acl)
-            except Exception as e:
-                # If ACL fails, fallback to default (private)
-                if "invalid acl type" in str(e).lower() or "not support" in str(e).lower() or "400" in str(e):
-                    logger.warning(f"Upload with ACL '{acl}' failed, falling back to default: {e}")
-                    self.client.put_object(bucket_name, key, content=content)
-                else:
-                    raise e
+            with circuit_breakers.get("tos").guard(_is_tos_outage):
+                try:
+                    # Try upload with ACL
+                    self.client.put_object(bucket_name, key, content=content, acl=acl)
+                except Exception as e:
+                    # If ACL fails, fallback to default (private)
+                    if "invalid acl type" in str(e).lower() or "not support" in str(e).lower() or "400" in str(e):
+                        logger.warning(f"Upload with ACL '{acl}' failed, falling back to default: {e}")
+                        self.client.put_object(bucket_name, key, content=content)
+                    else:
+                        raise e
             
-            return f"https://{bucket_name}.{self.endpoint}/{key}"
+            return self.public_url(bucket_name, key)
         except Exception as e:
             logger.error(f"Failed to upload content: {e}")
             raise e
@@ -132,33 +144,39 @@ class TosClient:
         if not self.client:
             raise Exception("TOS Client not initialized")
             
-        import requests
         try:
-            # Attempt 1: With ACL
-            try:
-                with requests.get(url, stream=True) as r:
-                    r.raise_for_status()
-                    self.client.put_object(bucket_name, key, content=r.raw, acl=acl)
-            except Exception as e:
-                # If ACL fails, retry without ACL
-                if "invalid acl type" in str(e).lower() or "not support" in str(e).lower() or "400" in str(e):
-                    logger.warning(f"Upload from URL with ACL '{acl}' failed, retrying without ACL: {e}")
-                    with requests.get(url, stream=True) as r:
+            with circuit_breakers.get("tos").guard(_is_tos_outage):
+                # Attempt 1: With ACL
+                try:
+                    with http_transport.get(url, stream=True) as r:
                         r.raise_for_status()
-                        self.client.put_object(bucket_name, key, content=r.raw)
-                else:
-                    raise e
+                        self.client.put_object(bucket_name, key, content=r.raw, acl=acl)
+                except Exception as e:
+                    # If ACL fails, retry without ACL
+                    if "invalid acl type" in str(e).lower() or "not support" in str(e).lower() or "400" in str(e):
+                        logger.warning(f"Upload from URL with ACL '{acl}' failed, retrying without ACL: {e}")
+                        with http_transport.get(url, stream=True) as r:
+                            r.raise_for_status()
+                            self.client.put_object(bucket_name, key, content=r.raw)
+                    else:
+                        raise e
             
-            return f"https://{bucket_name}.{self.endpoint}/{key}"
+            return self.public_url(bucket_name, key)
         except Exception as e:
             logger.error(f"Failed to upload from URL: {e}")
             raise e
 
+    def public_url(self, bucket_name: str, key: str) -> str:
+        """Virtual-host style object URL; keeps an explicit http:// endpoint (e.g. a local stand-in)"""
+        scheme, _, host = self.endpoint.rpartition("://")
+        return f"{scheme or 'https'}://{bucket_name}.{host}/{key}"
+
     def get_object(self, bucket_name: str, key: str):
         """Get object from TOS"""
         if not self.client:
             raise Exception("TOS Client not initialized")
-        return self.client.get_object(bucket_name, key)
+        with circuit_breakers.get("tos").guard(_is_tos_outage):
+            return self.client.get_object(bucket_name, key)
 
     def parse_tos_url(self, url: str) -> Optional[Tuple[str, str]]:
         """Parse bucket and key from TOS URL"""
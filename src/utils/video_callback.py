@@ -0,0 +1,94 @@
+"""
+视频任务回调模块
+提交视频任务时附带带签名的 callback_url，任务完成后由平台回调 /api/callbacks/video；
+签名绑定本地 VideoTask ID 与过期时间，只证明该 URL 由本服务为该任务签发，任务状态仍以回查平台接口为准
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from typing import Dict, Any, Optional
+from urllib.parse import urlencode
+
+from loguru import logger
+
+from .config_loader import config_loader
+
+CALLBACK_PATH = "/api/callbacks/video"
+
+
+class VideoCallback:
+    """回调 URL 签发与校验"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(VideoCallback, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._stats = {"issued": 0, "received": 0, "rejected": 0, "applied": 0, "ignored": 0}
+            cls._instance.reload_config()
+        return cls._instance
+
+    def reload_config(self):
+        """重新加载配置 (app.video_callback)"""
+        conf = config_loader.get("app.video_callback", {}) or {}
+        self.public_base_url = (conf.get("public_base_url") or "").rstrip("/")
+        self.secret = conf.get("secret") or ""
+        self.enabled = bool(conf.get("enable", False)) and bool(self.public_base_url)
+        if conf.get("enable") and not self.enabled:
+            logger.warning("video_callback 已启用但未配置 public_base_url，回退为轮询模式")
+        if self.enabled and not self.secret:
+            # Callbacks issued before a restart will fail verification and fall back to polling
+            self.secret = secrets.token_hex(32)
+            logger.warning("video_callback 未配置 secret，已生成进程内临时密钥")
+        # Status polls for callback-mode tasks become a slow reconciliation sweep
+        self.reconcile_interval = float(conf.get("reconcile_interval", 300))
+        # Must outlast the longest plausible render; later callbacks are rejected and polling takes over
+        self.ttl = int(conf.get("ttl", 86400))
+
+    def _sign(self, task_ref: str, expires: int) -> str:
+        message = f"{task_ref}:{expires}"
+        return hmac.new(self.secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+    def callback_url(self, task_ref: Optional[str]) -> Optional[str]:
+        """
+        为一个 VideoTask 签发回调 URL
+
+        Args:
+            task_ref: 提交后将创建 / 更新的 VideoTask ID
+
+        Returns:
+            回调 URL；未启用或没有可绑定的任务时返回 None (走轮询)
+        """
+        if not self.enabled or not task_ref:
+            return None
+        expires = int(time.time()) + self.ttl
+        self.count("issued")
+        query = urlencode({"task": task_ref, "exp": expires, "sig": self._sign(task_ref, expires)})
+        return f"{self.public_base_url}{CALLBACK_PATH}?{query}"
+
+    def verify(self, task_ref: str, expires: str, sig: str) -> bool:
+        """签名有效且未过期；调用方还需确认回调中的平台任务属于 task_ref"""
+        if not self.enabled or not task_ref or not expires or not sig:
+            return False
+        try:
+            expires = int(expires)
+        except ValueError:
+            return False
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._sign(task_ref, expires), sig)
+
+    def count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "enabled": self.enabled, "reconcile_interval": self.reconcile_interval}
+
+
+video_callback = VideoCallback()
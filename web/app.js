@@ -4,6 +4,8 @@ let currentTab = 'input';
 let isScriptEditing = false;
 let selectedRatio = '16:9';
 let selectedResolution = '1080p';
+// Version of the storyboard / prompts the editors were rendered from; sent back on save so a stale save gets 409
+let editVersion = null;
 
 const tabs = ['input', 'script', 'characters', 'scenes', 'storyboard', 'prompts', 'images', 'videos', 'output'];
 const views = {
@@ -910,6 +912,7 @@ async function loadProject(id, shouldSwitchTab = true) {
 
   // Cache current project state
   currentProject = p;
+  editVersion = p.version ?? null;
 
   updateStatus(`当前项目: ${p.project_name} (${p.status})`);
 
@@ -1609,10 +1612,12 @@ async function saveStoryboard() {
     const res = await fetch(`/api/projects/${projectId}/storyboard`, {
       method: 'PUT',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ storyboard: newStoryboard })
+      body: JSON.stringify({ storyboard: newStoryboard, version: editVersion })
     });
     
+    if (res.status === 409) return handleSaveConflict('分镜');
     if (!res.ok) throw new Error('保存失败');
+    editVersion = (await res.json()).version ?? editVersion;
     updateStatus('分镜已保存', 'green');
   } catch (e) {
     updateStatus('保存分镜失败: ' + e.message, 'red');
@@ -1780,6 +1785,14 @@ function startPolling(taskId, onComplete) {
     }, 2000);
 }
 
+// Someone else (another tab, a regeneration) saved since this editor was loaded
+async function handleSaveConflict(what) {
+  updateStatus(`保存${what}失败: 内容已被其他操作修改`, 'red');
+  if (confirm(`${what}已被其他操作修改，是否重新加载最新内容？(当前未保存的修改将丢失)`)) {
+    await loadProject(projectId, false);
+  }
+}
+
 function updateStatus(msg, color='gray') {
   statusEl.textContent = msg;
   statusDot.className = `w-2 h-2 rounded-full mr-2 bg-${color}-500`;
@@ -1911,11 +1924,15 @@ async function savePromptsData() {
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({ 
               image_prompts: existingImg,
-              video_prompts: existingVid
+              video_prompts: existingVid,
+              // The version the editor was loaded at, not the one just fetched
+              version: editVersion
           })
       });
       
+      if (updateRes.status === 409) return handleSaveConflict('提示词');
       if (!updateRes.ok) throw new Error('保存失败');
+      editVersion = (await updateRes.json()).version ?? editVersion;
       updateStatus('提示词已保存', 'green');
 
   } catch (e) {